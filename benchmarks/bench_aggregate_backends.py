@@ -0,0 +1,69 @@
+"""Compare the pandas and MongoDB push-down gold backends on the same clean layer.
+
+Needs a running mongod with a populated real_estate_clean collection. Each
+backend rebuilds the gold tables; the outputs are then compared row by row.
+Sketch metrics (quantiles, distinct counts) are estimated differently by the
+two backends and are compared within SKETCH_TOLERANCE.
+
+    python -m benchmarks.bench_aggregate_backends --db real_estate_db
+"""
+import argparse
+import statistics
+import time
+
+from src.aggregate import GOLD_SPECS, SKETCH_KINDS, SKETCH_TOLERANCE, STATE_FIELD, DataAggregator, GoldSpec
+
+
+def snapshot(aggregator: DataAggregator) -> dict[str, list[dict]]:
+    return {
+        #only the mongo backend omits sketch state, so state is not compared
+        spec.name: list(aggregator.db[spec.collection].find({}, {"_id": 0, STATE_FIELD: 0}))
+        for spec in GOLD_SPECS
+    }
+
+
+def mismatches(spec: GoldSpec, left: list[dict], right: list[dict]) -> int:
+    if len(left) != len(right):
+        return abs(len(left) - len(right))
+    approximate = {metric.name for metric in spec.metrics if metric.func in SKETCH_KINDS}
+    count = 0
+    for a, b in zip(left, right):
+        if a.keys() != b.keys():
+            count += 1
+        elif any(
+            abs(a[key] - b[key]) > SKETCH_TOLERANCE * abs(a[key]) if key in approximate
+            else abs(a[key] - b[key]) > 0.005 if isinstance(a[key], float)
+            else a[key] != b[key]
+            for key in a
+        ):
+            count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_db")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    outputs = {}
+    print(f"{'backend':<10}{'median s':>10}{'min s':>10}")
+    for backend in ("pandas", "mongo"):
+        aggregator = DataAggregator(args.mongo_uri, args.db, backend=backend)
+        runs = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            aggregator.aggregate_all()
+            runs.append(time.perf_counter() - start)
+        outputs[backend] = snapshot(aggregator)
+        aggregator.close()
+        print(f"{backend:<10}{statistics.median(runs):>10.3f}{min(runs):>10.3f}")
+
+    for spec in GOLD_SPECS:
+        diff = mismatches(spec, outputs["pandas"][spec.name], outputs["mongo"][spec.name])
+        print(f"{spec.collection}: {'identical' if diff == 0 else f'{diff} rows differ'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""End-to-end wall time of the sequential stages vs the overlapped async pipeline.
+
+Needs a running mongod (see docker-compose.yml). Both modes load the same
+seeded synthetic CSV from raw to gold, each in its own spawned process. From
+the repo root:
+
+    python -m benchmarks.bench_async --rows 1000000
+    python -m benchmarks.bench_async --rows 1000000 --chunksize 50000 --queue-size 4
+
+Sequential mode is what main.py runs by default: a streaming raw load, then a
+streaming clean, then one gold pass over the clean layer.
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from benchmarks.bench_pipeline import ensure_csv
+from src.aggregate import DataAggregator
+from src.async_pipeline import AsyncPipeline, utilization_table
+from src.clean import DataCleaner
+from src.metrics import peak_memory_mb
+from src.raw_data import RawDataLoader
+
+
+def run_sequential(csv_path: str, mongo_uri: str, db_name: str, chunksize: int, codec: str) -> dict:
+    start = time.perf_counter()
+    loader = RawDataLoader(mongo_uri, db_name, codec=codec)
+    loader.load_csv(csv_path, chunksize=chunksize)
+    loader.close()
+    raw_done = time.perf_counter()
+
+    cleaner = DataCleaner(mongo_uri, db_name, codec=codec)
+    cleaner.clean(batch_size=chunksize)
+    cleaner.close()
+    clean_done = time.perf_counter()
+
+    aggregator = DataAggregator(mongo_uri, db_name, codec=codec)
+    aggregator.aggregate_all()
+    aggregator.close()
+    end = time.perf_counter()
+    return {
+        "wall_seconds": round(end - start, 3),
+        "breakdown": f"raw {raw_done - start:.2f}s, clean {clean_done - raw_done:.2f}s, gold {end - clean_done:.2f}s",
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def run_async(csv_path: str, mongo_uri: str, db_name: str, chunksize: int, codec: str, queue_size: int) -> dict:
+    pipeline = AsyncPipeline(mongo_uri, db_name, chunksize=chunksize, queue_size=queue_size, codec=codec)
+    summary = pipeline.run(csv_path)
+    pipeline.close()
+    return {
+        "wall_seconds": summary["wall_seconds"],
+        "breakdown": f"streaming {summary['stream_seconds']}s, gold merge {summary['gold_merge_seconds']}s",
+        "peak_memory_mb": peak_memory_mb(),
+        "table": utilization_table(summary),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_bench")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--complete-text", action="store_true",
+                        help="fill optional text so nearly every row survives validation")
+    parser.add_argument("--workdir", default="data/synthetic")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--codec", default="bson")
+    args = parser.parse_args()
+
+    csv_path = str(ensure_csv(Path(args.workdir), args.rows, args.seed, args.complete_text))
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        results["sequential"] = pool.submit(
+            run_sequential, csv_path, args.mongo_uri, args.db, args.chunksize, args.codec
+        ).result()
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        results["async"] = pool.submit(
+            run_async, csv_path, args.mongo_uri, args.db, args.chunksize, args.codec, args.queue_size
+        ).result()
+
+    print(f"\n{'mode':<12}{'wall s':>10}{'peak MB':>10}  breakdown")
+    for mode, result in results.items():
+        print(f"{mode:<12}{result['wall_seconds']:>10}{result['peak_memory_mb']:>10}  {result['breakdown']}")
+    speedup = results["sequential"]["wall_seconds"] / results["async"]["wall_seconds"]
+    print(f"\nasync vs sequential: {speedup:.2f}x\n")
+    print(results["async"]["table"])
+
+
+if __name__ == "__main__":
+    main()
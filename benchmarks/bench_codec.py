@@ -0,0 +1,149 @@
+"""Compare the codecs in src/codec.py against the to_dict / list(find()) path.
+
+Runs offline by default: frames are encoded to the BSON insert_many sends and
+decoded back from pre-encoded server-style batches, so no mongod is needed. With --mongo-uri
+the same comparison runs against a live collection. From the repo root:
+
+    python -m benchmarks.bench_codec --rows 200000
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable
+
+import bson
+import numpy as np
+import pandas as pd
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient
+
+from src.codec import CODECS, get_codec
+
+
+def sample_frame(rows: int) -> pd.DataFrame:
+    """Raw-layer shaped frame: ints, floats, text and missing values"""
+    rng = np.random.default_rng(0)
+    towns = np.array([f"Town {i}" for i in range(170)])
+    remarks = np.array(["", "ESTATE SALE", "FORECLOSURE", np.nan], dtype=object)
+    return pd.DataFrame({
+        "Serial Number": np.arange(rows),
+        "List Year": rng.integers(2001, 2024, rows),
+        "Date Recorded": [f"{m:02d}/01/2020" for m in rng.integers(1, 13, rows)],
+        "Town": towns[rng.integers(0, len(towns), rows)],
+        "Address": [f"{i} MAIN ST" for i in range(rows)],
+        "Assessed Value": rng.integers(10_000, 900_000, rows).astype(float),
+        "Sale Amount": rng.integers(10_000, 2_000_000, rows).astype(float),
+        "Sales Ratio": rng.random(rows),
+        "Property Type": np.array(["Residential", "Condo", "Commercial"])[rng.integers(0, 3, rows)],
+        "OPM remarks": remarks[rng.integers(0, len(remarks), rows)],
+    })
+
+
+class FakeCollection:
+    """Serves pre-encoded batches the way a cursor receives them from the server"""
+
+    def __init__(self, docs: list[dict], batch_size: int):
+        self.batches = [
+            b"".join(bson.encode(doc) for doc in docs[offset:offset + batch_size])
+            for offset in range(0, len(docs), batch_size)
+        ]
+
+    def find(self, query=None, projection=None, batch_size=0):
+        for raw in self.batches:
+            yield from bson.decode_all(raw)
+
+    def find_raw_batches(self, query=None, projection=None, batch_size=0):
+        return iter(self.batches)
+
+
+def to_bson(docs: list) -> list[bytes]:
+    """What insert_many sends: dicts get an _id and are encoded, raw documents go as they are"""
+    return [
+        doc.raw if isinstance(doc, RawBSONDocument) else bson.encode({"_id": bson.ObjectId(), **doc})
+        for doc in docs
+    ]
+
+
+def measure(func: Callable[[], object], rows: int) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    #tracemalloc slows allocation-heavy code, so time a second, untraced run
+    start = time.perf_counter()
+    func()
+    elapsed = min(elapsed, time.perf_counter() - start)
+    return {
+        "rows_per_sec": round(rows / elapsed) if elapsed > 0 else 0,
+        "peak_alloc_mb": round(peak / (1024 * 1024), 1),
+    }
+
+
+def offline(df: pd.DataFrame, batch_size: int) -> dict[str, dict]:
+    rows = len(df)
+    results = {}
+    #encoding is measured up to the BSON bytes, which pymongo makes of dicts itself
+    results["encode to_dict"] = measure(lambda: to_bson(df.to_dict("records")), rows)
+    collection = FakeCollection(df.to_dict("records"), batch_size)
+    results["decode list(find())"] = measure(
+        lambda: pd.DataFrame(list(collection.find({}))), rows
+    )
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            continue
+        results[f"encode {name}"] = measure(lambda: to_bson(codec.documents(df)), rows)
+        results[f"decode {name}"] = measure(lambda: codec.read_frame(collection), rows)
+    return results
+
+
+def live(df: pd.DataFrame, mongo_uri: str, db_name: str) -> dict[str, dict]:
+    client = MongoClient(mongo_uri)
+    collection = client[db_name]["codec_bench"]
+    rows = len(df)
+    results = {}
+
+    def legacy_insert() -> None:
+        collection.drop()
+        collection.insert_many(df.to_dict("records"))
+
+    results["insert to_dict"] = measure(legacy_insert, rows)
+    results["read list(find())"] = measure(lambda: pd.DataFrame(list(collection.find())), rows)
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            continue
+
+        def insert() -> None:
+            collection.drop()
+            codec.insert_frame(collection, df)
+
+        results[f"insert {name}"] = measure(insert, rows)
+        results[f"read {name}"] = measure(lambda: codec.read_frame(collection), rows)
+    collection.drop()
+    client.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--db", default="real_estate_bench")
+    args = parser.parse_args()
+
+    df = sample_frame(args.rows)
+    results = live(df, args.mongo_uri, args.db) if args.mongo_uri else offline(df, args.batch_size)
+
+    print(f"{'path':<24}{'rows/sec':>12}{'peak alloc MB':>15}")
+    for path, result in results.items():
+        print(f"{path:<24}{result['rows_per_sec']:>12}{result['peak_alloc_mb']:>15}")
+
+
+if __name__ == "__main__":
+    main()
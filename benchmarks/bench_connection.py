@@ -0,0 +1,92 @@
+"""Compare connection profiles for bulk inserts and full-collection scans.
+
+Needs a running mongod (see docker-compose.yml). Writes into a scratch
+collection of --db, which is dropped afterwards. From the repo root:
+
+    python -m benchmarks.bench_connection --rows 500000
+    python -m benchmarks.bench_connection --rows 500000 --compressors zlib zstd
+
+Each wire compressor given with --compressors (and installed) is also tried
+on its own under the bulk_load / read_scan settings. Compression mostly pays
+off when mongod is on another host; on localhost it can cost more CPU than
+it saves.
+"""
+import argparse
+import time
+from dataclasses import replace
+
+from src.codec import get_codec
+from src.connection import PROFILES, ConnectionProfile, available_compressors, connect
+from src.synthetic import generate_frame
+
+SCRATCH_COLLECTION = "bench_connection"
+
+
+def bench_insert(mongo_uri: str, db_name: str, profile: ConnectionProfile, records: list[dict], batch_size: int) -> float:
+    client = connect(mongo_uri, profile)
+    collection = client[db_name][SCRATCH_COLLECTION]
+    collection.drop()
+    start = time.perf_counter()
+    for offset in range(0, len(records), batch_size):
+        #insert_many stamps _id onto the dicts, so each run gets fresh copies
+        batch = [dict(record) for record in records[offset:offset + batch_size]]
+        collection.insert_many(batch, ordered=profile.ordered)
+    seconds = time.perf_counter() - start
+    client.close()
+    return seconds
+
+
+def bench_scan(mongo_uri: str, db_name: str, profile: ConnectionProfile, codec: str) -> tuple[float, int]:
+    client = connect(mongo_uri, profile)
+    collection = client[db_name][SCRATCH_COLLECTION]
+    start = time.perf_counter()
+    rows = len(get_codec(codec).read_frame(collection, {}, {"_id": 0}, batch_size=profile.batch_size))
+    seconds = time.perf_counter() - start
+    client.close()
+    return seconds, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_bench")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--codec", default="bson")
+    parser.add_argument("--compressors", nargs="*", default=["zstd", "snappy", "zlib"])
+    args = parser.parse_args()
+
+    records = get_codec("dict").encode(generate_frame(args.rows, seed=args.seed))
+    compressors = available_compressors(tuple(args.compressors))
+    print(f"Installed compressors: {', '.join(compressors) or 'none'}")
+
+    bulk, scan = PROFILES["bulk_load"], PROFILES["read_scan"]
+    insert_profiles = [PROFILES["default"], bulk] + [
+        replace(bulk, name=f"bulk_load+{name}", compressors=(name,)) for name in compressors
+    ]
+    scan_profiles = [PROFILES["default"], scan] + [
+        replace(scan, name=f"read_scan+{name}", compressors=(name,)) for name in compressors
+    ]
+
+    print(f"\n{'insert profile':<24}{'seconds':>10}{'rows/sec':>12}{'vs default':>12}")
+    baseline = None
+    for profile in insert_profiles:
+        seconds = bench_insert(args.mongo_uri, args.db, profile, records, args.batch_size)
+        baseline = baseline or seconds
+        print(f"{profile.name:<24}{seconds:>10.3f}{args.rows / seconds:>12.0f}{baseline / seconds:>11.2f}x")
+
+    print(f"\n{'scan profile':<24}{'seconds':>10}{'rows/sec':>12}{'vs default':>12}")
+    baseline = None
+    for profile in scan_profiles:
+        seconds, rows = bench_scan(args.mongo_uri, args.db, profile, args.codec)
+        baseline = baseline or seconds
+        print(f"{profile.name:<24}{seconds:>10.3f}{rows / seconds:>12.0f}{baseline / seconds:>11.2f}x")
+
+    client = connect(args.mongo_uri)
+    client[args.db][SCRATCH_COLLECTION].drop()
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
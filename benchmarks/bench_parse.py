@@ -0,0 +1,125 @@
+"""Parse time and memory of the CSV engines on plain, gzip and zstd input.
+
+No database needed. Each read runs in its own spawned process so peak memory
+is per engine. From the repo root:
+
+    python -m benchmarks.bench_parse --csv data/Real_Estate_Sales_2001-2023_GL.csv
+    python -m benchmarks.bench_parse --rows 1000000 --chunksize 100000
+
+"inferred" is the old ``pd.read_csv(path)``: the C parser guessing every
+column's type, which warns about mixed types when a numeric column holds
+placeholders such as "n/a". The engines read with the dtypes declared by
+RealEstateDataRaw (see src/parsing.py). Speedups are against "inferred" on the
+uncompressed file.
+"""
+import argparse
+import gzip
+import multiprocessing
+import shutil
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from benchmarks.bench_pipeline import ensure_csv
+from src.dtypes import frame_memory_mb
+from src.metrics import peak_memory_mb
+from src.parsing import ENGINES, detect_compression, get_engine
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+
+def prepare_inputs(csv: Optional[str], workdir: str, rows: int, seed: int) -> dict[str, Path]:
+    """The CSV plus gzip (and, with pyarrow, zstd) copies next to it"""
+    csv_path = Path(csv) if csv else ensure_csv(Path(workdir), rows, seed, False)
+    paths = {"plain": csv_path}
+    gzip_path = csv_path.with_name(csv_path.name + ".gz")
+    if not gzip_path.exists():
+        with csv_path.open("rb") as source, gzip.open(gzip_path, "wb", compresslevel=6) as target:
+            shutil.copyfileobj(source, target, 1 << 20)
+    paths["gzip"] = gzip_path
+    if pa is not None:
+        zstd_path = csv_path.with_name(csv_path.name + ".zst")
+        if not zstd_path.exists():
+            with csv_path.open("rb") as source, pa.output_stream(str(zstd_path), compression="zstd") as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+        paths["zstd"] = zstd_path
+    return paths
+
+
+def run_read(path: str, engine: str, chunksize: Optional[int]) -> dict:
+    """One read, timed in this (fresh) process"""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", pd.errors.DtypeWarning)
+        start = time.perf_counter()
+        frame_mb = None
+        if engine == "inferred":
+            df = pd.read_csv(path, compression=detect_compression(path) or "infer")
+            rows, frame_mb = len(df), frame_memory_mb(df)
+        elif chunksize:
+            rows = 0
+            with get_engine(engine).iter_chunks(path, chunksize) as reader:
+                for chunk in reader:
+                    rows += len(chunk)
+        else:
+            df = get_engine(engine).read(path)
+            rows, frame_mb = len(df), frame_memory_mb(df)
+        seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "frame_mb": frame_mb,
+        "peak_memory_mb": peak_memory_mb(),
+        "mixed_type_warnings": sum(issubclass(w.category, pd.errors.DtypeWarning) for w in caught),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", help="defaults to a seeded synthetic file of --rows rows")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default="data/synthetic")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--engines", nargs="+", default=["inferred", *ENGINES])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    #linux carries the peak RSS over into spawned children, so keep it out of this process too
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        inputs = pool.submit(prepare_inputs, args.csv, args.workdir, args.rows, args.seed).result()
+
+    results = {}
+    for compression, path in inputs.items():
+        for engine in args.engines:
+            modes = [("whole", None)] if engine == "inferred" else [("whole", None), ("chunked", args.chunksize)]
+            for mode, chunksize in modes:
+                label = (engine, compression, mode)
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    try:
+                        results[label] = pool.submit(run_read, str(path), engine, chunksize).result()
+                    except ImportError as e:
+                        #e.g. zstd through the C engine with neither zstandard nor pyarrow
+                        print(f"skipping {engine} on {compression}: {e}")
+
+    print(f"\n{'engine':<10}{'input':<7}{'mode':<9}{'rows':>10}{'seconds':>9}{'peak MB':>9}{'frame MB':>10}"
+          f"{'dtype warnings':>16}{'speedup':>9}")
+    #every row against the old read of the uncompressed file
+    baseline = results.get(("inferred", "plain", "whole"))
+    for (engine, compression, mode), result in results.items():
+        speedup = baseline["seconds"] / result["seconds"] if baseline and result["seconds"] else 0.0
+        frame_mb = "-" if result["frame_mb"] is None else result["frame_mb"]
+        print(
+            f"{engine:<10}{compression:<7}{mode:<9}{result['rows']:>10}{result['seconds']:>9}"
+            f"{result['peak_memory_mb']:>9}{frame_mb:>10}{result['mixed_type_warnings']:>16}{speedup:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Run every pipeline stage on seeded synthetic data at several sizes.
+
+Needs a running mongod (see docker-compose.yml). Synthetic CSVs are generated
+once per (size, seed) under --workdir and reused. Each stage runs in its own
+spawned process, so its peak RSS is its own. From the repo root:
+
+    python -m benchmarks.bench_pipeline --sizes 1000000 5000000 --save-baseline
+    python -m benchmarks.bench_pipeline --sizes 1000000 5000000 --check --threshold 0.2
+
+--check exits 1 when a stage's rows/sec falls, or its peak memory grows, by
+more than --threshold against the baseline JSON.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.aggregate import DataAggregator
+from src.clean import DataCleaner
+from src.metrics import peak_memory_mb
+from src.raw_data import RawDataLoader
+from src.synthetic import write_csv
+
+STAGES = ("raw", "clean", "gold")
+DEFAULT_BASELINE = "benchmarks/baselines/pipeline.json"
+
+
+def ensure_csv(workdir: Path, rows: int, seed: int, complete_text: bool) -> Path:
+    path = workdir / f"real_estate_{rows}_seed{seed}{'_complete' if complete_text else ''}.csv"
+    if not path.exists():
+        print(f"Generating {rows} synthetic rows into {path}")
+        write_csv(str(path), rows, seed, complete_text=complete_text)
+    return path
+
+
+def run_stage(stage: str, csv_path: str, mongo_uri: str, db_name: str, chunksize: int, batch_size: int) -> dict:
+    """One stage, timed in this (fresh) process"""
+    if stage == "raw":
+        loader = RawDataLoader(mongo_uri, db_name)
+        start = time.perf_counter()
+        rows = loader.load_csv(csv_path, chunksize=chunksize)["inserted"]
+        seconds = time.perf_counter() - start
+        loader.close()
+    elif stage == "clean":
+        cleaner = DataCleaner(mongo_uri, db_name)
+        rows = cleaner.raw_collection.count_documents({})
+        start = time.perf_counter()
+        cleaner.clean(batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        cleaner.close()
+    else:
+        aggregator = DataAggregator(mongo_uri, db_name)
+        rows = aggregator.clean_collection.count_documents({})
+        start = time.perf_counter()
+        aggregator.aggregate_all()
+        seconds = time.perf_counter() - start
+        aggregator.close()
+    return {
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds) if seconds > 0 else 0,
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def run_size(rows: int, args: argparse.Namespace) -> dict[str, dict]:
+    csv_path = ensure_csv(Path(args.workdir), rows, args.seed, args.complete_text)
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for stage in STAGES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[stage] = pool.submit(
+                run_stage, stage, str(csv_path), args.mongo_uri, args.db, args.chunksize, args.batch_size
+            ).result()
+        result = results[stage]
+        print(f"{rows:>10}  {stage:<6}{result['seconds']:>10}{result['rows_per_sec']:>12}{result['peak_memory_mb']:>12}")
+    return results
+
+
+def regressions(baseline: dict, results: dict, threshold: float) -> list[str]:
+    """Stages slower, or hungrier, than the baseline by more than ``threshold``"""
+    problems = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                continue
+            if result["rows_per_sec"] < reference["rows_per_sec"] * (1 - threshold):
+                problems.append(
+                    f"{size} rows {stage}: {result['rows_per_sec']} rows/sec vs baseline {reference['rows_per_sec']}"
+                )
+            if (
+                result["peak_memory_mb"] and reference.get("peak_memory_mb")
+                and result["peak_memory_mb"] > reference["peak_memory_mb"] * (1 + threshold)
+            ):
+                problems.append(
+                    f"{size} rows {stage}: peak {result['peak_memory_mb']} MB vs baseline {reference['peak_memory_mb']} MB"
+                )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_bench")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 5_000_000, 20_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--complete-text", action="store_true",
+                        help="fill optional text so nearly every row survives validation")
+    parser.add_argument("--workdir", default="data/synthetic")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    mode.add_argument("--check", action="store_true", help="exit 1 if a stage regressed past --threshold")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'stage':<6}{'seconds':>10}{'rows/sec':>12}{'peak MB':>12}")
+    results = {str(rows): run_size(rows, args) for rows in args.sizes}
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps({
+            "meta": {
+                "seed": args.seed,
+                "complete_text": args.complete_text,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            },
+            "results": results,
+        }, indent=2))
+        print(f"Baseline written to {baseline_path}")
+    elif args.check:
+        baseline = json.loads(baseline_path.read_text())
+        if baseline["meta"]["seed"] != args.seed or baseline["meta"]["complete_text"] != args.complete_text:
+            sys.exit("Baseline was recorded with a different --seed / --complete-text")
+        problems = regressions(baseline["results"], results, args.threshold)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No stage regressed more than {args.threshold:.0%} against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare the single insert_many raw load against the parallel writer pool.
+
+Needs a running mongod (see docker-compose.yml). Run from the repo root:
+
+    python -m benchmarks.bench_raw_load --csv data/Real_Estate_Sales_2001-2023_GL.csv
+"""
+import argparse
+import time
+
+from src.raw_data import RawDataLoader
+
+
+def run(loader: RawDataLoader, csv_path: str, **options) -> dict:
+    start = time.perf_counter()
+    summary = loader.load_csv(csv_path, **options)
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": summary["inserted"],
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(summary["inserted"] / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_bench")
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    loader = RawDataLoader(args.mongo_uri, args.db)
+    results = {"single insert_many": run(loader, args.csv)}
+    for workers in args.workers:
+        results[f"{workers} writers"] = run(
+            loader, args.csv, workers=workers, batch_size=args.batch_size
+        )
+    loader.close()
+
+    baseline = results["single insert_many"]["rows_per_sec"]
+    print(f"{'mode':<22}{'rows':>10}{'seconds':>10}{'rows/sec':>12}{'speedup':>9}")
+    for mode, result in results.items():
+        speedup = result["rows_per_sec"] / baseline if baseline else 0.0
+        print(
+            f"{mode:<22}{result['rows']:>10}{result['seconds']:>10}"
+            f"{result['rows_per_sec']:>12}{speedup:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
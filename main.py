@@ -1,7 +1,17 @@
+import argparse
 import logging
+import sys
+from typing import Optional
 from src.raw_data import RawDataLoader
 from src.clean import DataCleaner
-from src.aggregate import DataAggregator
+from src.aggregate import DataAggregator, GOLD_SPECS
+from src.indexes import IndexManager
+from src.snapshot import DEFAULT_SNAPSHOT_DIR
+from src.codec import default_codec
+from src.parsing import ENGINES, default_engine
+from src.metrics import DEFAULT_METRICS_DIR, RunMetrics
+from src.manifest import STAGES, PipelineManifest, first_incomplete
+from src.async_pipeline import AsyncPipeline, utilization_table
 
 logging.basicConfig(
     level=logging.INFO,
@@ -9,50 +19,191 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def main() -> None:
-    """Run the data pipeline"""
-    mongo_uri = "mongodb://localhost:27017"
-    db_name = "real_estate_db"
-    csv_path = "data/Real_Estate_Sales_2001-2023_GL.csv"
-    
-    logger.info("=" * 50)
-    logger.info("Starting data pipeline")
-    logger.info("=" * 50)
-    
-    # RAW LAYER
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the real estate data pipeline")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_db")
+    parser.add_argument("--csv", default="data/Real_Estate_Sales_2001-2023_GL.csv")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="stages to consider, always run in pipeline order")
+    parser.add_argument("--force", action="store_true", help="run selected stages even if their inputs are unchanged")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                        help="continue the latest (or given) failed run from its first incomplete stage")
+    parser.add_argument("--mode", choices=("sequential", "async"), default="sequential",
+                        help="async overlaps raw, clean and gold as concurrent stages joined by bounded queues")
+    parser.add_argument("--queue-size", type=int, default=2, help="chunks allowed between two async stages")
+    parser.add_argument("--incremental", action="store_true", help="apply only the CSV delta to the raw layer")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--codec", default=default_codec())
+    parser.add_argument("--engine", choices=list(ENGINES), default=default_engine(),
+                        help="CSV parser; pyarrow reads blocks on several threads")
+    parser.add_argument("--metrics-dir", default=DEFAULT_METRICS_DIR)
+    parser.add_argument("--profile-step", metavar="STAGE.STEP",
+                        help='also cProfile and tracemalloc one step, e.g. "clean.convert_dates"')
+    return parser.parse_args(argv)
+
+#options a resumed run takes from the run it continues
+RUN_OPTIONS = ("csv", "mode", "queue_size", "incremental", "chunksize", "batch_size", "codec", "engine")
+
+def run_raw(args: argparse.Namespace, indexes: IndexManager, run_metrics: RunMetrics) -> dict:
     logger.info("\n### Raw Layer ###")
-    loader = RawDataLoader(mongo_uri, db_name)
-    raw_stats = loader.load_csv(csv_path)
+    loader = RawDataLoader(args.mongo_uri, args.db, codec=args.codec, metrics=run_metrics, engine=args.engine)
+    with indexes.deferred("real_estate_raw"):
+        raw_stats = loader.load_csv(args.csv, chunksize=args.chunksize, incremental=args.incremental)
     print(f"\nRaw Layer Stats:")
     print(f"  Row Count: {raw_stats['row_count']}")
     print(f"  Schema: {raw_stats['schema']}")
+    print(f"  Rows/sec: {raw_stats.get('rows_per_sec')}")
+    print(f"  Peak Memory (MB): {raw_stats.get('peak_memory_mb')}")
+    print(f"  Index Build (s): {indexes.build_seconds['real_estate_raw']}")
     loader.close()
-    
-    # CLEAN LAYER
+    return {"row_count": raw_stats["row_count"], "inserted": raw_stats["inserted"]}
+
+def run_clean(args: argparse.Namespace, indexes: IndexManager, run_metrics: RunMetrics) -> dict:
     logger.info("\n### Clean Layer ###")
-    cleaner = DataCleaner(mongo_uri, db_name)
-    clean_count = cleaner.clean()
+    cleaner = DataCleaner(args.mongo_uri, args.db, codec=args.codec, metrics=run_metrics)
+    with indexes.deferred("real_estate_clean"):
+        cleaner.clean(batch_size=args.batch_size)
     clean_stats = cleaner.get_stats()
     print(f"\nClean Layer Stats:")
     print(f"  Row Count: {clean_stats['row_count']}")
+    print(f"  Index Build (s): {indexes.build_seconds['real_estate_clean']}")
     print(f"  Sample Record: {clean_stats['sample'][0] if clean_stats['sample'] else 'None'}")
     cleaner.display_cleaned_data(limit=3)
+    snapshot = cleaner.publish_snapshot()
+    print(f"  Parquet Snapshot: {'reused' if snapshot.get('reused') else snapshot.get('rows', 'skipped')}")
+    for stage, report in cleaner.memory_report.items():
+        print(f"  Memory {stage} (MB): {report['before_mb']} -> {report['after_mb']}")
     cleaner.close()
-    
-    # AGGREGATION LAYER
+    return {"row_count": clean_stats["row_count"]}
+
+def run_gold(args: argparse.Namespace, indexes: IndexManager, run_metrics: RunMetrics) -> dict:
     logger.info("\n### Aggregation Layer ###")
-    aggregator = DataAggregator(mongo_uri, db_name)
+    aggregator = DataAggregator(
+        args.mongo_uri, args.db, snapshot_dir=DEFAULT_SNAPSHOT_DIR, codec=args.codec, metrics=run_metrics
+    )
+    gold_collections = [spec.collection for spec in GOLD_SPECS]
+    with indexes.deferred(*gold_collections):
+        gold_counts = aggregator.aggregate_all()
+
+    print(f"\nAggregation Layer Stats:")
+    print(f"  Cube Cells: {gold_counts['cube']}")
+    print(f"  Yearly Records: {gold_counts['yearly']}")
+    print(f"  Town Records: {gold_counts['town']}")
+    print(f"  Property Type Records: {gold_counts['property']}")
+    print(f"  Load / Compute / Write (s): {aggregator.timings['load_seconds']} / "
+          f"{aggregator.timings['compute_seconds']} / {aggregator.timings['write_seconds']}")
+    for stage, report in aggregator.memory_report.items():
+        print(f"  Memory {stage} (MB): {report['before_mb']} -> {report['after_mb']}")
+    print(f"  Index Build (s): {round(sum(indexes.build_seconds[name] for name in gold_collections), 4)}")
+    aggregator.close()
+    return dict(gold_counts)
+
+STAGE_RUNNERS = {"raw": run_raw, "clean": run_clean, "gold": run_gold}
+
+def run_overlapped(args: argparse.Namespace, indexes: IndexManager, run_metrics: RunMetrics) -> dict:
+    logger.info("\n### Raw + Clean + Aggregation Layers (async) ###")
+    pipeline = AsyncPipeline(
+        args.mongo_uri, args.db, chunksize=args.chunksize, queue_size=args.queue_size,
+        codec=args.codec, metrics=run_metrics, engine=args.engine,
+    )
+    collections = ["real_estate_raw", "real_estate_clean", *(spec.collection for spec in GOLD_SPECS)]
+    with indexes.deferred(*collections):
+        summary = pipeline.run(args.csv)
+    pipeline.close()
+
+    print(f"\nAsync Pipeline Stats:")
+    print(f"  Raw / Clean Rows: {summary['raw_rows']} / {summary['clean_rows']}")
+    print(f"  Gold Records: {summary['gold']}")
+    print(f"  Wall (s): {summary['wall_seconds']} (streaming {summary['stream_seconds']}, "
+          f"gold merge {summary['gold_merge_seconds']})")
+    print(f"  Peak Memory (MB): {summary['peak_memory_mb']}")
+    print(utilization_table(summary))
+    return {"raw_rows": summary["raw_rows"], "clean_rows": summary["clean_rows"], "gold": summary["gold"]}
+
+def fail(manifest: PipelineManifest, indexes: IndexManager, stages: list[str], error: Exception) -> None:
+    for stage in stages:
+        manifest.fail_stage(stage, error)
+    logger.exception(f"{', '.join(stages)} failed; rerun with --resume to continue from there")
+    indexes.close()
+    manifest.close()
+    sys.exit(1)
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the data pipeline"""
+    args = parse_args(argv)
+    #the overlapped stages only exist together: all of them run, or none
+    if args.mode == "async" and not args.resume and set(args.stages) != set(STAGES):
+        sys.exit(f"--mode async runs {', '.join(STAGES)} together; drop --stages or use --mode sequential")
+    run_metrics = RunMetrics(profile=args.profile_step)
+    manifest = PipelineManifest(args.mongo_uri, args.db)
+
+    #stages of a resumed run that already finished are not looked at again
+    done: set[str] = set()
+    if args.resume:
+        run = manifest.resume_run(None if args.resume == "latest" else args.resume)
+        for option in RUN_OPTIONS:
+            setattr(args, option, run["options"].get(option, getattr(args, option)))
+        stages = list(run["stages"])
+        pending = first_incomplete(run)
+        done = set(stages[:stages.index(pending)] if pending else stages)
+    else:
+        stages = [stage for stage in STAGES if stage in args.stages]
+        manifest.start_run(stages, {option: getattr(args, option) for option in RUN_OPTIONS})
     
-    yearly_count = aggregator.aggregate_by_year()
-    town_count = aggregator.aggregate_by_town()
-    property_count = aggregator.aggregate_by_property_type()
+    logger.info("=" * 50)
+    logger.info(f"Starting data pipeline (run {manifest.run_id})")
+    logger.info("=" * 50)
     
-    print(f"\nAggregation Layer Stats:")
-    print(f"  Yearly Records: {yearly_count}")
-    print(f"  Town Records: {town_count}")
-    print(f"  Property Type Records: {property_count}")
+    #secondary indexes are dropped for each bulk load and rebuilt after it
+    indexes = IndexManager(args.mongo_uri, args.db)
     
-    aggregator.close()
+    pending = [stage for stage in stages if stage not in done]
+    if args.mode == "async" and pending:
+        inputs = {stage: manifest.stage_inputs(stage, args.csv) for stage in pending}
+        if not args.force and all(manifest.is_current(stage, inputs[stage]) for stage in pending):
+            for stage in pending:
+                manifest.skip_stage(stage, "inputs unchanged since its last completed run")
+            print(f"\nAll Layers: skipped, inputs unchanged")
+            pending = []
+        else:
+            for stage in pending:
+                manifest.begin_stage(stage, inputs[stage])
+            try:
+                result = run_overlapped(args, indexes, run_metrics)
+            except Exception as e:
+                fail(manifest, indexes, pending, e)
+            for stage in pending:
+                #clean and gold now read what this run wrote
+                manifest.complete_stage(stage, manifest.stage_inputs(stage, args.csv), result)
+            pending = []
+
+    for stage in pending:
+        #inputs are read just before the stage, after upstream stages bumped their versions
+        inputs = manifest.stage_inputs(stage, args.csv)
+        if not args.force and manifest.is_current(stage, inputs):
+            manifest.skip_stage(stage, "inputs unchanged since its last completed run")
+            print(f"\n{stage.title()} Layer: skipped, inputs unchanged")
+            continue
+        manifest.begin_stage(stage, inputs)
+        try:
+            result = STAGE_RUNNERS[stage](args, indexes, run_metrics)
+        except Exception as e:
+            fail(manifest, indexes, [stage], e)
+        manifest.complete_stage(stage, inputs, result)
+    
+    indexes.close()
+    manifest.finish_run()
+    manifest.close()
+    
+    # RUN METRICS
+    print(f"\nPipeline Steps (run {run_metrics.run_id}):")
+    print(run_metrics.summary_table())
+    print(f"  Metrics JSON: {run_metrics.write_json(args.metrics_dir)}")
+    print(f"  Prometheus: {run_metrics.write_prometheus(args.metrics_dir)}")
+    for path in run_metrics.write_profile(args.metrics_dir):
+        print(f"  Profile: {path}")
     
     logger.info("=" * 50)
     logger.info("Pipeline completed")
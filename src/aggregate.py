@@ -1,16 +1,188 @@
-from pymongo import MongoClient
+from pymongo import UpdateOne
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional, Sequence, Union
+from src.codec import get_codec
+from src.connection import ConnectionProfile, connect, get_profile
+from src.dtypes import apply_dtype_plan, frame_memory_mb, plan_from_model
+from src.geo import GEOHASH_PRECISIONS, cell_column, cell_columns
+from src.metrics import RunMetrics, instrumented, track
+from src.sketches import (
+    HyperLogLog,
+    TDigest,
+    hash_values,
+    hlls_by_group,
+    merge_all_serialized,
+    merge_serialized,
+    tdigests_by_group,
+)
+from src.snapshot import SilverSnapshot
+from src.versions import bump_version, get_version
+import numpy as np
 import pandas as pd
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass(frozen=True)
+class Metric:
+    """One output column: ``func`` applied to ``column``
+
+    "mean", "sum" and "count" are exact; "quantile" (at ``q``) and "distinct"
+    are estimated from mergeable sketches.
+    """
+    name: str
+    column: str
+    func: str
+    q: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class GoldSpec:
+    """A gold table declared as group keys plus metrics
+
+    ``sketches`` keeps extra (column, kind) sketch state on every row without a
+    metric of its own, so coarser tables can be rolled up from it. A spec with
+    ``rollup_of`` is derived from that spec's state instead of the clean frame
+    whenever both are built together.
+    """
+    name: str
+    collection: str
+    group_keys: tuple[str, ...]
+    metrics: tuple[Metric, ...]
+    sort_by: Optional[str] = None
+    ascending: bool = False
+    sketches: tuple[tuple[str, str], ...] = ()
+    rollup_of: Optional[str] = None
+
+    @property
+    def columns(self) -> set[str]:
+        return (
+            set(self.group_keys)
+            | {metric.column for metric in self.metrics}
+            | {column for column, _ in self.sketches}
+        )
+
+    @property
+    def state_columns(self) -> list[str]:
+        """Columns whose (sum, count) state is kept on every gold row"""
+        return sorted({metric.column for metric in self.metrics if metric.func in MOMENT_FUNCS})
+
+    @property
+    def sketch_states(self) -> list[tuple[str, str]]:
+        """(column, sketch kind) pairs whose serialized sketch is kept on every gold row"""
+        return sorted({
+            (metric.column, SKETCH_KINDS[metric.func])
+            for metric in self.metrics
+            if metric.func in SKETCH_KINDS
+        } | set(self.sketches))
+
+
+MOMENT_FUNCS = ("mean", "sum", "count")
+SKETCH_KINDS = {"quantile": "tdigest", "distinct": "hll"}
+
+
+AVG_SALE = Metric("avg_sale_amount", "sale_amount", "mean")
+TOTAL_SALES = Metric("total_sales", "sale_amount", "sum")
+SALE_COUNT = Metric("sale_count", "sale_amount", "count")
+SALE_QUANTILES = (
+    Metric("p50_sale_amount", "sale_amount", "quantile", 0.5),
+    Metric("p90_sale_amount", "sale_amount", "quantile", 0.9),
+    Metric("p99_sale_amount", "sale_amount", "quantile", 0.99),
+)
+DISTINCT_ADDRESSES = Metric("approx_distinct_addresses", "address", "distinct")
+
+#every metric rollup() can answer from the cube
+ROLLUP_METRICS = (AVG_SALE, TOTAL_SALES, SALE_COUNT, *SALE_QUANTILES, DISTINCT_ADDRESSES)
+
+#finest grain: additive (sum, count) metrics per cell, plus the sketches that
+#quantile and distinct rollups merge; per-cell sketch metrics are not stored
+CUBE_SPEC = GoldSpec(
+    "cube", "real_estate_gold_cube", ("year", "town", "property_type"),
+    (AVG_SALE, TOTAL_SALES, SALE_COUNT),
+    sketches=(("address", "hll"), ("sale_amount", "tdigest")),
+)
+
+#geohash grid cells are prefixes of the clean layer's stored geohash, cut on load
+GEO_CELLS = {cell_column(precision): precision for precision in GEOHASH_PRECISIONS}
+GEO_METRICS = (SALE_COUNT, AVG_SALE, TOTAL_SALES, SALE_QUANTILES[0])
+
+#one table per resolution; each row also carries its coarser parent cells, so
+#the finest grid is the only one built from clean rows and the others roll up
+GEO_SPECS = tuple(
+    GoldSpec(
+        f"geo_{precision}", f"real_estate_gold_geo_{precision}",
+        tuple(cell_column(coarser) for coarser in sorted(GEOHASH_PRECISIONS) if coarser <= precision),
+        GEO_METRICS,
+        rollup_of=None if precision == max(GEOHASH_PRECISIONS) else f"geo_{max(GEOHASH_PRECISIONS)}",
+    )
+    for precision in sorted(GEOHASH_PRECISIONS, reverse=True)
+)
+
+GOLD_SPECS = (
+    CUBE_SPEC,
+    GoldSpec(
+        "yearly", "real_estate_gold_yearly", ("year",),
+        (AVG_SALE, TOTAL_SALES, SALE_COUNT, *SALE_QUANTILES, DISTINCT_ADDRESSES),
+        rollup_of="cube",
+    ),
+    GoldSpec(
+        "town", "real_estate_gold_town", ("town",),
+        (AVG_SALE, TOTAL_SALES, SALE_COUNT, *SALE_QUANTILES, DISTINCT_ADDRESSES),
+        sort_by="total_sales", rollup_of="cube",
+    ),
+    GoldSpec(
+        "property", "real_estate_gold_property", ("property_type",), (AVG_SALE, SALE_COUNT),
+        sort_by="sale_count", rollup_of="cube",
+    ),
+    *GEO_SPECS,
+)
+
+#every metric is derived from a mergeable state per column, stored on the gold
+#row as _state.<column>.sum / .count, or a serialized .tdigest / .hll sketch
+STATE_FIELD = "_state"
+
+#merged and one-pass sketches agree only approximately, so verify_incremental
+#compares sketch metrics with this relative tolerance
+SKETCH_TOLERANCE = 0.05
+
+#distinct-count columns are hashed once per frame into <column>__hash
+HASH_SUFFIX = "__hash"
+GOLD_BATCHES_COLLECTION = "real_estate_gold_batches"
+
+#bumped whenever any gold table changes, so readers (src.serving) can drop cached answers
+GOLD_VERSION = "real_estate_gold"
+
+BACKENDS = ("pandas", "mongo")
+
+#categorical group keys and downcast integers for every frame the specs run on
+CLEAN_DTYPES = plan_from_model()
+
+
 class DataAggregator:
     """
     Gold-layer aggregation using Pandas, then writing results back to MongoDB
     """
+    METRICS_STAGE = "gold"
 
-    def __init__(self, mongo_uri: str, db_name: str):
-        self.client = MongoClient(mongo_uri)
+    def __init__(
+        self,
+        mongo_uri: str,
+        db_name: str,
+        specs: tuple[GoldSpec, ...] = GOLD_SPECS,
+        backend: str = "pandas",
+        snapshot_dir: Optional[str] = None,
+        codec: str = "dict",
+        metrics: Optional[RunMetrics] = None,
+        profile: Union[str, ConnectionProfile] = "read_scan",
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown aggregation backend: {backend}")
+        #the gold stage is dominated by one scan of the clean layer (see src/connection.py)
+        self.profile = get_profile(profile)
+        self.client = connect(mongo_uri, self.profile)
         self.db = self.client[db_name]
 
         self.clean_collection = self.db["real_estate_clean"]
@@ -19,99 +191,603 @@ class DataAggregator:
         self.town_collection = self.db["real_estate_gold_town"]
         self.property_collection = self.db["real_estate_gold_property"]
 
-        logger.info("Connected to MongoDB (Aggregation Layer)")
+        self.specs = {spec.name: spec for spec in specs}
+        #"mongo" pushes the aggregation down as $group/$out pipelines
+        self.backend = backend
+        self.timings: dict[str, float] = {}
+        self.memory_report: dict[str, dict[str, float]] = {}
+        self.hash_columns = tuple(sorted({
+            column for spec in specs for column, kind in spec.sketch_states if kind == "hll"
+        }))
+        #read the silver layer from its Parquet snapshot while it is fresh
+        self.snapshot_dir = snapshot_dir
+        self.codec = get_codec(codec)
+        #per-step timings for the run, when the caller collects them
+        self.metrics = metrics
+
+        logger.info(f"Connected to MongoDB (Aggregation Layer, {backend} backend)")
 
-    def _load_clean_dataframe(self) -> pd.DataFrame:
-        """Load clean-layer MongoDB data into Pandas"""
-        logger.info("Loading clean data into Pandas DataFrame")
+    @instrumented("load_clean")
+    def _load_clean_dataframe(self, columns: Optional[set[str]] = None) -> pd.DataFrame:
+        """Load clean-layer MongoDB data into Pandas, projected to ``columns``"""
+        #resolved per load: the snapshot may have been republished since __init__
+        snapshot = SilverSnapshot.published(self.snapshot_dir) if self.snapshot_dir else None
+        if snapshot is not None and snapshot.is_fresh(get_version(self.db, "real_estate_clean")):
+            logger.info(f"Loading clean data from Parquet snapshot {snapshot.root}")
+            fields = {"geohash" if column in GEO_CELLS else column for column in columns} if columns else None
+            df = snapshot.read(sorted(fields) if fields else None)
+            if df.empty:
+                raise ValueError("Clean collection is empty")
+            return self._compact(df, columns)
 
-        cursor = self.clean_collection.find({}, {"_id": 0})
-        df = pd.DataFrame(list(cursor))
+        logger.info(f"Loading clean data into Pandas DataFrame ({self.profile.name} profile)")
+
+        projection = {"_id": 0}
+        if columns:
+            projection.update({"geohash" if column in GEO_CELLS else column: 1 for column in columns})
+
+        df = self.codec.read_frame(self.clean_collection, {}, projection, batch_size=self.profile.batch_size)
 
         if df.empty:
             raise ValueError("Clean collection is empty")
 
-        df["year"] = df["date_recorded"].str.slice(0, 4).astype(int)
+        return self._compact(df, columns)
+
+    def _compact(self, df: pd.DataFrame, columns: Optional[set[str]]) -> pd.DataFrame:
+        before_mb = frame_memory_mb(df)
+        df = self._prepare_frame(df, columns, self.hash_columns)
+        self.memory_report["gold_load"] = {"before_mb": before_mb, "after_mb": frame_memory_mb(df)}
+        logger.info(f"Gold input frame memory: {before_mb} MB -> {self.memory_report['gold_load']['after_mb']} MB")
         return df
 
+    @staticmethod
+    def _prepare_frame(
+        df: pd.DataFrame,
+        columns: Optional[set[str]] = None,
+        hash_columns: tuple[str, ...] = (),
+    ) -> pd.DataFrame:
+        """Hash sketch columns and apply the compact dtype plan the specs aggregate on"""
+        #year is stored by the clean stage; no spec groups on the date itself
+        if "year" in df.columns:
+            df["year"] = df["year"].astype("int16")
+        cells = [column for column in GEO_CELLS if columns is None or column in columns]
+        if cells:
+            if "geohash" not in df.columns:
+                #no document carried a location
+                df["geohash"] = None
+            df = cell_columns(df, tuple(GEO_CELLS[column] for column in cells))
+            for column in cells:
+                df[column] = df[column].astype("category")
+        if columns is not None:
+            unused = [column for column in ("date_recorded", "month", "geohash", "location") if column not in columns]
+            df = df.drop(columns=unused, errors="ignore")
+        for column in hash_columns:
+            if column in df.columns:
+                present = df[column].notna().to_numpy()
+                hashes = pd.Series(pd.NA, index=df.index, dtype="UInt64")
+                hashes[present] = hash_values(df[column])
+                df[column + HASH_SUFFIX] = hashes if not present.all() else hashes.astype(np.uint64)
+                #only the hashes are needed from here on
+                df = df.drop(columns=[column])
+        if "sale_amount" in df.columns:
+            df["sale_amount"] = pd.to_numeric(df["sale_amount"])
+        return apply_dtype_plan(df, CLEAN_DTYPES)
+
     # -----------------------------
-    # GOLD LAYER 1: YEARLY SUMMARY
+    # ENGINE: ONE LOAD, EVERY SPEC
     # -----------------------------
-    def aggregate_by_year(self) -> int:
-        df = self._load_clean_dataframe()
-
-        yearly = (
-            df.groupby("year")
-            .agg(
-                avg_sale_amount=("sale_amount", "mean"),
-                total_sales=("sale_amount", "sum"),
-                sale_count=("sale_amount", "count"),
-            )
-            .reset_index()
+    def aggregate_all(self) -> dict[str, int]:
+        """Load one projected frame and build every gold table from it"""
+        if self.backend == "mongo":
+            counts = self._aggregate_all_pushdown()
+            bump_version(self.db, GOLD_VERSION)
+            return counts
+
+        columns = set().union(*(spec.columns for spec in self.specs.values()))
+
+        start = time.perf_counter()
+        df = self._load_clean_dataframe(columns)
+        load_seconds = time.perf_counter() - start
+
+        counts = {}
+        states: dict[str, pd.DataFrame] = {}
+        compute_seconds = 0.0
+        write_seconds = 0.0
+        for spec in self.specs.values():
+            start = time.perf_counter()
+            #specs rolled up from a finer one (the cube) never rescan the frame
+            parent = states.get(spec.rollup_of)
+            with track(self, f"compute.{spec.name}", len(df) if parent is None else len(parent)) as timing:
+                if parent is not None:
+                    state = self._rollup_state(spec, parent)
+                else:
+                    state = self._partial_state(spec, df)
+                states[spec.name] = state
+                table = self._table(spec, state)
+                timing.rows_out = len(table)
+            compute_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            with track(self, f"write.{spec.name}", len(table)) as timing:
+                counts[spec.name] = timing.rows_out = self._write(spec, table)
+            write_seconds += time.perf_counter() - start
+
+        self.timings = {
+            "load_seconds": round(load_seconds, 4),
+            "compute_seconds": round(compute_seconds, 4),
+            "write_seconds": round(write_seconds, 4),
+        }
+        logger.info(
+            f"Gold tables built from {len(df)} rows: load {self.timings['load_seconds']}s, "
+            f"compute {self.timings['compute_seconds']}s, write {self.timings['write_seconds']}s"
         )
+        bump_version(self.db, GOLD_VERSION)
+        return counts
+
+    def partial_states(self, df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+        """State of every spec that is not rolled up from another, for one batch of clean records
+
+        States of several batches are combined by ``aggregate_partials``; used
+        when clean batches arrive one at a time (see src/async_pipeline.py).
+        """
+        columns = set().union(*(spec.columns for spec in self.specs.values()))
+        df = self._prepare_frame(df.drop(columns=["_id"], errors="ignore"), columns, self.hash_columns)
+        return {
+            spec.name: self._partial_state(spec, df)
+            for spec in self.specs.values() if spec.rollup_of not in self.specs
+        }
+
+    def aggregate_partials(self, partials: list[dict[str, pd.DataFrame]]) -> dict[str, int]:
+        """Merge per-batch states into full state, then write every gold table"""
+        if not partials:
+            raise ValueError("Clean collection is empty")
+
+        counts = {}
+        states: dict[str, pd.DataFrame] = {}
+        for spec in self.specs.values():
+            parent = states.get(spec.rollup_of)
+            #merging batch states that share group keys is a rollup onto the same keys
+            if parent is not None:
+                source = parent
+            else:
+                #a batch can have no groups at all, e.g. no located sale for the geo grid
+                frames = [partial[spec.name] for partial in partials]
+                source = pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+            with track(self, f"compute.{spec.name}", len(source)) as timing:
+                states[spec.name] = self._rollup_state(spec, source)
+                table = self._table(spec, states[spec.name])
+                timing.rows_out = len(table)
+            with track(self, f"write.{spec.name}", len(table)) as timing:
+                counts[spec.name] = timing.rows_out = self._write(spec, table)
+
+        bump_version(self.db, GOLD_VERSION)
+        return counts
+
+    def _build(self, spec: GoldSpec) -> int:
+        if self.backend == "mongo":
+            count = self._run_pipeline(spec)
+        else:
+            df = self._load_clean_dataframe(spec.columns)
+            count = self._write(spec, self._compute(spec, df))
+        bump_version(self.db, GOLD_VERSION)
+        return count
+
+    def _compute(self, spec: GoldSpec, df: pd.DataFrame) -> pd.DataFrame:
+        return self._table(spec, self._partial_state(spec, df))
+
+    def _table(self, spec: GoldSpec, state: pd.DataFrame) -> pd.DataFrame:
+        table = self._finalize(spec, state)
+        if spec.sort_by:
+            table = table.sort_values(spec.sort_by, ascending=spec.ascending)
+        return table
 
-        yearly["avg_sale_amount"] = yearly["avg_sale_amount"].round(2)
+    @staticmethod
+    def _partial_state(spec: GoldSpec, df: pd.DataFrame) -> pd.DataFrame:
+        """Group keys plus _state.<column>.sum/.count for one frame"""
+        aggregations = {}
+        for column in spec.state_columns:
+            aggregations[f"{STATE_FIELD}.{column}.sum"] = (column, "sum")
+            aggregations[f"{STATE_FIELD}.{column}.count"] = (column, "count")
+        #observed=True: categorical keys only yield groups present in the frame
+        keys = list(spec.group_keys)
+        grouped = df.groupby(keys, observed=True)
+        state = grouped.agg(**aggregations) if aggregations else pd.DataFrame(index=grouped.size().index)
 
-        records = yearly.to_dict(orient="records")
+        if spec.sketch_states:
+            #sketches for every group at once; rows with a missing key are numbered -1
+            codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        for column, kind in spec.sketch_states:
+            path = f"{STATE_FIELD}.{column}.{kind}"
+            if kind == "tdigest":
+                values = df[column].to_numpy(dtype=float, na_value=np.nan)
+                state[path] = tdigests_by_group(codes, values, len(state))
+            else:
+                if column + HASH_SUFFIX in df.columns:
+                    present = df[column + HASH_SUFFIX].notna().to_numpy()
+                    hashes = df[column + HASH_SUFFIX].to_numpy(dtype=np.uint64, na_value=0)[present]
+                else:
+                    present = df[column].notna().to_numpy()
+                    hashes = hash_values(df[column])
+                state[path] = hlls_by_group(codes[present], hashes, len(state))
+        return state.reset_index()
 
-        self.yearly_collection.drop()
-        self.yearly_collection.insert_many(records)
+    @staticmethod
+    def _rollup_state(spec: GoldSpec, state: pd.DataFrame) -> pd.DataFrame:
+        """Merge finer-grained state rows (e.g. cube cells) up to the spec's group keys
 
-        logger.info(f"Yearly gold records created: {len(records)}")
-        return len(records)
+        Sums and counts add; sketches merge, so no clean row is read again.
+        No group keys rolls everything up into one grand-total row.
+        """
+        keys = list(spec.group_keys)
+        grouped = state.groupby(keys if keys else np.zeros(len(state), dtype=np.int8), observed=True)
+        paths = [f"{STATE_FIELD}.{column}.{part}" for column in spec.state_columns for part in ("sum", "count")]
+        rolled = grouped[paths].sum() if paths else pd.DataFrame(index=grouped.size().index)
+
+        for column, kind in spec.sketch_states:
+            path = f"{STATE_FIELD}.{column}.{kind}"
+            rolled[path] = grouped[path].agg(lambda blobs: merge_all_serialized(kind, list(blobs)))
+        return rolled.reset_index(drop=not keys)
+
+    @staticmethod
+    def _finalize(spec: GoldSpec, state: pd.DataFrame) -> pd.DataFrame:
+        """Derive the spec's metrics from (sum, count) state columns"""
+        table = state[list(spec.group_keys)].copy()
+        for metric in spec.metrics:
+            if metric.func in SKETCH_KINDS:
+                sketches = state[f"{STATE_FIELD}.{metric.column}.{SKETCH_KINDS[metric.func]}"]
+                table[metric.name] = sketches.map(lambda data: _sketch_metric(metric, data))
+                continue
+            total = state[f"{STATE_FIELD}.{metric.column}.sum"]
+            count = state[f"{STATE_FIELD}.{metric.column}.count"]
+            if metric.func == "mean":
+                table[metric.name] = (total / count).round(2)
+            elif metric.func == "sum":
+                table[metric.name] = total
+            else:
+                table[metric.name] = count
+        state_columns = [column for column in state.columns if column.startswith(STATE_FIELD)]
+        return pd.concat([table, state[state_columns]], axis=1)
+
+    def _write(self, spec: GoldSpec, table: pd.DataFrame) -> int:
+        collection = self.db[spec.collection]
+        collection.drop()
+        #an empty table (e.g. a geo table when no row had a location) writes nothing
+        count = self.codec.insert_frame(collection, self._to_gold_frame(table))
+
+        logger.info(f"{spec.name.capitalize()} gold records created: {count}")
+        return count
+
+    @staticmethod
+    def _to_gold_frame(table: pd.DataFrame) -> pd.DataFrame:
+        """The table with its flat _state.* columns nested into one _state column"""
+        state_columns = [column for column in table.columns if column.startswith(STATE_FIELD)]
+        frame = table.drop(columns=state_columns)
+        states = []
+        for state in table[state_columns].to_dict(orient="records"):
+            nested: dict[str, dict[str, Any]] = {}
+            for path, value in state.items():
+                _, column, part = path.split(".")
+                nested.setdefault(column, {})[part] = value
+            states.append(nested)
+        frame[STATE_FIELD] = states
+        return frame
 
     # -----------------------------
-    # GOLD LAYER 2: TOWN SUMMARY
+    # CUBE ROLLUPS
     # -----------------------------
-    def aggregate_by_town(self) -> int:
-        df = self._load_clean_dataframe()
-
-        town = (
-            df.groupby("town")
-            .agg(
-                avg_sale_amount=("sale_amount", "mean"),
-                total_sales=("sale_amount", "sum"),
-                sale_count=("sale_amount", "count"),
+    def rollup(
+        self,
+        dims: Sequence[str] = (),
+        filters: Optional[dict[str, Any]] = None,
+        metrics: Optional[Sequence[str]] = None,
+    ) -> pd.DataFrame:
+        """Metrics for any subset of the cube's dimensions, read from the cube alone
+
+        ``filters`` maps a dimension to a value or a list of values; ``metrics``
+        picks names from ROLLUP_METRICS (all of them by default). Sketch state is
+        only fetched for the metrics asked for. real_estate_clean is never read.
+        """
+        cube = self.specs.get(CUBE_SPEC.name, CUBE_SPEC)
+        filters = filters or {}
+        unknown = (set(dims) | set(filters)) - set(cube.group_keys)
+        if unknown:
+            raise ValueError(f"Not a cube dimension: {sorted(unknown)}")
+        by_name = {metric.name: metric for metric in ROLLUP_METRICS}
+        if metrics is not None and set(metrics) - set(by_name):
+            raise ValueError(f"Cannot roll up metric(s) {sorted(set(metrics) - set(by_name))}")
+        chosen = ROLLUP_METRICS if metrics is None else tuple(by_name[name] for name in metrics)
+
+        spec = GoldSpec("rollup", cube.collection, tuple(dims), chosen)
+        state = self._load_cube_state(spec, filters)
+        table = self._finalize(spec, self._rollup_state(spec, state))
+        table = table.drop(columns=[column for column in table.columns if column.startswith(STATE_FIELD)])
+        return table.sort_values(list(dims)).reset_index(drop=True) if dims else table
+
+    def _load_cube_state(self, spec: GoldSpec, filters: dict[str, Any]) -> pd.DataFrame:
+        """Cube rows matching ``filters``, projected to the state ``spec`` needs, flattened"""
+        query = {
+            dim: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else value
+            for dim, value in filters.items()
+        }
+        paths = [f"{STATE_FIELD}.{column}.{part}" for column in spec.state_columns for part in ("sum", "count")]
+        paths += [f"{STATE_FIELD}.{column}.{kind}" for column, kind in spec.sketch_states]
+        projection = {"_id": 0, **{key: 1 for key in spec.group_keys}, **{path: 1 for path in paths}}
+
+        rows = []
+        for doc in self.db[spec.collection].find(query, projection):
+            state = doc.pop(STATE_FIELD, {})
+            for column, parts in state.items():
+                for part, value in parts.items():
+                    doc[f"{STATE_FIELD}.{column}.{part}"] = value
+            rows.append(doc)
+        state = pd.DataFrame(rows, columns=[*spec.group_keys, *paths])
+
+        sketch_paths = [f"{STATE_FIELD}.{column}.{kind}" for column, kind in spec.sketch_states]
+        if state[sketch_paths].isna().any(axis=None):
+            raise ValueError(
+                f"{spec.collection} has rows without sketch state; "
+                f"rebuild it with the pandas backend to roll up quantiles or distinct counts"
             )
-            .reset_index()
-            .sort_values("total_sales", ascending=False)
+        return state
+
+    # -----------------------------
+    # INCREMENTAL: FOLD A BATCH INTO GOLD
+    # -----------------------------
+    def fold_batch(self, df: pd.DataFrame, batch_id: str) -> dict[str, int]:
+        """Merge newly cleaned records into the existing gold tables in O(batch)
+
+        ``batch_id`` makes the fold idempotent: a batch already applied is skipped.
+        A pending marker is written first and each spec is recorded on it once its
+        upserts land, so a retry after a partial failure only folds the remaining specs.
+        The gold rows must carry _state, i.e. have been built by this version;
+        sketch state is only written by the pandas backend.
+        """
+        batches = self.db[GOLD_BATCHES_COLLECTION]
+        marker = batches.find_one({"_id": batch_id})
+        #markers written before per-spec tracking carry no status and were complete
+        if marker is not None and marker.get("status", "done") == "done":
+            logger.info(f"Batch {batch_id} already folded into gold, skipping")
+            return {spec.name: 0 for spec in self.specs.values()}
+
+        df = self._prepare_frame(
+            df.copy(), set().union(*(spec.columns for spec in self.specs.values())), self.hash_columns
+        )
+        if marker is None:
+            batches.insert_one({"_id": batch_id, "status": "pending", "specs_done": [], "rows": len(df)})
+            folded = set()
+        else:
+            folded = set(marker.get("specs_done", []))
+            logger.info(f"Resuming batch {batch_id}, already folded: {sorted(folded)}")
+
+        counts = {}
+        for spec in self.specs.values():
+            if spec.name in folded:
+                counts[spec.name] = 0
+                continue
+            with track(self, f"fold.{spec.name}", len(df)) as timing:
+                rows = self._partial_state(spec, df).to_dict(orient="records")
+                if spec.sketch_states:
+                    self._merge_stored_sketches(spec, rows)
+                operations = [
+                    UpdateOne(
+                        {key: row[key] for key in spec.group_keys},
+                        self._merge_update(spec, row),
+                        upsert=True,
+                    )
+                    for row in rows
+                ]
+                if operations:
+                    self.db[spec.collection].bulk_write(operations, ordered=False)
+                batches.update_one({"_id": batch_id}, {"$addToSet": {"specs_done": spec.name}})
+                counts[spec.name] = timing.rows_out = len(operations)
+
+        batches.update_one(
+            {"_id": batch_id},
+            {"$set": {"status": "done", "folded_at": datetime.now(timezone.utc)}},
         )
+        bump_version(self.db, GOLD_VERSION)
+        logger.info(f"Folded batch {batch_id} ({len(df)} rows) into gold: {counts}")
+        return counts
+
+    def _merge_stored_sketches(self, spec: GoldSpec, rows: list[dict[str, Any]]) -> None:
+        """Merge each batch row's sketches with the ones stored on its gold row"""
+        keys = list(spec.group_keys)
+        projection = {key: 1 for key in keys}
+        projection.update({"_id": 0, STATE_FIELD: 1})
+        stored = {
+            tuple(doc[key] for key in keys): doc.get(STATE_FIELD, {})
+            for doc in self.db[spec.collection].find(
+                {"$or": [{key: row[key] for key in keys} for row in rows]}, projection
+            )
+        } if rows else {}
+
+        for row in rows:
+            key = tuple(row[k] for k in keys)
+            for column, kind in spec.sketch_states:
+                path = f"{STATE_FIELD}.{column}.{kind}"
+                if key not in stored:
+                    continue
+                previous = stored[key].get(column, {}).get(kind)
+                if previous is None:
+                    raise ValueError(
+                        f"{spec.collection} row {key} has no {kind} sketch for {column}; "
+                        f"rebuild it with the pandas backend before folding batches"
+                    )
+                row[path] = merge_serialized(kind, previous, row[path])
+
+    @staticmethod
+    def _merge_update(spec: GoldSpec, row: dict[str, Any]) -> list[dict[str, Any]]:
+        """Pipeline update adding a batch's state to a gold row, then re-deriving metrics"""
+        merged = {}
+        for column in spec.state_columns:
+            for part in ("sum", "count"):
+                path = f"{STATE_FIELD}.{column}.{part}"
+                merged[path] = {"$add": [{"$ifNull": [f"${path}", 0]}, row[path]]}
+        #sketches were merged client-side by fold_batch
+        for column, kind in spec.sketch_states:
+            path = f"{STATE_FIELD}.{column}.{kind}"
+            merged[path] = {"$literal": row[path]}
+
+        metrics = {}
+        for metric in spec.metrics:
+            if metric.func in SKETCH_KINDS:
+                data = row[f"{STATE_FIELD}.{metric.column}.{SKETCH_KINDS[metric.func]}"]
+                metrics[metric.name] = {"$literal": _sketch_metric(metric, data)}
+                continue
+            total = f"${STATE_FIELD}.{metric.column}.sum"
+            count = f"${STATE_FIELD}.{metric.column}.count"
+            if metric.func == "mean":
+                metrics[metric.name] = {"$round": [{"$divide": [total, count]}, 2]}
+            else:
+                metrics[metric.name] = total if metric.func == "sum" else count
+        return [{"$set": merged}, {"$set": metrics}]
 
-        town["avg_sale_amount"] = town["avg_sale_amount"].round(2)
+    def verify_incremental(self, tolerance: float = 0.01) -> dict[str, list[str]]:
+        """Compare the stored gold tables with a full in-memory recompute"""
+        columns = set().union(*(spec.columns for spec in self.specs.values()))
+        df = self._load_clean_dataframe(columns)
 
-        records = town.to_dict(orient="records")
+        report = {}
+        for spec in self.specs.values():
+            keys = list(spec.group_keys)
+            expected = self._compute(spec, df).set_index(keys)
+            stored = pd.DataFrame(
+                list(self.db[spec.collection].find({}, {"_id": 0, STATE_FIELD: 0}))
+            )
+            stored = stored.set_index(keys) if not stored.empty else pd.DataFrame(columns=keys).set_index(keys)
 
-        self.town_collection.drop()
-        self.town_collection.insert_many(records)
+            problems = []
+            for key in expected.index.difference(stored.index):
+                problems.append(f"missing group {key}")
+            for key in stored.index.difference(expected.index):
+                problems.append(f"unexpected group {key}")
+            for key in expected.index.intersection(stored.index):
+                for metric in spec.metrics:
+                    want = expected.at[key, metric.name]
+                    got = stored.at[key, metric.name]
+                    allowed = (
+                        SKETCH_TOLERANCE * abs(float(want)) if metric.func in SKETCH_KINDS else tolerance
+                    )
+                    if abs(float(got) - float(want)) > allowed:
+                        problems.append(f"{key} {metric.name}: stored {got}, recomputed {want}")
+            report[spec.name] = problems
 
-        logger.info(f"Town gold records created: {len(records)}")
-        return len(records)
+        mismatched = sum(len(problems) for problems in report.values())
+        logger.info(f"Incremental gold verification: {mismatched} mismatches")
+        return report
 
     # -----------------------------
-    # GOLD LAYER 3: PROPERTY TYPE
+    # BACKEND: MONGODB PUSH-DOWN
     # -----------------------------
-    def aggregate_by_property_type(self) -> int:
-        df = self._load_clean_dataframe()
+    def _aggregate_all_pushdown(self) -> dict[str, int]:
+        """Run every spec as a server-side pipeline; nothing crosses the wire"""
+        start = time.perf_counter()
+        counts = {spec.name: self._run_pipeline(spec) for spec in self.specs.values()}
 
-        prop = (
-            df.groupby("property_type")
-            .agg(
-                avg_sale_amount=("sale_amount", "mean"),
-                sale_count=("sale_amount", "count"),
-            )
-            .reset_index()
-            .sort_values("sale_count", ascending=False)
-        )
+        #load, compute and write all happen inside mongod
+        self.timings = {
+            "load_seconds": 0.0,
+            "compute_seconds": round(time.perf_counter() - start, 4),
+            "write_seconds": 0.0,
+        }
+        logger.info(f"Gold tables built server-side in {self.timings['compute_seconds']}s")
+        return counts
+
+    def _run_pipeline(self, spec: GoldSpec) -> int:
+        with track(self, f"pipeline.{spec.name}") as timing:
+            self.clean_collection.aggregate(self._pipeline(spec), allowDiskUse=True)
+            count = timing.rows_out = self.db[spec.collection].count_documents({})
+        logger.info(f"{spec.name.capitalize()} gold records created: {count}")
+        return count
+
+    @staticmethod
+    def _pipeline(spec: GoldSpec) -> list[dict[str, Any]]:
+        """$group/$project/$sort/$out equivalent of _compute for one spec"""
+        #pandas drops groups whose key is missing
+        match = {"geohash" if key in GEO_CELLS else key: {"$ne": None} for key in spec.group_keys}
+        group_id = {
+            key: {"$substrCP": ["$geohash", 0, GEO_CELLS[key]]} if key in GEO_CELLS else f"${key}"
+            for key in spec.group_keys
+        }
 
-        prop["avg_sale_amount"] = prop["avg_sale_amount"].round(2)
+        #$group field names can't contain dots, so state is flattened until $project
+        group: dict[str, Any] = {"_id": group_id}
+        state: dict[str, dict[str, str]] = {}
+        for column in spec.state_columns:
+            group[f"{column}__sum"] = {"$sum": f"${column}"}
+            #pandas count skips missing values, so only count numbers
+            group[f"{column}__count"] = {"$sum": {"$cond": [{"$isNumber": f"${column}"}, 1, 0]}}
+            state[column] = {"sum": f"${column}__sum", "count": f"${column}__count"}
 
-        records = prop.to_dict(orient="records")
+        #sketch metrics use the server's own estimators; no sketch state is stored
+        quantiles: dict[str, list[float]] = {}
+        for metric in spec.metrics:
+            if metric.func == "quantile":
+                quantiles.setdefault(metric.column, []).append(metric.q)
+            elif metric.func == "distinct":
+                group[f"{metric.column}__distinct"] = {"$addToSet": f"${metric.column}"}
+        for column, points in quantiles.items():
+            group[f"{column}__quantiles"] = {
+                "$percentile": {"input": f"${column}", "p": points, "method": "approximate"}
+            }
 
-        self.property_collection.drop()
-        self.property_collection.insert_many(records)
+        project: dict[str, Any] = {"_id": 0}
+        project.update({key: f"$_id.{key}" for key in spec.group_keys})
+        for metric in spec.metrics:
+            if metric.func == "quantile":
+                position = quantiles[metric.column].index(metric.q)
+                project[metric.name] = {
+                    "$round": [{"$arrayElemAt": [f"${metric.column}__quantiles", position]}, 2]
+                }
+                continue
+            if metric.func == "distinct":
+                project[metric.name] = {"$size": f"${metric.column}__distinct"}
+                continue
+            total = f"${metric.column}__sum"
+            count = f"${metric.column}__count"
+            if metric.func == "mean":
+                project[metric.name] = {"$round": [{"$divide": [total, count]}, 2]}
+            else:
+                project[metric.name] = total if metric.func == "sum" else count
+        project[STATE_FIELD] = state
 
-        logger.info(f"Property gold records created: {len(records)}")
-        return len(records)
+        sort: dict[str, int] = {}
+        if spec.sort_by:
+            sort[spec.sort_by] = 1 if spec.ascending else -1
+        sort.update({key: 1 for key in spec.group_keys})
+
+        return [
+            {"$match": match},
+            {"$group": group},
+            {"$project": project},
+            {"$sort": sort},
+            {"$out": spec.collection},
+        ]
+
+    # -----------------------------
+    # GOLD LAYER 1: YEARLY SUMMARY
+    # -----------------------------
+    def aggregate_by_year(self) -> int:
+        return self._build(self.specs["yearly"])
+
+    # -----------------------------
+    # GOLD LAYER 2: TOWN SUMMARY
+    # -----------------------------
+    def aggregate_by_town(self) -> int:
+        return self._build(self.specs["town"])
+
+    # -----------------------------
+    # GOLD LAYER 3: PROPERTY TYPE
+    # -----------------------------
+    def aggregate_by_property_type(self) -> int:
+        return self._build(self.specs["property"])
 
     def close(self) -> None:
         self.client.close()
+
+
+def _sketch_metric(metric: Metric, data: bytes) -> Any:
+    """A quantile or distinct-count metric read off a serialized sketch"""
+    if metric.func == "quantile":
+        return round(TDigest.from_bytes(data).quantile(metric.q), 2)
+    return HyperLogLog.from_bytes(data).estimate()
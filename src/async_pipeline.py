@@ -0,0 +1,250 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+from src.aggregate import DataAggregator
+from src.clean import DataCleaner, SeenKeys
+from src.metrics import RunMetrics, peak_memory_mb
+from src.raw_data import RAW_VERSION, RawDataLoader
+from src.versions import bump_version
+import pandas as pd
+import asyncio
+import contextlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+#marks the end of the stream on every queue
+DONE = None
+
+#stage -> the queue it reads from (parse reads the CSV itself)
+STAGE_INPUTS = {
+    "parse": None,
+    "raw_insert": "parsed",
+    "clean": "raw",
+    "validate": "cleaned",
+    "clean_insert": "validated",
+    "gold_partial": "inserted",
+}
+
+
+@dataclass
+class StageStats:
+    """Where one stage spent the run: working, starved for input or blocked on output"""
+    items: int = 0
+    busy_seconds: float = 0.0
+    starved_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+
+
+class AsyncPipeline:
+    """
+    Raw, clean and gold as concurrent stages joined by bounded queues.
+
+    CSV parsing, raw insert, cleaning, validation, clean insert and the gold
+    partial aggregation each run as an asyncio task; the blocking pandas and
+    pymongo work is offloaded with ``asyncio.to_thread``. A full queue
+    suspends its producer, so at most ``queue_size`` chunks wait between any
+    two stages. Chunk N can be cleaned while chunk N+1 is inserted into the raw
+    layer and chunk N-1 is written to the clean one. The gold tables are
+    built from the merged per-chunk states once the last chunk arrives.
+    """
+
+    def __init__(
+        self,
+        mongo_uri: str,
+        db_name: str,
+        chunksize: int = 50_000,
+        queue_size: int = 2,
+        codec: str = "dict",
+        metrics: Optional[RunMetrics] = None,
+        sample_seconds: float = 0.05,
+        engine: str = "c",
+    ):
+        self.loader = RawDataLoader(mongo_uri, db_name, codec=codec, metrics=metrics, engine=engine)
+        self.cleaner = DataCleaner(mongo_uri, db_name, codec=codec, metrics=metrics)
+        self.aggregator = DataAggregator(mongo_uri, db_name, codec=codec, metrics=metrics)
+        self.chunksize = chunksize
+        self.queue_size = queue_size
+        self.sample_seconds = sample_seconds
+        self.stats: dict[str, StageStats] = {}
+        #queue name -> sampled depths
+        self.depths: dict[str, list[int]] = {}
+
+    def run(self, filepath: str) -> dict[str, Any]:
+        return asyncio.run(self.run_async(filepath))
+
+    async def run_async(self, filepath: str) -> dict[str, Any]:
+        logger.info(
+            f"Async pipeline over {filepath} (chunks of {self.chunksize} rows, queues of {self.queue_size})"
+        )
+        queues = {
+            name: asyncio.Queue(maxsize=self.queue_size)
+            for name in ("parsed", "raw", "cleaned", "validated", "inserted")
+        }
+        self.stats = {stage: StageStats() for stage in STAGE_INPUTS}
+        self.depths = {name: [] for name in queues}
+        partials: list[dict[str, pd.DataFrame]] = []
+        #64-bit hashes of (address, date_recorded) kept across chunks
+        seen_keys = SeenKeys()
+        totals = {"raw_rows": 0, "clean_rows": 0}
+
+        await asyncio.to_thread(self.loader.collection.delete_many, {})
+        await asyncio.to_thread(self.cleaner.clean_collection.delete_many, {})
+
+        def insert_raw(chunk: pd.DataFrame) -> pd.DataFrame:
+            totals["raw_rows"] += self.loader._insert_chunk(chunk, {})
+            return chunk
+
+        def insert_clean(validated: pd.DataFrame) -> pd.DataFrame:
+            totals["clean_rows"] += self.cleaner.codec.insert_frame(
+                self.cleaner.clean_collection, validated, ordered=False
+            )
+            return validated
+
+        def gold_partial(validated: pd.DataFrame) -> None:
+            if len(validated):
+                partials.append(self.aggregator.partial_states(validated))
+
+        start = time.perf_counter()
+        with self.loader.engine.iter_chunks(filepath, self.chunksize) as reader:
+            monitor = asyncio.create_task(self._sample_depths(queues))
+            try:
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(self._source("parse", lambda: next(reader, None), queues["parsed"]))
+                    group.create_task(self._stage("raw_insert", insert_raw, queues["parsed"], queues["raw"]))
+                    group.create_task(self._stage(
+                        "clean", lambda chunk: self.cleaner._transform(chunk, seen_keys),
+                        queues["raw"], queues["cleaned"],
+                    ))
+                    group.create_task(self._stage(
+                        "validate", self.cleaner._validate_frame, queues["cleaned"], queues["validated"]
+                    ))
+                    group.create_task(self._stage(
+                        "clean_insert", insert_clean, queues["validated"], queues["inserted"]
+                    ))
+                    group.create_task(self._stage("gold_partial", gold_partial, queues["inserted"], None))
+            finally:
+                #wait for the sampler to unwind so no task outlives the run
+                monitor.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await monitor
+        streamed = time.perf_counter() - start
+
+        #the versions the sequential stages would have stamped
+        await asyncio.to_thread(bump_version, self.loader.db, RAW_VERSION)
+        await asyncio.to_thread(bump_version, self.cleaner.db, "real_estate_clean")
+        gold_start = time.perf_counter()
+        gold_counts = await asyncio.to_thread(self.aggregator.aggregate_partials, partials)
+        gold_seconds = time.perf_counter() - gold_start
+
+        wall = time.perf_counter() - start
+        summary = {
+            **totals,
+            "gold": gold_counts,
+            "wall_seconds": round(wall, 4),
+            "stream_seconds": round(streamed, 4),
+            "gold_merge_seconds": round(gold_seconds, 4),
+            "peak_memory_mb": peak_memory_mb(),
+            "stages": {
+                stage: {
+                    "items": stats.items,
+                    "busy_seconds": round(stats.busy_seconds, 4),
+                    "starved_seconds": round(stats.starved_seconds, 4),
+                    "blocked_seconds": round(stats.blocked_seconds, 4),
+                    #share of the streaming phase this stage spent doing work
+                    "utilization": round(stats.busy_seconds / streamed, 3) if streamed > 0 else 0.0,
+                }
+                for stage, stats in self.stats.items()
+            },
+            "queues": {
+                name: {
+                    "capacity": self.queue_size,
+                    "max_depth": max(depths, default=0),
+                    "mean_depth": round(sum(depths) / len(depths), 2) if depths else 0.0,
+                }
+                for name, depths in self.depths.items()
+            },
+        }
+        logger.info(
+            f"Async pipeline: {totals['raw_rows']} raw, {totals['clean_rows']} clean rows "
+            f"in {summary['wall_seconds']}s (gold merge {summary['gold_merge_seconds']}s)"
+        )
+        return summary
+
+    async def _source(self, name: str, produce: Callable[[], Any], outbox: asyncio.Queue) -> None:
+        """Pull items from a blocking iterator until it returns None"""
+        stats = self.stats[name]
+        while True:
+            item = await self._timed(stats, produce)
+            if item is None:
+                break
+            stats.items += 1
+            await self._put(stats, outbox, item)
+        await outbox.put(DONE)
+
+    async def _stage(
+        self,
+        name: str,
+        work: Callable[[Any], Any],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+    ) -> None:
+        stats = self.stats[name]
+        while True:
+            waited = time.perf_counter()
+            item = await inbox.get()
+            stats.starved_seconds += time.perf_counter() - waited
+            if item is DONE:
+                break
+            result = await self._timed(stats, work, item)
+            stats.items += 1
+            if outbox is not None:
+                await self._put(stats, outbox, result)
+        if outbox is not None:
+            await outbox.put(DONE)
+
+    @staticmethod
+    async def _timed(stats: StageStats, work: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        future = asyncio.ensure_future(asyncio.to_thread(work, *args))
+        try:
+            result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            #a thread cannot be interrupted, so when another stage fails let this one return
+            #before the run unwinds (and closes the CSV reader a parse may still be inside)
+            await asyncio.wait([future])
+            raise
+        stats.busy_seconds += time.perf_counter() - started
+        return result
+
+    @staticmethod
+    async def _put(stats: StageStats, outbox: asyncio.Queue, item: Any) -> None:
+        #backpressure: a full queue suspends the producer here
+        waited = time.perf_counter()
+        await outbox.put(item)
+        stats.blocked_seconds += time.perf_counter() - waited
+
+    async def _sample_depths(self, queues: dict[str, asyncio.Queue]) -> None:
+        while True:
+            for name, queue in queues.items():
+                self.depths[name].append(queue.qsize())
+            await asyncio.sleep(self.sample_seconds)
+
+    def close(self) -> None:
+        self.loader.close()
+        self.cleaner.close()
+        self.aggregator.close()
+
+
+def utilization_table(summary: dict[str, Any]) -> str:
+    """Per-stage utilization and the depth of the queue each stage reads from"""
+    header = f"{'stage':<14}{'items':>7}{'busy s':>10}{'starved s':>11}{'blocked s':>11}{'util':>7}{'in-queue depth':>18}"
+    lines = [header, "-" * len(header)]
+    for stage, stats in summary["stages"].items():
+        queue = summary["queues"].get(STAGE_INPUTS[stage])
+        depth = f"{queue['mean_depth']} avg / {queue['max_depth']} max" if queue else "-"
+        lines.append(
+            f"{stage:<14}{stats['items']:>7}{stats['busy_seconds']:>10.3f}{stats['starved_seconds']:>11.3f}"
+            f"{stats['blocked_seconds']:>11.3f}{stats['utilization']:>7.0%}{depth:>18}"
+        )
+    return "\n".join(lines)
@@ -1,55 +1,257 @@
+import numpy as np
 import pandas as pd
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from pydantic import ValidationError
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 from src.schemas import RealEstateDataClean
+from src.validation import ColumnarValidator
+from src.geo import geohash, parse_points, to_geojson
+from src.codec import get_codec
+from src.connection import ConnectionProfile, connect, get_profile
+from src.dtypes import apply_dtype_plan, frame_memory_mb, plan_from_model
+from src.versions import bump_version, get_version
+from src.snapshot import DEFAULT_SNAPSHOT_DIR, SilverSnapshot
+from src.metrics import RunMetrics, instrumented, track
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+RAW_DATE_FORMAT = '%m/%d/%Y'
+#raw date string -> parsed date, per format; a million rows carry only a few thousand distinct dates
+_parsed_dates: dict[str, dict[Any, np.datetime64]] = {}
+MAX_CACHED_DATES = 1_000_000
+
+
+def parse_dates(values: pd.Series, date_format: str = RAW_DATE_FORMAT) -> pd.Series:
+    """pd.to_datetime over the distinct strings only, memoized across batches; unparsable values are NaT"""
+    cache = _parsed_dates.setdefault(date_format, {})
+    if len(cache) > MAX_CACHED_DATES:
+        cache.clear()
+    codes, uniques = pd.factorize(values)
+    unseen = [value for value in uniques if value not in cache]
+    if unseen:
+        parsed = pd.to_datetime(pd.Series(unseen, dtype=object), format=date_format, errors='coerce')
+        cache.update(zip(unseen, parsed.to_numpy(dtype='datetime64[ns]')))
+    #code -1 (a missing value) picks the trailing NaT
+    lookup = np.array([cache[value] for value in uniques] + [np.datetime64('NaT')], dtype='datetime64[ns]')
+    return pd.Series(lookup[codes], index=values.index)
+
+
+class SeenKeys:
+    """Sorted 64-bit key hashes kept across batches, 8 bytes each instead of a Python int in a set"""
+
+    def __init__(self) -> None:
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Per key, whether an earlier batch already added it"""
+        positions = np.searchsorted(self.hashes, keys)
+        found = positions < len(self.hashes)
+        found[found] = self.hashes[positions[found]] == keys[found]
+        return found
+
+    def add(self, keys: np.ndarray) -> None:
+        """Merge keys not yet present, keeping the array sorted"""
+        keys = np.sort(keys)
+        self.hashes = np.insert(self.hashes, np.searchsorted(self.hashes, keys), keys)
+
+
 class DataCleaner:
+    METRICS_STAGE = "clean"
 
-    def __init__(self, mongo_uri: str, db_name: str):
-        self.client: MongoClient = MongoClient(mongo_uri)
+    def __init__(
+        self,
+        mongo_uri: str,
+        db_name: str,
+        validation: str = "columnar",
+        codec: str = "dict",
+        metrics: Optional[RunMetrics] = None,
+        profile: Union[str, ConnectionProfile] = "bulk_load",
+    ):
+        if validation not in ("columnar", "pydantic"):
+            raise ValueError(f"Unknown validation mode: {validation}")
+        self.mongo_uri = mongo_uri
+        self.db_name = db_name
+        #client settings, scan batch size and insert ordering (see src/connection.py)
+        self.profile = get_profile(profile)
+        self.client: MongoClient = connect(mongo_uri, self.profile)
         self.db = self.client[db_name]
         self.raw_collection = self.db['real_estate_raw']
         self.clean_collection = self.db['real_estate_clean']
+        #pydantic stays available as the per-row reference implementation
+        self.validation = validation
+        self.validator = ColumnarValidator(RealEstateDataClean)
+        #how raw documents are decoded into frames (see src/codec.py)
+        self.codec = get_codec(codec)
+        self.partition_stats: list[dict[str, Any]] = []
+        self.dtype_plan = plan_from_model(RealEstateDataClean)
+        #stage -> {before_mb, after_mb} of the largest frame compacted in that stage
+        self.memory_report: dict[str, dict[str, float]] = {}
+        #points / missing / invalid location counts across every batch cleaned
+        self.location_stats: dict[str, int] = {}
+        #per-step timings for the run, when the caller collects them
+        self.metrics = metrics
         logger.info(f"Connected to MongoDB: {db_name}")
 
-    def clean(self) -> int:
+    def clean(self, batch_size: Optional[int] = None, processes: int = 1) -> int:
+        """Run the cleaning chain
+
+        With ``batch_size`` the raw cursor is streamed; with ``processes`` > 1
+        each list_year partition is cleaned in its own worker process.
+        """
+        if processes > 1:
+            inserted = self._clean_parallel(processes)
+        elif batch_size:
+            inserted = self._clean_streaming(batch_size)
+        else:
+            inserted = self._clean_full()
+
+        if self.location_stats:
+            logger.info(f"Locations: {self.location_stats}")
+        #readers such as the Parquet snapshot key their freshness on this
+        self.version = bump_version(self.db, 'real_estate_clean')
+        return inserted
+
+    def _clean_full(self) -> int:
         logger.info("Starting transformation pipeline")
 
         #loading raw data
-        df = pd.DataFrame(list(self.raw_collection.find()))
+        with track(self, "read_raw") as timing:
+            df = self.codec.read_frame(self.raw_collection, batch_size=self.profile.batch_size)
+            timing.rows_out = len(df)
         logger.info(f"Loaded {len(df)} records")
 
-        #remoing id field
-        if '_id' in df.columns:
-            df = df.drop('_id', axis=1)
-
-        #cleaning
-        df = self._format_columns(df)
-        df = self._trim_whitespace(df)
-        df = self._convert_dates(df)
-        df = self._convert_numeric_columns(df)
-        df = self._remove_duplicates(df)
-        df = self._handle_missing_values(df)
-
+        df = self._transform(df)
         logger.info(f"After cleaning: {len(df)} records")
 
         #validating with pydantic
-        validated_records = self._validate_records(df)
+        validated = self._validate_frame(df)
 
         #loading to clean collection
         self.clean_collection.delete_many({})
-        if validated_records:
-            self.clean_collection.insert_many(validated_records)
-            logger.info(f"Inserted {len(validated_records)} records into clean collection")
+        if len(validated):
+            with track(self, "insert_clean", len(validated)) as timing:
+                timing.rows_out = self.codec.insert_frame(self.clean_collection, validated)
+            logger.info(f"Inserted {len(validated)} records into clean collection ({self.profile.name} profile)")
         else:
             logger.warning("No valid recrods to insert")
-        #logger.info(f"Loaded {len(validated_records)} valid records")
-        return len(validated_records)
-    
+        #logger.info(f"Loaded {len(validated)} valid records")
+        return len(validated)
+
+    def _clean_streaming(self, batch_size: int) -> int:
+        """Clean the raw cursor batch by batch so memory is bounded by batch_size"""
+        logger.info(f"Starting streaming transformation pipeline (batches of {batch_size})")
+        self.clean_collection.delete_many({})
+
+        #64-bit hashes of (address, date_recorded) kept across batches
+        seen_keys = SeenKeys()
+        loaded = 0
+        inserted = 0
+
+        frames = self.codec.iter_frames(self.raw_collection, batch_size)
+        while True:
+            with track(self, "read_raw") as timing:
+                df = next(frames, None)
+                timing.rows_out = 0 if df is None else len(df)
+            if df is None:
+                break
+            loaded += len(df)
+            df = self._transform(df, seen_keys)
+
+            validated = self._validate_frame(df)
+            if len(validated):
+                with track(self, "insert_clean", len(validated)) as timing:
+                    timing.rows_out = self.codec.insert_frame(self.clean_collection, validated, ordered=False)
+                inserted += len(validated)
+
+        logger.info(f"Inserted {inserted}/{loaded} records into clean collection")
+        return inserted
+
+    def _clean_parallel(self, processes: int) -> int:
+        """Clean list_year partitions concurrently in a process pool"""
+        logger.info(f"Starting parallel transformation pipeline ({processes} processes)")
+        self.clean_collection.delete_many({})
+        #workers write concurrently, so the unique index enforces the
+        #address/date_recorded rule across partitions
+        self.clean_collection.create_index(
+            [("address", 1), ("date_recorded", 1)], unique=True
+        )
+
+        sample = self.raw_collection.find_one()
+        if sample is None:
+            logger.warning("No valid recrods to insert")
+            return 0
+        raw_fields = dict(zip(self._format_columns(pd.DataFrame(columns=list(sample))).columns, sample))
+        partition_field = raw_fields['list_year']
+
+        partitions = sorted(
+            value for value in self.raw_collection.distinct(partition_field) if value is not None
+        )
+        if self.raw_collection.count_documents({partition_field: None}, limit=1):
+            partitions.append(None)
+        logger.info(f"Cleaning {len(partitions)} partitions on '{partition_field}'")
+
+        self.partition_stats = []
+        start = time.perf_counter()
+        #spawned workers each open their own MongoClient; forking a live client is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    _clean_partition, self.mongo_uri, self.db_name,
+                    partition_field, value, self.validation, self.codec.name, self.profile.name,
+                )
+                for value in partitions
+            ]
+            for future in as_completed(futures):
+                self.partition_stats.append(future.result())
+                stats = self.partition_stats[-1]
+                for key, count in stats["locations"].items():
+                    self.location_stats[key] = self.location_stats.get(key, 0) + count
+                #workers run in their own processes, so only their wall time is known here
+                if self.metrics is not None:
+                    self.metrics.record(
+                        self.METRICS_STAGE, "partition", stats["seconds"], 0.0, stats["loaded"], stats["inserted"]
+                    )
+
+        self.partition_stats.sort(key=lambda stats: stats["seconds"], reverse=True)
+        for stats in self.partition_stats:
+            logger.info(
+                f"  list_year={stats['list_year']}: {stats['inserted']}/{stats['loaded']} "
+                f"rows in {stats['seconds']}s ({stats['duplicates_resolved']} cross-partition duplicates)"
+            )
+
+        inserted = self.clean_collection.count_documents({})
+        logger.info(
+            f"Inserted {inserted} records into clean collection in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+        return inserted
+
+    def _transform(self, df: pd.DataFrame, seen_keys: Optional[SeenKeys] = None) -> pd.DataFrame:
+        """The cleaning chain shared by the full and streaming modes"""
+        #remoing id field and incremental-load bookkeeping
+        df = df.drop(columns=['_id', '_row_key', '_fingerprint'], errors='ignore')
+
+        #cleaning
+        df = self._format_columns(df)
+        df = self._trim_whitespace(df)
+        df = self._convert_dates(df)
+        df = self._convert_numeric_columns(df)
+        df = self._remove_duplicates(df, seen_keys)
+        df = self._handle_missing_values(df)
+        df = self._parse_locations(df)
+        df = self._compact_dtypes(df)
+        return df
+
+    @instrumented()
     def _format_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Appling snake case to column names")
         df.columns = (
@@ -61,6 +263,7 @@ class DataCleaner:
         )
         return df
     
+    @instrumented()
     def _trim_whitespace(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Stripping whitespace from text fields")
         string_columns = df.select_dtypes(include=['object']).columns
@@ -68,13 +271,16 @@ class DataCleaner:
             df[col] = df[col].str.strip()
         return df
     
+    @instrumented()
     def _convert_dates(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Converting dates")
-        df['date_recorded'] = pd.to_datetime(df['date_recorded'], format='%m/%d/%Y', errors='coerce')
-
-        df['date_recorded'] = df['date_recorded'].dt.strftime('%Y-%m-%d')
+        df['date_recorded'] = parse_dates(df['date_recorded'])
+        #integer partition keys, so gold grouping and range queries never re-parse dates
+        df['year'] = df['date_recorded'].dt.year
+        df['month'] = df['date_recorded'].dt.month
         return df
     
+    @instrumented()
     def _convert_numeric_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Converting data types")
         df['sale_amount'] = pd.to_numeric(df['sale_amount'], errors='coerce')
@@ -83,14 +289,25 @@ class DataCleaner:
         return df
     
     
-    def _remove_duplicates(self, df: pd.DataFrame) -> pd.DataFrame:
+    @instrumented()
+    def _remove_duplicates(self, df: pd.DataFrame, seen_keys: Optional[SeenKeys] = None) -> pd.DataFrame:
         #Only unique address/date_recorded pairs
         logger.info("Removing duplicates")
         initial_count = len(df)
-        df = df.drop_duplicates(subset=['address', 'date_recorded'])
+        if seen_keys is None:
+            df = df.drop_duplicates(subset=['address', 'date_recorded'])
+        else:
+            #streaming mode: also drop pairs already kept by an earlier batch
+            keys = pd.util.hash_pandas_object(df[['address', 'date_recorded']], index=False)
+            duplicate = keys.duplicated().to_numpy()
+            keys = keys.to_numpy()
+            duplicate |= seen_keys.contains(keys)
+            seen_keys.add(keys[~duplicate])
+            df = df[~duplicate]
         logger.info(f"Removed {initial_count - len(df)} duplicates")
         return df
 
+    @instrumented()
     def _handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Handling missing values")
         missing_values = ["", "na", "n/a", "null", "-", "NaT"]
@@ -104,22 +321,78 @@ class DataCleaner:
         
         return df
 
+    @instrumented()
+    def _parse_locations(self, df: pd.DataFrame) -> pd.DataFrame:
+        logger.info("Parsing locations")
+        if 'location' not in df.columns:
+            df['location'] = None
+        lon, lat, valid, missing = parse_points(df['location'])
+        #a bad point only loses the location, never the sale
+        df['location'] = to_geojson(lon, lat, valid)
+        df['geohash'] = geohash(lon, lat)
+
+        counts = {'points': int(valid.sum()), 'missing': int(missing.sum()), 'invalid': int((~valid & ~missing).sum())}
+        for key, count in counts.items():
+            self.location_stats[key] = self.location_stats.get(key, 0) + count
+        if counts['invalid']:
+            logger.info(f"Unparsable locations set to null: {counts['invalid']}")
+        return df
+
+    @instrumented()
+    def _compact_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        logger.info("Compacting dtypes")
+        before_mb = frame_memory_mb(df)
+        #nullable text stays object: validation tells None from NaN, a categorical cannot
+        df = apply_dtype_plan(df, self.dtype_plan, strict_missing=True)
+        after_mb = frame_memory_mb(df)
+        logger.info(f"Clean frame memory: {before_mb} MB -> {after_mb} MB")
+
+        largest = self.memory_report.get('clean')
+        if largest is None or before_mb > largest['before_mb']:
+            self.memory_report['clean'] = {'before_mb': before_mb, 'after_mb': after_mb}
+        return df
+
     def _validate_records(self, df: pd.DataFrame) -> list[dict[str, Any]]:
+        """Validated rows as plain records"""
+        return self._validate_frame(df).to_dict('records')
+
+    @instrumented("validate")
+    def _validate_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Validated rows, indexed by the rows of ``df`` they came from"""
+        if self.validation == "pydantic":
+            return self._validate_records_pydantic(df)
+
+        logger.info(f"Validating {len(df)} records (columnar)")
+        result = self.validator.validate(df)
+        if result.rejects:
+            logger.info(f"Rejected rows per rule: {result.rejects}")
+
+        logger.info(f"Validated {result.kept}/{len(df)} records")
+        return result.to_frame()
+
+    def _validate_records_pydantic(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info(f"Validating {len(df)} records")
     
         validated = []
+        kept = []
         records = df.to_dict('records')  
     
-        for record in records:
+        for label, record in zip(df.index, records):
             try:
                 validated_record = RealEstateDataClean(**record)
-                validated.append(validated_record.model_dump(mode="json"))
+                validated.append(validated_record.model_dump())
+                kept.append(label)
             except ValidationError as e:
                 #skip invalid rows
                 continue
     
         logger.info(f"Validated {len(validated)}/{len(records)} records")
-        return validated
+        return pd.DataFrame(validated, index=pd.Index(kept))
+
+    def publish_snapshot(self, root: str = DEFAULT_SNAPSHOT_DIR, partition_by_town: bool = False) -> dict[str, Any]:
+        """Publish the clean collection as a Parquet snapshot stamped with its version"""
+        snapshot = SilverSnapshot(root, partition_by_town=partition_by_town)
+        return snapshot.publish(self.clean_collection, get_version(self.db, 'real_estate_clean'))
 
     def get_stats(self) -> dict[str, Any]:
         return {
@@ -154,3 +427,72 @@ class DataCleaner:
     def close(self) -> None:
         self.client.close()
 
+
+
+def _clean_partition(
+    mongo_uri: str,
+    db_name: str,
+    partition_field: str,
+    value: Any,
+    validation: str,
+    codec: str = "dict",
+    profile: str = "bulk_load",
+) -> dict[str, Any]:
+    """Worker process: clean one list_year partition and write it to the clean collection"""
+    start = time.perf_counter()
+    cleaner = DataCleaner(mongo_uri, db_name, validation, codec, profile=profile)
+    try:
+        df = cleaner.codec.read_frame(
+            cleaner.raw_collection, {partition_field: value}, batch_size=cleaner.profile.batch_size
+        )
+        loaded = len(df)
+        raw_ids = df['_id'] if '_id' in df.columns else pd.Series(dtype=object)
+
+        df = cleaner._transform(df)
+        validated = cleaner._validate_frame(df)
+
+        #the clean document reuses the raw _id so cross-partition duplicates
+        #can be settled the way drop_duplicates would: the earliest row wins
+        if len(raw_ids):
+            validated.insert(0, '_id', raw_ids.loc[validated.index].to_numpy())
+
+        resolved = 0
+        inserted = 0
+        if len(validated):
+            try:
+                inserted = cleaner.codec.insert_frame(cleaner.clean_collection, validated, ordered=False)
+            except BulkWriteError as e:
+                inserted = e.details.get("nInserted", 0)
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != 11000:
+                        raise
+                    resolved += 1
+                    record = cleaner.codec.encode(validated.iloc[[error["index"]]])[0]
+                    inserted += _resolve_duplicate(cleaner.clean_collection, record)
+    finally:
+        cleaner.close()
+
+    return {
+        "list_year": value,
+        "loaded": loaded,
+        "inserted": inserted,
+        "duplicates_resolved": resolved,
+        "locations": cleaner.location_stats,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def _resolve_duplicate(collection, record: dict[str, Any]) -> bool:
+    """Keep whichever (address, date_recorded) row has the lowest raw _id; True if ``record`` was inserted"""
+    key = {"address": record["address"], "date_recorded": record["date_recorded"]}
+    while True:
+        displaced = collection.delete_one({**key, "_id": {"$gt": record["_id"]}})
+        if displaced.deleted_count == 0:
+            #an earlier row already holds the key
+            return False
+        try:
+            collection.insert_one(record)
+            return True
+        except DuplicateKeyError:
+            #another worker slipped in between; go around again
+            continue
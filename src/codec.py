@@ -0,0 +1,333 @@
+import os
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+import bson
+import numpy as np
+import pandas as pd
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+try:
+    from pymongoarrow.api import find_pandas_all
+except ImportError:  # pragma: no cover - optional dependency
+    find_pandas_all = None
+
+
+class DictCodec:
+    """
+    Moves frames through pymongo's own document path.
+
+    Encoding builds one dict per row from column lists (one tolist() per
+    column instead of to_dict's per-cell boxing); decoding iterates the cursor.
+    """
+    name = "dict"
+
+    def encode(self, df: pd.DataFrame) -> list[dict[str, Any]]:
+        """Rows of ``df`` as documents for insert_many / bulk_write"""
+        names = [str(column) for column in df.columns]
+        columns = [_column_values(df[column]) for column in df.columns]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+    def documents(self, df: pd.DataFrame) -> list:
+        """What insert_frame hands insert_many; each carries its _id once sent, so retries are safe"""
+        return self.encode(df)
+
+    def insert_frame(self, collection, df: pd.DataFrame, ordered: bool = True) -> int:
+        if df.empty:
+            return 0
+        docs = self.documents(df)
+        collection.insert_many(docs, ordered=ordered)
+        return len(docs)
+
+    def read_frame(
+        self,
+        collection,
+        query: Optional[dict[str, Any]] = None,
+        projection: Optional[dict[str, Any]] = None,
+        batch_size: int = 0,
+    ) -> pd.DataFrame:
+        return pd.DataFrame(list(collection.find(query or {}, projection, batch_size=batch_size)))
+
+    def iter_frames(
+        self,
+        collection,
+        batch_size: int,
+        query: Optional[dict[str, Any]] = None,
+        projection: Optional[dict[str, Any]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        batch = []
+        for doc in collection.find(query or {}, projection, batch_size=batch_size):
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
+
+
+def _column_values(col: pd.Series) -> list[Any]:
+    """Cell values for BSON; pd.NA in nullable numeric columns (e.g. Int64) becomes None"""
+    if isinstance(col.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_numeric_dtype(col) and col.hasnans:
+        return col.astype(object).where(col.notna(), None).tolist()
+    return col.tolist()
+
+
+class BsonCodec(DictCodec):
+    """
+    Moves frames as raw BSON in both directions.
+
+    Writes assemble every row's BSON column by column with numpy (see
+    _raw_documents), so no dict is built per row. Reads take whole server
+    batches and decode each in one bson.decode_all call; that still yields a
+    dict per document, only the arrow codec decodes column-wise.
+    """
+    name = "bson"
+
+    def documents(self, df: pd.DataFrame) -> list[RawBSONDocument]:
+        return _raw_documents(df)
+
+    def read_frame(
+        self,
+        collection,
+        query: Optional[dict[str, Any]] = None,
+        projection: Optional[dict[str, Any]] = None,
+        batch_size: int = 0,
+    ) -> pd.DataFrame:
+        docs = []
+        for raw in collection.find_raw_batches(query or {}, projection, batch_size=batch_size):
+            docs.extend(bson.decode_all(raw))
+        return pd.DataFrame(docs)
+
+    def iter_frames(
+        self,
+        collection,
+        batch_size: int,
+        query: Optional[dict[str, Any]] = None,
+        projection: Optional[dict[str, Any]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        #the server may cap a reply below batch_size, so re-chunk to exact batches
+        docs = []
+        for raw in collection.find_raw_batches(query or {}, projection, batch_size=batch_size):
+            docs.extend(bson.decode_all(raw))
+            while len(docs) >= batch_size:
+                yield pd.DataFrame(docs[:batch_size])
+                docs = docs[batch_size:]
+        if docs:
+            yield pd.DataFrame(docs)
+
+
+class ArrowCodec(BsonCodec):
+    """
+    Decodes whole frames column-wise through pymongoarrow, with no dict per row.
+
+    Writes and batched reads use the BSON codec: pymongoarrow's write builds a
+    dict per row itself and always inserts in order.
+    """
+    name = "arrow"
+
+    def __init__(self):
+        if find_pandas_all is None:
+            raise ImportError('The arrow codec needs pymongoarrow: pip install -e ".[mongoarrow]"')
+
+    def read_frame(
+        self,
+        collection,
+        query: Optional[dict[str, Any]] = None,
+        projection: Optional[dict[str, Any]] = None,
+        batch_size: int = 0,
+    ) -> pd.DataFrame:
+        return find_pandas_all(collection, query or {}, projection=projection, batch_size=batch_size)
+
+
+#BSON element type bytes
+DOUBLE, STRING, OBJECT_ID, BOOLEAN, DATETIME, NULL, INT32, INT64 = 0x01, 0x02, 0x07, 0x08, 0x09, 0x0A, 0x10, 0x12
+INT32_RANGE = (np.iinfo(np.int32).min, np.iinfo(np.int32).max)
+
+#one column's share of the documents: bytes per row and those bytes laid end to end
+Part = tuple[np.ndarray, np.ndarray]
+
+
+def _raw_documents(df: pd.DataFrame) -> list[RawBSONDocument]:
+    """
+    Rows of ``df`` as BSON documents, byte for byte what pymongo makes of
+    DictCodec.encode's dicts, with a fresh _id first unless ``df`` has one.
+
+    Each column is encoded for all rows at once and scattered into one buffer
+    that holds the documents back to back.
+    """
+    rows = len(df)
+    if not rows:
+        return []
+    parts = []
+    if "_id" not in df.columns:
+        parts.append(_fixed(np.ones(rows, dtype=bool), OBJECT_ID, "_id", _new_object_ids(rows)))
+    #pymongo writes _id first as well
+    columns = sorted(df.columns, key=lambda column: str(column) != "_id")
+    for column in columns:
+        parts.extend(_column_parts(str(column), df[column]))
+
+    sizes = 5 + sum((lengths for lengths, _ in parts), np.zeros(rows, dtype=np.int64))
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    buffer = np.empty(int(ends[-1]), dtype=np.uint8)
+    _scatter(buffer, starts, np.full(rows, 4), sizes.astype("<i4").view(np.uint8))
+    cursor = starts + 4
+    for lengths, flat in parts:
+        _scatter(buffer, cursor, lengths, flat)
+        cursor += lengths
+    buffer[cursor] = 0
+    data = buffer.tobytes()
+    return [RawBSONDocument(data[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def _scatter(buffer: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, flat: np.ndarray) -> None:
+    """Copy each row's ``lengths`` bytes of ``flat`` to ``buffer`` at that row's offset"""
+    if not flat.size:
+        return
+    width = int(lengths[0])
+    if width * len(lengths) == flat.size and (lengths == width).all():
+        buffer[(offsets[:, None] + np.arange(width)).ravel()] = flat
+    else:
+        shift = offsets - (np.cumsum(lengths) - lengths)
+        buffer[np.repeat(shift, lengths) + np.arange(flat.size)] = flat
+
+
+def _fixed(selected: np.ndarray, type_byte: int, name: str, payload: np.ndarray) -> Part:
+    """``type name value`` elements for the ``selected`` rows; ``payload`` has one row of bytes each"""
+    header = np.frombuffer(bytes([type_byte]) + name.encode() + b"\x00", dtype=np.uint8)
+    count = len(payload)
+    flat = np.hstack([np.broadcast_to(header, (count, header.size)), payload]).ravel()
+    return np.where(selected, header.size + payload.shape[1], 0), flat
+
+
+def _bytes_of(values: np.ndarray, dtype: str) -> np.ndarray:
+    """One row of little-endian bytes per value"""
+    return np.ascontiguousarray(values, dtype=dtype).view(np.uint8).reshape(len(values), np.dtype(dtype).itemsize)
+
+
+def _column_parts(name: str, col: pd.Series) -> list[Part]:
+    """Encoded elements of one column, in the types bson gives the DictCodec values"""
+    dtype = col.dtype
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_numeric_dtype(dtype) \
+            and not pd.api.types.is_bool_dtype(dtype):
+        #pd.NA becomes null
+        present = col.notna().to_numpy()
+        values = col[present].to_numpy(dtype="float64" if pd.api.types.is_float_dtype(dtype) else "int64")
+        return [*_numeric_parts(name, present, values), _nulls(name, ~present)]
+    if isinstance(dtype, np.dtype):
+        values = col.to_numpy()
+        everywhere = np.ones(len(col), dtype=bool)
+        if dtype.kind == "b":
+            return [_fixed(everywhere, BOOLEAN, name, _bytes_of(values, "u1"))]
+        #uint64 can overflow int64, so it goes through bson below
+        if dtype.kind in "if" or dtype.kind == "u" and dtype.itemsize < 8:
+            return _numeric_parts(name, everywhere, values)
+        if dtype.kind == "M" and not col.isna().any():
+            #bson keeps milliseconds, rounding down
+            millis = values.astype("datetime64[ms]").view("int64")
+            return [_fixed(everywhere, DATETIME, name, _bytes_of(millis, "<i8"))]
+    cells = np.asarray(_column_values(col), dtype=object)
+    if dtype == object and all(isinstance(cell, ObjectId) for cell in cells):
+        return [_object_ids(name, cells)]
+    if dtype == object or isinstance(dtype, pd.CategoricalDtype):
+        parts = _text_parts(name, cells)
+        if parts is not None:
+            return parts
+    return [_encoded(name, cells)]
+
+
+def _numeric_parts(name: str, present: np.ndarray, values: np.ndarray) -> list[Part]:
+    """Doubles, or ints as int32 where they fit and int64 elsewhere, as bson picks per value"""
+    if values.dtype.kind == "f":
+        return [_fixed(present, DOUBLE, name, _bytes_of(values, "<f8"))]
+    values = values.astype("int64", copy=False)
+    small = (values >= INT32_RANGE[0]) & (values <= INT32_RANGE[1])
+    rows_small = np.zeros(len(present), dtype=bool)
+    rows_small[present] = small
+    return [
+        _fixed(rows_small, INT32, name, _bytes_of(values[small], "<i4")),
+        _fixed(present & ~rows_small, INT64, name, _bytes_of(values[~small], "<i8")),
+    ]
+
+
+def _object_ids(name: str, ids: np.ndarray) -> Part:
+    binary = np.frombuffer(b"".join(oid.binary for oid in ids), dtype=np.uint8).reshape(len(ids), 12)
+    return _fixed(np.ones(len(ids), dtype=bool), OBJECT_ID, name, binary)
+
+
+_id_lock = threading.Lock()
+_id_state = {"pid": None, "random": b"", "counter": 0}
+
+
+def _new_object_ids(count: int) -> np.ndarray:
+    """
+    ``count`` ObjectIds as 12-byte rows, laid out as bson makes them: seconds,
+    a random value per process and a 24-bit counter. The random value is not
+    bson's own, so these never collide with ObjectId()s made alongside.
+    """
+    with _id_lock:
+        if _id_state["pid"] != os.getpid():
+            _id_state.update(pid=os.getpid(), random=os.urandom(5), counter=int.from_bytes(os.urandom(3), "big"))
+        first = _id_state["counter"]
+        _id_state["counter"] = (first + count) % (1 << 24)
+    ids = np.empty((count, 12), dtype=np.uint8)
+    ids[:, :4] = np.frombuffer(int(time.time()).to_bytes(4, "big"), dtype=np.uint8)
+    ids[:, 4:9] = np.frombuffer(_id_state["random"], dtype=np.uint8)
+    counters = (first + np.arange(count, dtype=np.uint32)) % (1 << 24)
+    ids[:, 9:] = counters.astype(">u4").view(np.uint8).reshape(count, 4)[:, 1:]
+    return ids
+
+
+def _nulls(name: str, selected: np.ndarray) -> Part:
+    return _fixed(selected, NULL, name, np.empty((int(selected.sum()), 0), dtype=np.uint8))
+
+
+def _text_parts(name: str, cells: np.ndarray) -> Optional[list[Part]]:
+    """Strings with None (null) and NaN (double) gaps; None for any other mix of values"""
+    missing = pd.isna(cells)
+    nones = np.zeros(len(cells), dtype=bool)
+    nones[missing] = [cell is None for cell in cells[missing]]
+    nans = missing & ~nones
+    texts = cells[~missing]
+    if pd.api.types.infer_dtype(texts, skipna=False) not in ("string", "empty") \
+            or not all(isinstance(cell, float) for cell in cells[nans]):
+        return None
+    joined = "\x00".join(texts)
+    if joined.count("\x00") != max(len(texts) - 1, 0):
+        return None
+    #every string followed by its terminator, as BSON lays them out
+    content = np.frombuffer(joined.encode() + b"\x00" if len(texts) else b"", dtype=np.uint8)
+    ends = np.flatnonzero(content == 0) + 1
+    sizes = np.diff(ends, prepend=0)
+    is_text = ~missing
+    content_lengths = np.zeros(len(cells), dtype=np.int64)
+    content_lengths[is_text] = sizes
+    return [
+        _fixed(is_text, STRING, name, _bytes_of(sizes, "<i4")),
+        (content_lengths, content),
+        _nulls(name, nones),
+        _fixed(nans, DOUBLE, name, _bytes_of(cells[nans].astype("float64"), "<f8")),
+    ]
+
+
+def _encoded(name: str, cells: np.ndarray) -> Part:
+    """Anything else (dicts, ObjectIds, mixed types) through bson itself, one cell at a time"""
+    elements = [bson.encode({name: cell})[4:-1] for cell in cells]
+    lengths = np.fromiter(map(len, elements), dtype=np.int64, count=len(elements))
+    return lengths, np.frombuffer(b"".join(elements), dtype=np.uint8)
+
+
+CODECS = {codec.name: codec for codec in (DictCodec, BsonCodec, ArrowCodec)}
+
+
+def get_codec(name: str) -> DictCodec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}")
+    return CODECS[name]()
+
+
+def default_codec() -> str:
+    """Fastest codec installed here"""
+    return "arrow" if find_pandas_all is not None else "bson"
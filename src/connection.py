@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from importlib.util import find_spec
+from typing import Any, Optional, Union
+from pymongo import MongoClient
+import logging
+
+logger = logging.getLogger(__name__)
+
+#wire compressors pymongo supports, in order of preference, and the module each needs
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+@dataclass(frozen=True)
+class ConnectionProfile:
+    """MongoClient settings for one kind of workload
+
+    ``batch_size`` and ``ordered`` are not client options; the stages read
+    them off the profile for their cursors and insert_many calls.
+    """
+    name: str
+    max_pool_size: int = 100
+    compressors: tuple[str, ...] = ()
+    #write concern; None keeps the server's default (majority on replica sets since 5.0)
+    w: Optional[Union[int, str]] = None
+    journal: Optional[bool] = None
+    #cursor batch size for scans, 0 lets the server pick
+    batch_size: int = 0
+    ordered: bool = True
+
+    def client_options(self) -> dict[str, Any]:
+        #appname shows up in the server log and currentOp, so every
+        #operation can be traced back to the profile that issued it
+        options: dict[str, Any] = {"appname": f"real-estate-etl/{self.name}", "maxPoolSize": self.max_pool_size}
+        compressors = available_compressors(self.compressors)
+        if compressors:
+            options["compressors"] = ",".join(compressors)
+        if self.w is not None:
+            options["w"] = self.w
+        if self.journal is not None:
+            options["journal"] = self.journal
+        return options
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        ConnectionProfile("default"),
+        #unordered, acknowledged by the primary only, not waiting on the journal
+        ConnectionProfile(
+            "bulk_load", max_pool_size=32, compressors=("zstd", "snappy", "zlib"),
+            w=1, journal=False, batch_size=10_000, ordered=False,
+        ),
+        #few connections, large cursor batches for full-collection reads
+        ConnectionProfile(
+            "read_scan", max_pool_size=8, compressors=("zstd", "snappy", "zlib"), batch_size=50_000,
+        ),
+    )
+}
+
+
+def available_compressors(preferred: tuple[str, ...]) -> list[str]:
+    """``preferred`` minus the compressors whose Python module is not installed"""
+    return [name for name in preferred if find_spec(COMPRESSOR_MODULES[name]) is not None]
+
+
+def get_profile(profile: Union[str, ConnectionProfile]) -> ConnectionProfile:
+    if isinstance(profile, ConnectionProfile):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown connection profile: {profile}")
+    return PROFILES[profile]
+
+
+def connect(mongo_uri: str, profile: Union[str, ConnectionProfile] = "default") -> MongoClient:
+    """MongoClient for ``mongo_uri`` configured by ``profile``; every stage connects through here"""
+    profile = get_profile(profile)
+    options = profile.client_options()
+    logger.info(
+        f"Connecting with the {profile.name} profile "
+        f"(compressors: {options.get('compressors', 'none')}, w: {options.get('w', 'default')}, "
+        f"pool: {profile.max_pool_size})"
+    )
+    return MongoClient(mongo_uri, **options)
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+
+import pandas as pd
+from pydantic import BaseModel
+
+from src.schemas import CATEGORY, RealEstateDataClean
+from src.validation import rules_from_model
+
+#a text column only becomes categorical when its distinct values are at most
+#this share of its rows; otherwise the codes plus categories outweigh the strings
+MAX_CATEGORY_RATIO = 0.5
+
+
+@dataclass(frozen=True)
+class DtypePlan:
+    """Compact pandas dtypes for a model's columns"""
+    categoricals: tuple[str, ...]
+    integers: tuple[str, ...]
+    nullable: frozenset[str]
+
+
+def plan_from_model(model: type[BaseModel] = RealEstateDataClean) -> DtypePlan:
+    """Categoricals are the fields marked with schemas.CATEGORY, integers the int fields"""
+    categoricals = []
+    integers = []
+    nullable = set()
+    for rule in rules_from_model(model):
+        extra = model.model_fields[rule.name].json_schema_extra
+        if isinstance(extra, dict) and extra.get("dtype") == CATEGORY["dtype"]:
+            categoricals.append(rule.name)
+        elif rule.kind is int:
+            integers.append(rule.name)
+        if rule.nullable:
+            nullable.add(rule.name)
+    return DtypePlan(tuple(categoricals), tuple(integers), frozenset(nullable))
+
+
+def apply_dtype_plan(df: pd.DataFrame, plan: DtypePlan, strict_missing: bool = False) -> pd.DataFrame:
+    """Downcast integer columns and turn low-cardinality text columns into categoricals
+
+    Floats keep float64 so stored values do not pick up float32 rounding, and
+    sums over downcast integers still widen to int64 in groupby. A categorical
+    stores None and NaN alike, so ``strict_missing`` leaves nullable text
+    columns as objects for callers (validation) that must tell them apart.
+    """
+    for column in plan.integers:
+        if column in df.columns and _is_plain_numeric(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+
+    for column in plan.categoricals:
+        if column not in df.columns or df[column].dtype != object:
+            continue
+        if strict_missing and column in plan.nullable:
+            continue
+        if df[column].nunique(dropna=True) <= MAX_CATEGORY_RATIO * len(df):
+            df[column] = df[column].astype("category")
+    return df
+
+
+def _is_plain_numeric(col: pd.Series) -> bool:
+    return (
+        pd.api.types.is_numeric_dtype(col)
+        and not pd.api.types.is_bool_dtype(col)
+        and not isinstance(col.dtype, pd.api.extensions.ExtensionDtype)
+    )
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """Deep memory footprint of ``df`` in MB, strings included"""
+    return round(df.memory_usage(deep=True).sum() / (1024 * 1024), 2)
+
@@ -0,0 +1,116 @@
+from typing import Any, Optional
+import numpy as np
+import pandas as pd
+
+#WKT as published in the raw CSV, e.g. "POINT (-72.6411 41.7658)"
+POINT_PATTERN = r"(?i)^\s*POINT\s*\(\s*([+-]?\d+(?:\.\d*)?|[+-]?\.\d+)\s+([+-]?\d+(?:\.\d*)?|[+-]?\.\d+)\s*\)\s*$"
+
+#geohash resolution stored on every clean document; ~1.2 x 0.6 km cells
+GEOHASH_PRECISION = 6
+
+#gold grid resolutions, finest first; every coarser cell is a prefix of a finer one
+GEOHASH_PRECISIONS = (6, 5, 4)
+
+_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32 = np.frombuffer(_ALPHABET.encode(), dtype=np.uint8)
+
+
+def parse_points(values: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Longitude, latitude, valid mask and missing mask for a column of WKT points
+
+    Missing values (None, NaN, pd.NA) are not invalid; anything else that is
+    not a POINT inside the WGS84 bounds is. Coordinates of non-valid rows are NaN.
+    """
+    missing = values.isna().to_numpy()
+    #non-strings come back from .str as NaN, so they count as invalid
+    parts = values.astype(object).str.extract(POINT_PATTERN)
+    lon = pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype=float)
+    lat = pd.to_numeric(parts[1], errors="coerce").to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        valid = (np.abs(lon) <= 180) & (np.abs(lat) <= 90)
+    lon[~valid] = np.nan
+    lat[~valid] = np.nan
+    return lon, lat, valid, missing
+
+
+def to_geojson(lon: np.ndarray, lat: np.ndarray, valid: np.ndarray) -> list[Optional[dict[str, Any]]]:
+    """GeoJSON Points for the valid rows, None elsewhere, as a 2dsphere index expects"""
+    return [
+        {"type": "Point", "coordinates": [x, y]} if ok else None
+        for x, y, ok in zip(lon.tolist(), lat.tolist(), valid.tolist())
+    ]
+
+
+def geohash(lon: np.ndarray, lat: np.ndarray, precision: int = GEOHASH_PRECISION) -> np.ndarray:
+    """Geohash strings (object array) for every coordinate pair; NaN pairs give None
+
+    Both axes are quantized to integers in one pass and their bits interleaved
+    with array shifts, instead of bisecting each point in a Python loop.
+    """
+    bits = 5 * precision
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+    present = ~(np.isnan(lon) | np.isnan(lat))
+    lon_cells = _quantize(np.where(present, lon, 0.0), -180.0, 180.0, lon_bits)
+    lat_cells = _quantize(np.where(present, lat, 0.0), -90.0, 90.0, lat_bits)
+
+    #geohash bits alternate longitude, latitude, ... starting from the top bit
+    code = np.zeros(len(lon), dtype=np.uint64)
+    for position in range(bits):
+        if position % 2 == 0:
+            bit = (lon_cells >> np.uint64(lon_bits - 1 - position // 2)) & np.uint64(1)
+        else:
+            bit = (lat_cells >> np.uint64(lat_bits - 1 - position // 2)) & np.uint64(1)
+        code = (code << np.uint64(1)) | bit
+
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.uint64) * np.uint64(5)
+    digits = (code[:, None] >> shifts) & np.uint64(31)
+    chars = _BASE32[digits.astype(np.intp)]
+    hashes = np.frombuffer(chars.tobytes(), dtype=f"S{precision}").astype(str).astype(object)
+    hashes[~present] = None
+    return hashes
+
+
+def _quantize(values: np.ndarray, low: float, high: float, bits: int) -> np.ndarray:
+    cells = np.floor((values - low) / (high - low) * (1 << bits))
+    return np.clip(cells, 0, (1 << bits) - 1).astype(np.uint64)
+
+
+def cell_column(precision: int) -> str:
+    """Name of the gold group key holding geohash cells of ``precision``"""
+    return f"geohash_{precision}"
+
+
+def cell_columns(df: pd.DataFrame, precisions: tuple[int, ...] = GEOHASH_PRECISIONS) -> pd.DataFrame:
+    """Add a geohash_<p> cell column per precision, cut from the stored geohash"""
+    for precision in precisions:
+        df[cell_column(precision)] = df["geohash"].str.slice(0, precision)
+    return df
+
+
+def decode_cell(cell: str) -> tuple[float, float, float, float]:
+    """(west, south, east, north) bounds of a geohash cell, for drawing tiles"""
+    bounds = [[-180.0, 180.0], [-90.0, 90.0]]
+    position = 0
+    for char in cell:
+        digit = _ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            axis = bounds[position % 2]
+            mid = (axis[0] + axis[1]) / 2
+            axis[0 if (digit >> shift) & 1 else 1] = mid
+            position += 1
+    return bounds[0][0], bounds[1][0], bounds[0][1], bounds[1][1]
+
+
+def near_query(lon: float, lat: float, max_meters: float) -> dict[str, Any]:
+    """Filter for clean documents within ``max_meters`` of a point, nearest first
+
+    Served by the 2dsphere index on ``location`` (see src/indexes.py).
+    """
+    return {
+        "location": {
+            "$nearSphere": {
+                "$geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "$maxDistance": max_meters,
+            }
+        }
+    }
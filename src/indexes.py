@@ -1,25 +1,243 @@
-from pymongo import MongoClient
+from pymongo import IndexModel
+from src.connection import connect
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, Union
+import argparse
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-def create_indexes(mongo_uri: str, db_name: str) -> None:
-    client = MongoClient(mongo_uri)
-    db = client[db_name]
 
+@dataclass(frozen=True)
+class IndexSpec:
+    """One index the pipeline expects on a collection (a direction may be "2dsphere")"""
+    collection: str
+    keys: tuple[tuple[str, Union[int, str]], ...]
+    unique: bool = False
+    name: Optional[str] = None
+    #False keeps the index through a deferred bulk load, for one the load itself reads
+    deferrable: bool = True
+
+    @property
+    def index_name(self) -> str:
+        #pymongo's default name, e.g. address_1_date_recorded_1
+        return self.name or "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def model(self) -> IndexModel:
+        return IndexModel(list(self.keys), name=self.index_name, unique=self.unique)
+
+
+INDEX_SPECS = (
+    #the incremental load scans it (hinted) for the stored fingerprints
+    IndexSpec("real_estate_raw", (("_row_key", 1), ("_fingerprint", 1)), name="row_fingerprint", deferrable=False),
+    IndexSpec("real_estate_raw", (("List Year", 1),)),
+    IndexSpec("real_estate_clean", (("date_recorded", 1),)),
+    IndexSpec("real_estate_clean", (("year", 1), ("month", 1))),
+    #GeoJSON points; documents whose location is null are left out of the index
+    IndexSpec("real_estate_clean", (("location", "2dsphere"),)),
+    IndexSpec("real_estate_clean", (("town", 1),)),
+    IndexSpec("real_estate_clean", (("property_type", 1),)),
+    IndexSpec("real_estate_clean", (("address", 1), ("date_recorded", 1)), unique=True),
+    IndexSpec("real_estate_gold_cube", (("year", 1), ("town", 1), ("property_type", 1)), unique=True),
+    IndexSpec("real_estate_gold_cube", (("town", 1),)),
+    IndexSpec("real_estate_gold_cube", (("property_type", 1),)),
+    IndexSpec("real_estate_gold_yearly", (("year", 1),)),
+    IndexSpec("real_estate_gold_town", (("town", 1),)),
+    IndexSpec("real_estate_gold_property", (("property_type", 1),)),
+    #a coarse cell prefix also finds every finer tile inside it
+    IndexSpec("real_estate_gold_geo_6", (("geohash_4", 1), ("geohash_5", 1), ("geohash_6", 1)), unique=True),
+    IndexSpec("real_estate_gold_geo_5", (("geohash_4", 1), ("geohash_5", 1)), unique=True),
+    IndexSpec("real_estate_gold_geo_4", (("geohash_4", 1),), unique=True),
+)
+
+#the filters (and sorts) the pipeline and its readers run, for the coverage report
+QUERY_PATTERNS = (
+    {"collection": "real_estate_raw", "filter": ("_row_key",), "used_by": "incremental load replace"},
+    {"collection": "real_estate_raw", "filter": ("List Year",), "used_by": "parallel clean partitions"},
+    {"collection": "real_estate_clean", "filter": ("address", "date_recorded"), "used_by": "duplicate resolution"},
+    {"collection": "real_estate_clean", "filter": ("town",), "used_by": "read_silver town filter"},
+    {"collection": "real_estate_clean", "filter": ("year",), "used_by": "read_silver year filter"},
+    {"collection": "real_estate_clean", "filter": ("date_recorded",), "used_by": "date range queries"},
+    {"collection": "real_estate_clean", "filter": ("property_type",), "used_by": "ad-hoc property lookups"},
+    {"collection": "real_estate_gold_cube", "filter": ("year", "town", "property_type"), "used_by": "fold_batch upsert"},
+    {"collection": "real_estate_gold_cube", "filter": ("year",), "used_by": "rollup year filter"},
+    {"collection": "real_estate_gold_cube", "filter": ("town",), "used_by": "rollup town filter"},
+    {"collection": "real_estate_gold_cube", "filter": ("property_type",), "used_by": "rollup property filter"},
+    {"collection": "real_estate_gold_yearly", "filter": ("year",), "used_by": "fold_batch upsert"},
+    {"collection": "real_estate_gold_town", "filter": ("town",), "used_by": "fold_batch upsert"},
+    {"collection": "real_estate_gold_town", "filter": (), "sort": ("total_sales",), "used_by": "top towns"},
+    {"collection": "real_estate_gold_property", "filter": ("property_type",), "used_by": "fold_batch upsert"},
+    {"collection": "real_estate_clean", "filter": ("location",), "used_by": "sales near a point (src/geo.py near_query)"},
+    {"collection": "real_estate_gold_geo_6", "filter": ("geohash_4", "geohash_5", "geohash_6"), "used_by": "fold_batch upsert"},
+    {"collection": "real_estate_gold_geo_6", "filter": ("geohash_4",), "used_by": "tiles inside a coarse cell"},
+    {"collection": "real_estate_gold_geo_5", "filter": ("geohash_4", "geohash_5"), "used_by": "fold_batch upsert"},
+    {"collection": "real_estate_gold_geo_4", "filter": ("geohash_4",), "used_by": "fold_batch upsert"},
+)
+
+
+class IndexManager:
+    """
+    Owns the index lifecycle: secondary indexes are dropped before a bulk
+    load, rebuilt in one pass afterwards and checked against INDEX_SPECS.
+    """
+
+    def __init__(self, mongo_uri: str, db_name: str, specs: tuple[IndexSpec, ...] = INDEX_SPECS):
+        self.client = connect(mongo_uri)
+        self.db = self.client[db_name]
+        self.specs = specs
+        self.build_seconds: dict[str, float] = {}
+
+    def specs_for(self, collection: str) -> list[IndexSpec]:
+        return [spec for spec in self.specs if spec.collection == collection]
+
+    def drop_secondary(self, collection: str) -> list[str]:
+        """Drop the managed non-unique indexes; unique and non-deferrable ones stay"""
+        existing = self.db[collection].index_information()
+        dropped = []
+        for spec in self.specs_for(collection):
+            if not spec.unique and spec.deferrable and spec.index_name in existing:
+                self.db[collection].drop_index(spec.index_name)
+                dropped.append(spec.index_name)
+        if dropped:
+            logger.info(f"Dropped {len(dropped)} secondary indexes on {collection} before load")
+        return dropped
+
+    def build(self, collection: str) -> float:
+        """Build every index spec'd for ``collection`` in one createIndexes call"""
+        specs = self.specs_for(collection)
+        start = time.perf_counter()
+        if specs:
+            self.db[collection].create_indexes([spec.model() for spec in specs])
+        seconds = round(time.perf_counter() - start, 4)
+        self.build_seconds[collection] = seconds
+        logger.info(f"Built {len(specs)} indexes on {collection} in {seconds}s")
+        return seconds
+
+    def verify(self, collection: str) -> list[str]:
+        """Differences between the live index set and the specs (empty when they match)"""
+        existing = self.db[collection].index_information()
+        problems = []
+        for spec in self.specs_for(collection):
+            info = existing.get(spec.index_name)
+            if info is None:
+                problems.append(f"missing {spec.index_name}")
+            elif [tuple(key) for key in info["key"]] != list(spec.keys):
+                problems.append(f"{spec.index_name} has keys {info['key']}")
+            elif bool(info.get("unique")) != spec.unique:
+                problems.append(f"{spec.index_name} unique={bool(info.get('unique'))}")
+
+        expected = {spec.index_name for spec in self.specs_for(collection)} | {"_id_"}
+        for name in existing:
+            if name not in expected:
+                problems.append(f"unexpected {name}")
+
+        if problems:
+            logger.warning(f"Index check on {collection}: {problems}")
+        return problems
+
+    @contextmanager
+    def deferred(self, *collections: str) -> Iterator[None]:
+        """Drop secondary indexes for the duration of a bulk load, then build and verify"""
+        for collection in collections:
+            self.drop_secondary(collection)
+        try:
+            yield
+        except BaseException:
+            #a failed load must not leave the collections without their indexes, but
+            #the load's error is the one to surface; a rebuild failure is only logged
+            try:
+                self._rebuild(collections)
+            except Exception:
+                logger.exception(f"Rebuilding indexes on {collections} after a failed load also failed")
+            raise
+        self._rebuild(collections)
+
+    def _rebuild(self, collections: tuple[str, ...]) -> None:
+        for collection in collections:
+            self.build(collection)
+            self.verify(collection)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def create_indexes(mongo_uri: str, db_name: str) -> None:
     logger.info("Creating MongoDB indexes")
 
-    db.real_estate_clean.create_index("date_recorded")
-    db.real_estate_clean.create_index("town")
-    db.real_estate_clean.create_index("property_type")
+    manager = IndexManager(mongo_uri, db_name)
+    for collection in sorted({spec.collection for spec in INDEX_SPECS}):
+        manager.build(collection)
+
+    manager.close()
+
+
+# -----------------------------
+# QUERY COVERAGE
+# -----------------------------
+def covering_index(pattern: dict[str, Any], specs: tuple[IndexSpec, ...] = INDEX_SPECS) -> Optional[str]:
+    """Name of an index whose key prefix serves the pattern's equality fields then its sort"""
+    wanted = set(pattern["filter"])
+    sort = list(pattern.get("sort", ()))
+    for spec in specs:
+        if spec.collection != pattern["collection"]:
+            continue
+        fields = [field for field, _ in spec.keys]
+        prefix = fields[:len(wanted)]
+        if set(prefix) == wanted and fields[len(wanted):len(wanted) + len(sort)] == sort:
+            return spec.index_name
+    return None
+
+
+def coverage_report(db=None) -> list[dict[str, Any]]:
+    """Which index serves each known query; with ``db`` the planner is asked via explain"""
+    report = []
+    for pattern in QUERY_PATTERNS:
+        entry = {
+            "collection": pattern["collection"],
+            "filter": list(pattern["filter"]),
+            "sort": list(pattern.get("sort", ())),
+            "used_by": pattern["used_by"],
+            "index": covering_index(pattern),
+        }
+        if db is not None:
+            entry["planner_index"] = _explained_index(db[pattern["collection"]], pattern)
+        report.append(entry)
+    return report
+
+
+def _explained_index(collection, pattern: dict[str, Any]) -> Optional[str]:
+    cursor = collection.find({field: None for field in pattern["filter"]})
+    if pattern.get("sort"):
+        cursor = cursor.sort([(field, -1) for field in pattern["sort"]])
+    stage = cursor.explain()["queryPlanner"]["winningPlan"]
+    while stage:
+        if stage.get("indexName"):
+            return stage["indexName"]
+        stage = stage.get("inputStage")
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report which index covers each pipeline query")
+    parser.add_argument("--mongo-uri", default=None, help="also ask the live query planner")
+    parser.add_argument("--db", default="real_estate_db")
+    args = parser.parse_args()
 
-    db.real_estate_clean.create_index(
-        [("address", 1), ("date_recorded", 1)],
-        unique=True
-    )
+    client = connect(args.mongo_uri) if args.mongo_uri else None
+    report = coverage_report(client[args.db] if client else None)
+    for entry in report:
+        query = ", ".join(entry["filter"]) or "-"
+        if entry["sort"]:
+            query += f" sort {', '.join(entry['sort'])}"
+        line = f"{entry['collection']:<28}{query:<36}{entry['index'] or 'COLLSCAN':<30}"
+        if "planner_index" in entry:
+            line += f"{entry['planner_index'] or 'COLLSCAN':<30}"
+        print(line + entry["used_by"])
+    if client:
+        client.close()
 
-    db.real_estate_gold_yearly.create_index("year")
-    db.real_estate_gold_town.create_index("town")
-    db.real_estate_gold_property.create_index("property_type")
 
-    client.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+from pymongo import DESCENDING, MongoClient
+from src.aggregate import GOLD_VERSION
+from src.connection import connect
+from src.raw_data import RAW_VERSION
+from src.versions import get_version
+import hashlib
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("raw", "clean", "gold")
+#collection version each stage stamps when it finishes (see src/versions.py)
+STAGE_OUTPUTS = {"raw": RAW_VERSION, "clean": "real_estate_clean", "gold": GOLD_VERSION}
+#version that feeds each downstream stage; raw is fed by the CSV itself
+STAGE_INPUTS = {"clean": RAW_VERSION, "gold": "real_estate_clean"}
+
+#one document per run: {_id: run_id, status, stages: {stage: {...}}, options}
+RUNS_COLLECTION = "pipeline_runs"
+#one document per stage: the inputs and output version of its last completed run
+STAGE_STATE_COLLECTION = "pipeline_stages"
+
+
+def file_fingerprint(path: str, known: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+    """Size, mtime and sha256 of ``path``
+
+    The hash is reused from ``known`` when size and mtime are unchanged, so an
+    untouched multi-GB CSV is not re-read on every run.
+    """
+    stat = Path(path).stat()
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if known and all(known.get(key) == value for key, value in fingerprint.items()):
+        fingerprint["sha256"] = known["sha256"]
+        return fingerprint
+
+    with open(path, "rb") as handle:
+        fingerprint["sha256"] = hashlib.file_digest(handle, "sha256").hexdigest()
+    return fingerprint
+
+
+class PipelineManifest:
+    """Run manifest and per-stage input fingerprints stored next to the data
+
+    A stage is current when its inputs (the CSV hash for raw, the upstream
+    collection version otherwise) match those of its last completed run and
+    its own output version has not moved since. A stage is marked incomplete
+    as soon as it starts, so a stage that died half way is never skipped.
+    """
+
+    def __init__(self, mongo_uri: str, db_name: str):
+        self.client: MongoClient = connect(mongo_uri)
+        self.db = self.client[db_name]
+        self.runs = self.db[RUNS_COLLECTION]
+        self.stage_state = self.db[STAGE_STATE_COLLECTION]
+        self.run_id: Optional[str] = None
+
+    # -----------------------------
+    # FINGERPRINTS
+    # -----------------------------
+    def stage_inputs(self, stage: str, csv_path: str) -> dict[str, Any]:
+        """What ``stage`` would read if it ran now"""
+        if stage == "raw":
+            state = self.stage_state.find_one({"_id": "raw"}) or {}
+            csv = file_fingerprint(csv_path, state.get("inputs", {}).get("csv"))
+            return {"csv": {"path": str(csv_path), **csv}}
+        return {"upstream_version": get_version(self.db, STAGE_INPUTS[stage])}
+
+    def is_current(self, stage: str, inputs: dict[str, Any]) -> bool:
+        """True if ``stage`` last completed on these inputs and its output is untouched since"""
+        state = self.stage_state.find_one({"_id": stage})
+        if not state or state.get("status") != "completed":
+            return False
+        output_version = get_version(self.db, STAGE_OUTPUTS[stage])
+        return (
+            output_version is not None
+            and state.get("output_version") == output_version
+            and _comparable(state.get("inputs", {})) == _comparable(inputs)
+        )
+
+    # -----------------------------
+    # RUN MANIFEST
+    # -----------------------------
+    def start_run(self, stages: list[str], options: dict[str, Any]) -> str:
+        self.run_id = uuid.uuid4().hex[:12]
+        self.runs.insert_one({
+            "_id": self.run_id,
+            "status": "running",
+            "started_at": _now(),
+            "stages": {stage: {"status": "pending"} for stage in stages},
+            "options": options,
+        })
+        logger.info(f"Started pipeline run {self.run_id} ({', '.join(stages)})")
+        return self.run_id
+
+    def resume_run(self, run_id: Optional[str] = None) -> dict[str, Any]:
+        """Reopen ``run_id``, or the latest run that did not complete"""
+        if run_id:
+            run = self.runs.find_one({"_id": run_id})
+        else:
+            run = self.runs.find_one({"status": {"$ne": "completed"}}, sort=[("started_at", DESCENDING)])
+        if run is None:
+            raise ValueError(f"No incomplete pipeline run to resume{f' with id {run_id}' if run_id else ''}")
+        if run["status"] == "completed":
+            raise ValueError(f"Pipeline run {run['_id']} already completed")
+
+        self.run_id = run["_id"]
+        self.runs.update_one({"_id": self.run_id}, {"$set": {"status": "running", "resumed_at": _now()}})
+        logger.info(f"Resuming pipeline run {self.run_id} at stage {first_incomplete(run)}")
+        return run
+
+    def begin_stage(self, stage: str, inputs: dict[str, Any]) -> None:
+        #invalidate first: if this stage dies its old completion must not be trusted
+        self.stage_state.update_one(
+            {"_id": stage}, {"$set": {"status": "running", "run_id": self.run_id}}, upsert=True
+        )
+        self._set_stage(stage, {"status": "running", "started_at": _now(), "inputs": inputs})
+
+    def complete_stage(self, stage: str, inputs: dict[str, Any], result: Optional[dict[str, Any]] = None) -> None:
+        output_version = get_version(self.db, STAGE_OUTPUTS[stage])
+        self.stage_state.replace_one(
+            {"_id": stage},
+            {
+                "status": "completed",
+                "run_id": self.run_id,
+                "inputs": inputs,
+                "output_version": output_version,
+                "completed_at": _now(),
+            },
+            upsert=True,
+        )
+        self._set_stage(stage, {
+            "status": "completed",
+            "finished_at": _now(),
+            "output_version": output_version,
+            "result": result or {},
+        })
+
+    def skip_stage(self, stage: str, reason: str) -> None:
+        logger.info(f"Skipping {stage} stage: {reason}")
+        self._set_stage(stage, {"status": "skipped", "reason": reason, "finished_at": _now()})
+
+    def fail_stage(self, stage: str, error: BaseException) -> None:
+        self._set_stage(stage, {"status": "failed", "error": repr(error), "finished_at": _now()})
+        self.finish_run("failed")
+
+    def finish_run(self, status: str = "completed") -> None:
+        self.runs.update_one({"_id": self.run_id}, {"$set": {"status": status, "finished_at": _now()}})
+        logger.info(f"Pipeline run {self.run_id} {status}")
+
+    def _set_stage(self, stage: str, fields: dict[str, Any]) -> None:
+        self.runs.update_one(
+            {"_id": self.run_id},
+            {"$set": {f"stages.{stage}.{key}": value for key, value in fields.items()}},
+        )
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def first_incomplete(run: dict[str, Any]) -> Optional[str]:
+    """First stage of ``run`` that neither completed nor was skipped"""
+    for stage, state in run["stages"].items():
+        if state.get("status") not in ("completed", "skipped"):
+            return stage
+    return None
+
+
+def _comparable(inputs: dict[str, Any]) -> dict[str, Any]:
+    #a touched but identical CSV (new mtime, same bytes) is still the same input
+    if "csv" in inputs:
+        return {**inputs, "csv": {key: inputs["csv"].get(key) for key in ("size", "sha256")}}
+    return inputs
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
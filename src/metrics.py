@@ -0,0 +1,276 @@
+import sys
+import cProfile
+import functools
+import json
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+DEFAULT_METRICS_DIR = "metrics"
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None if unsupported)"""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return round(peak / (1024 * 1024), 2)
+    return round(peak / 1024, 2)
+
+
+@dataclass
+class StepStats:
+    """Totals for one (stage, step) over every call in a run"""
+    stage: str
+    step: str
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    #how far the process's peak RSS rose while the step ran, summed over calls; not
+    #the step's net allocation: memory it frees again, or that stays under an earlier peak, adds 0
+    peak_rss_growth_mb: float = 0.0
+
+
+class StepTiming:
+    """Handle yielded by ``track``; set rows_in / rows_out when the caller knows them"""
+
+    def __init__(self, rows_in: Optional[int] = None):
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+
+
+class RunMetrics:
+    """
+    Per-step wall time, CPU time, rows in/out and peak RSS growth for one run.
+
+    CPU time is process-wide, so steps that overlap with writer threads also
+    count those threads' work. ``profile`` ("stage.step") additionally runs
+    that one step under cProfile and tracemalloc; the results are written
+    next to the JSON report. When calls of the step overlap (threads, async
+    stages), tracemalloc spans all of them and cProfile follows the thread
+    that started first.
+    """
+
+    def __init__(self, run_id: Optional[str] = None, profile: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started_at = datetime.now(timezone.utc)
+        self.steps: dict[tuple[str, str], StepStats] = {}
+        self.profile = profile
+        self._profiler: Optional[cProfile.Profile] = None
+        self._allocations: Optional[tracemalloc.Snapshot] = None
+        self._traced_peak_mb = 0.0
+        self._lock = threading.Lock()
+        #tracemalloc is process-wide: started by the first overlapping profiled call, stopped by the last
+        self._profile_lock = threading.Lock()
+        self._profiled_calls = 0
+        self._owns_tracing = False
+        self._profiled_thread: Optional[int] = None
+
+    @contextmanager
+    def track(self, stage: str, step: str, rows_in: Optional[int] = None) -> Iterator[StepTiming]:
+        timing = StepTiming(rows_in)
+        profiled = self.profile == f"{stage}.{step}"
+        if profiled:
+            self._start_profile()
+        peak_before = peak_memory_mb() or 0.0
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield timing
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            growth = (peak_memory_mb() or 0.0) - peak_before
+            if profiled:
+                self._stop_profile()
+            self.record(stage, step, wall, cpu, timing.rows_in, timing.rows_out, growth)
+
+    def record(
+        self,
+        stage: str,
+        step: str,
+        wall_seconds: float,
+        cpu_seconds: float,
+        rows_in: Optional[int] = None,
+        rows_out: Optional[int] = None,
+        peak_rss_growth_mb: float = 0.0,
+    ) -> None:
+        with self._lock:
+            stats = self.steps.setdefault((stage, step), StepStats(stage, step))
+            stats.calls += 1
+            stats.wall_seconds += wall_seconds
+            stats.cpu_seconds += cpu_seconds
+            stats.rows_in += rows_in or 0
+            stats.rows_out += rows_out or 0
+            stats.peak_rss_growth_mb += peak_rss_growth_mb
+
+    # -----------------------------
+    # OPT-IN PROFILING OF ONE STEP
+    # -----------------------------
+    def _start_profile(self) -> None:
+        with self._profile_lock:
+            self._profiled_calls += 1
+            if self._profiled_calls == 1:
+                #leave tracing that someone else started running
+                self._owns_tracing = not tracemalloc.is_tracing()
+                if self._owns_tracing:
+                    tracemalloc.start()
+                else:
+                    tracemalloc.reset_peak()
+            #cProfile hooks only the calling thread and cannot be shared between threads
+            if self._profiled_thread is None:
+                if self._profiler is None:
+                    self._profiler = cProfile.Profile()
+                self._profiler.enable()
+                self._profiled_thread = threading.get_ident()
+
+    def _stop_profile(self) -> None:
+        with self._profile_lock:
+            if self._profiled_thread == threading.get_ident():
+                self._profiler.disable()
+                self._profiled_thread = None
+            self._profiled_calls -= 1
+            if self._profiled_calls == 0:
+                _, peak = tracemalloc.get_traced_memory()
+                self._traced_peak_mb = max(self._traced_peak_mb, peak / (1024 * 1024))
+                self._allocations = tracemalloc.take_snapshot()
+                if self._owns_tracing:
+                    tracemalloc.stop()
+
+    def write_profile(self, directory: str = DEFAULT_METRICS_DIR) -> list[Path]:
+        """cProfile stats (.prof) and the top allocation sites (.txt) of the profiled step"""
+        if self._profiler is None:
+            return []
+        root = Path(directory)
+        root.mkdir(parents=True, exist_ok=True)
+        stem = f"profile_{self.run_id}_{self.profile}"
+        stats_path = root / f"{stem}.prof"
+        self._profiler.dump_stats(stats_path)
+
+        allocations_path = root / f"{stem}_allocations.txt"
+        lines = [f"traced peak: {self._traced_peak_mb:.2f} MB"]
+        lines += [str(stat) for stat in self._allocations.statistics("lineno")[:25]]
+        allocations_path.write_text("\n".join(lines) + "\n")
+        return [stats_path, allocations_path]
+
+    # -----------------------------
+    # REPORTS
+    # -----------------------------
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            "profile": self.profile,
+            "steps": [
+                {key: round(value, 4) if isinstance(value, float) else value for key, value in asdict(stats).items()}
+                for stats in self.steps.values()
+            ],
+        }
+
+    def write_json(self, directory: str = DEFAULT_METRICS_DIR) -> Path:
+        path = Path(directory) / f"run_{self.run_id}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+        return path
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format, e.g. for node_exporter's textfile collector"""
+        series = (
+            ("calls", "counter", "Calls of a pipeline step"),
+            ("wall_seconds", "counter", "Wall-clock seconds spent in a pipeline step"),
+            ("cpu_seconds", "counter", "Process CPU seconds spent in a pipeline step"),
+            ("rows_in", "counter", "Rows handed to a pipeline step"),
+            ("rows_out", "counter", "Rows produced by a pipeline step"),
+            ("peak_rss_growth_mb", "gauge", "Growth of peak RSS while a pipeline step ran, in MB"),
+        )
+        lines = []
+        for field, kind, description in series:
+            name = f"pipeline_step_{field}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for stats in self.steps.values():
+                labels = f'run_id="{self.run_id}",stage="{stats.stage}",step="{stats.step}"'
+                lines.append(f"{name}{{{labels}}} {getattr(stats, field)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, directory: str = DEFAULT_METRICS_DIR) -> Path:
+        path = Path(directory) / "pipeline.prom"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        #write then rename so a scraper never reads a half-written file
+        staging = path.with_suffix(".prom.tmp")
+        staging.write_text(self.to_prometheus())
+        staging.replace(path)
+        return path
+
+    def summary_table(self) -> str:
+        header = f"{'stage':<10}{'step':<28}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'rows in':>12}{'rows out':>12}{'peak +MB':>10}"
+        lines = [header, "-" * len(header)]
+        for stats in self.steps.values():
+            lines.append(
+                f"{stats.stage:<10}{stats.step:<28}{stats.calls:>7}{stats.wall_seconds:>10.3f}"
+                f"{stats.cpu_seconds:>10.3f}{stats.rows_in:>12}{stats.rows_out:>12}{stats.peak_rss_growth_mb:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def track(owner: Any, step: str, rows_in: Optional[int] = None) -> Iterator[StepTiming]:
+    """Measure a block as ``step`` of ``owner``'s stage; a no-op when owner has no metrics"""
+    metrics: Optional[RunMetrics] = getattr(owner, "metrics", None)
+    if metrics is None:
+        yield StepTiming(rows_in)
+        return
+    with metrics.track(owner.METRICS_STAGE, step, rows_in) as timing:
+        yield timing
+
+
+def instrumented(step: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Method decorator recording a call as ``step`` (default: the method name without "_")
+
+    Rows in are taken from a DataFrame first argument, rows out from the result.
+    """
+    def decorate(func: Callable) -> Callable:
+        name = step or func.__name__.lstrip("_")
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if getattr(self, "metrics", None) is None:
+                return func(self, *args, **kwargs)
+            rows_in = _row_count(args[0]) if args and isinstance(args[0], (pd.DataFrame, list)) else None
+            with track(self, name, rows_in) as timing:
+                result = func(self, *args, **kwargs)
+                timing.rows_out = _row_count(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def _row_count(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (pd.DataFrame, list)):
+        return len(value)
+    if isinstance(value, tuple) and value:
+        #e.g. a (rows, details) pair
+        return _row_count(value[0])
+    return None
@@ -0,0 +1,206 @@
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, ContextManager, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from src.schemas import RealEstateDataRaw
+from src.validation import rules_from_model
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pa_csv = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+#CSV headers of the published dataset, in RealEstateDataRaw field order
+HEADER_OVERRIDES = {"opm_remarks": "OPM remarks"}
+RAW_COLUMNS = [
+    HEADER_OVERRIDES.get(name, name.replace("_", " ").title())
+    for name in RealEstateDataRaw.model_fields
+]
+
+#pandas dtype per field annotation; ints are nullable so one blank cell does not
+#turn a column into floats, and str columns are read as text with no inference
+FIELD_DTYPES = {int: "Int64", float: "float64", str: "object"}
+
+#pandas' default NA strings, given to the Arrow reader so both engines agree
+NA_VALUES = (
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+)
+
+#leading bytes of the compressed inputs read transparently, whatever the file is named
+MAGIC_BYTES = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+
+
+def raw_dtypes(model: type[BaseModel] = RealEstateDataRaw) -> dict[str, str]:
+    """CSV header -> pandas dtype for every field of ``model``"""
+    return {
+        HEADER_OVERRIDES.get(rule.name, rule.name.replace("_", " ").title()): FIELD_DTYPES[rule.kind]
+        for rule in rules_from_model(model)
+    }
+
+
+def detect_compression(path: Union[str, Path]) -> Optional[str]:
+    """"gzip" or "zstd" from the file's magic bytes, None for plain (or missing) files"""
+    try:
+        with open(path, "rb") as handle:
+            head = handle.read(4)
+    except OSError:
+        return None
+    for magic, compression in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+class PandasEngine:
+    """
+    pandas' C parser with the declared dtypes.
+
+    Single-threaded, but streams in chunks without holding the file. gzip is
+    built in; zstd goes through zstandard, or pyarrow's decoder without it.
+    """
+    name = "c"
+
+    def __init__(self, dtypes: Optional[dict[str, str]] = None, na_values: Optional[tuple[str, ...]] = None):
+        self.dtypes = raw_dtypes() if dtypes is None else dtypes
+        #strings read as missing; None keeps NA_VALUES, pandas' defaults
+        self.na_values = na_values
+
+    def read(self, path: Union[str, Path]) -> pd.DataFrame:
+        """The whole file as one frame"""
+        with self._source(path) as (source, compression):
+            return self._finish(pd.read_csv(source, compression=compression, **self._options()))
+
+    def iter_chunks(self, path: Union[str, Path], chunksize: int) -> ContextManager[Iterator[pd.DataFrame]]:
+        """Frames of ``chunksize`` rows; use as ``with engine.iter_chunks(...) as reader``"""
+        return closing(self._chunks(path, chunksize))
+
+    def _chunks(self, path: Union[str, Path], chunksize: int) -> Iterator[pd.DataFrame]:
+        with self._source(path) as (source, compression):
+            with pd.read_csv(source, chunksize=chunksize, compression=compression, **self._options()) as reader:
+                for chunk in reader:
+                    yield self._finish(chunk)
+
+    @contextmanager
+    def _source(self, path: Union[str, Path]) -> Iterator[tuple]:
+        """(what to hand read_csv, its compression); pandas needs zstandard for zstd"""
+        compression = detect_compression(path)
+        if compression == "zstd" and zstandard is None:
+            if pa is None:
+                raise ImportError('zstd input needs zstandard or pyarrow: pip install -e ".[zstd]"')
+            with pa.input_stream(str(path), compression="zstd") as stream:
+                yield stream, None
+        else:
+            yield path, compression or "infer"
+
+    def _options(self) -> dict:
+        #the C parser's own Int64 conversion is ~50% slower than parsing floats and casting
+        dtypes = {column: "float64" if dtype == "Int64" else dtype for column, dtype in self.dtypes.items()}
+        if self.na_values is None:
+            return {"dtype": dtypes}
+        return {"dtype": dtypes, "keep_default_na": False, "na_values": list(self.na_values)}
+
+    def _finish(self, df: pd.DataFrame) -> pd.DataFrame:
+        #a non-integral value fails the cast, as it would fail an Int64 parse
+        for column, dtype in self.dtypes.items():
+            if dtype == "Int64" and column in df.columns:
+                df[column] = df[column].astype("Int64")
+        return df
+
+
+class ArrowEngine(PandasEngine):
+    """
+    pyarrow's CSV reader, which splits the file into blocks and parses and
+    converts them on a thread pool.
+
+    Reads gzip and zstd itself. Frames match the C engine's: declared ints come
+    back as Int64 and missing text as NaN rather than None.
+    """
+    name = "pyarrow"
+
+    def __init__(
+        self,
+        dtypes: Optional[dict[str, str]] = None,
+        na_values: Optional[tuple[str, ...]] = None,
+        block_size: int = 1 << 22,
+    ):
+        if pa_csv is None:
+            raise ImportError('The pyarrow engine needs pyarrow: pip install -e ".[arrow]"')
+        super().__init__(dtypes, na_values)
+        self.block_size = block_size
+
+    def read(self, path: Union[str, Path]) -> pd.DataFrame:
+        with self._open(path) as stream:
+            return self._to_frame(pa_csv.read_csv(stream, **self._arrow_options()), 0)
+
+    def _chunks(self, path: Union[str, Path], chunksize: int) -> Iterator[pd.DataFrame]:
+        #record batches follow the block size, so re-cut them to exact chunks
+        with self._open(path) as stream:
+            pending: list = []
+            rows = 0
+            offset = 0
+            for batch in pa_csv.open_csv(stream, **self._arrow_options()):
+                pending.append(batch)
+                rows += batch.num_rows
+                while rows >= chunksize:
+                    table = pa.Table.from_batches(pending)
+                    yield self._to_frame(table.slice(0, chunksize), offset)
+                    offset += chunksize
+                    rest = table.slice(chunksize)
+                    pending, rows = rest.to_batches(), rest.num_rows
+            if rows:
+                yield self._to_frame(pa.Table.from_batches(pending), offset)
+
+    def _open(self, path: Union[str, Path]):
+        #"detect" falls back to the file extension
+        return pa.input_stream(str(path), compression=detect_compression(path) or "detect")
+
+    def _arrow_options(self) -> dict:
+        #ints are read as float64 and cast afterwards, as the C engine does
+        types = {"Int64": pa.float64(), "float64": pa.float64(), "object": pa.string()}
+        return {
+            "read_options": pa_csv.ReadOptions(use_threads=True, block_size=self.block_size),
+            "convert_options": pa_csv.ConvertOptions(
+                column_types={column: types[dtype] for column, dtype in self.dtypes.items()},
+                null_values=list(NA_VALUES if self.na_values is None else self.na_values),
+                strings_can_be_null=True,
+            ),
+        }
+
+    def _to_frame(self, table, offset: int) -> pd.DataFrame:
+        df = table.to_pandas()
+        #continue the row numbering across chunks, as pandas' chunked reader does
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        #the null bitmap says where the None cells are, far cheaper than scanning the objects
+        for column, values in zip(table.column_names, table.columns):
+            if pa.types.is_string(values.type) and values.null_count:
+                cells = df[column].to_numpy(dtype=object, copy=True)
+                cells[values.is_null().to_numpy(zero_copy_only=False)] = np.nan
+                df[column] = cells
+        return self._finish(df)
+
+
+ENGINES = {engine.name: engine for engine in (PandasEngine, ArrowEngine)}
+
+
+def get_engine(name: str, **options: Any) -> PandasEngine:
+    """The named engine; ``options`` go to its constructor (dtypes, na_values, ...)"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown CSV engine: {name}")
+    return ENGINES[name](**options)
+
+
+def default_engine() -> str:
+    """Fastest CSV engine installed here"""
+    return "pyarrow" if pa_csv is not None else "c"
@@ -0,0 +1,399 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from html import escape
+from pathlib import Path
+from typing import Any, Iterable, Optional
+from src.codec import get_codec
+from src.connection import connect
+from src.metrics import peak_memory_mb
+from src.parsing import default_engine, get_engine, raw_dtypes
+from src.sketches import HyperLogLog, hash_values
+import numpy as np
+import pandas as pd
+import argparse
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+#values the clean stage treats as missing, compared stripped and lowercased
+MISSING_TOKENS = ("", "na", "n/a", "null", "-")
+
+#column -> (low, high, bins) of the fixed-bin histograms
+DEFAULT_HISTOGRAMS = {"sale_amount": (0.0, 3_000_000.0, 100)}
+
+#name -> key columns whose repeats are estimated; None means the whole row
+DEFAULT_DUPLICATE_KEYS = {"row": None, "address_date": ("address", "date_recorded")}
+
+#ingest bookkeeping on raw documents, not part of the data
+BOOKKEEPING_COLUMNS = ("_id", "_row_key", "_fingerprint")
+
+#pandas.api.types.infer_dtype kinds the .str accessor accepts
+TEXT_KINDS = ("string", "empty", "mixed", "mixed-integer")
+
+#rows kept as a sample of what the data looks like
+SAMPLE_ROWS = 5
+
+DEFAULT_PROFILE_DIR = "data/profile"
+
+
+@dataclass
+class KeyHashes:
+    """Every 64-bit key hash seen, in a growing array (8 bytes per row), counted at the end"""
+    hashes: np.ndarray = field(default_factory=lambda: np.empty(1024, dtype=np.uint64))
+    size: int = 0
+
+    def append(self, values: np.ndarray) -> None:
+        end = self.size + len(values)
+        if end > len(self.hashes):
+            #doubling keeps appends amortized O(1) per row
+            grown = np.empty(max(end, 2 * len(self.hashes)), dtype=np.uint64)
+            grown[:self.size] = self.hashes[:self.size]
+            self.hashes = grown
+        self.hashes[self.size:end] = values
+        self.size = end
+
+    def distinct(self) -> int:
+        return len(np.unique(self.hashes[:self.size]))
+
+
+@dataclass
+class ColumnStats:
+    """One-pass accumulators for a single column"""
+    rows: int = 0
+    nulls: int = 0
+    padded: int = 0
+    missing_tokens: dict[str, int] = field(default_factory=dict)
+    distinct: HyperLogLog = field(default_factory=HyperLogLog)
+    numeric: int = 0
+    total: float = 0.0
+    minimum: Any = None
+    maximum: Any = None
+
+    def to_dict(self) -> dict[str, Any]:
+        summary: dict[str, Any] = {
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "null_rate": round(self.nulls / self.rows, 4) if self.rows else 0.0,
+            "missing_tokens": dict(sorted(self.missing_tokens.items())),
+            "approx_distinct": self.distinct.estimate(),
+            "needs_trim": self.padded,
+        }
+        if self.numeric:
+            summary.update({
+                "numeric": self.numeric,
+                "min": self.minimum,
+                "max": self.maximum,
+                "mean": round(self.total / self.numeric, 4),
+            })
+        elif self.minimum is not None:
+            #dates: min/max only
+            summary.update({"min": self.minimum.isoformat(), "max": self.maximum.isoformat()})
+        return summary
+
+
+class StreamingProfiler:
+    """
+    Profile a dataset chunk by chunk, in one pass and bounded memory.
+
+    Every statistic is kept as a fixed-size accumulator: counts, running
+    min/max/sum, HyperLogLog sketches for distinct values, and fixed-bin
+    histograms, whose memory depends on the number of columns only. Duplicate
+    keys are counted exactly from 8-byte row hashes. Column names are snake_cased
+    the way the clean stage does it, so raw and clean sources report the same names.
+    """
+
+    def __init__(
+        self,
+        histograms: Optional[dict[str, tuple[float, float, int]]] = None,
+        duplicate_keys: Optional[dict[str, Optional[tuple[str, ...]]]] = None,
+        missing_tokens: tuple[str, ...] = MISSING_TOKENS,
+    ):
+        self.histogram_specs = DEFAULT_HISTOGRAMS if histograms is None else histograms
+        self.duplicate_keys = DEFAULT_DUPLICATE_KEYS if duplicate_keys is None else duplicate_keys
+        self.missing_tokens = missing_tokens
+        self.rows = 0
+        self.chunks = 0
+        self.columns: dict[str, ColumnStats] = {}
+        #column -> bin counts, plus values below / above the binned range
+        self.histograms = {
+            column: {"counts": np.zeros(bins, dtype=np.int64), "below": 0, "above": 0}
+            for column, (_, _, bins) in self.histogram_specs.items()
+        }
+        #duplicates are the small difference of two large counts, which a sketch's
+        #error swamps, so every key hash is kept and sorted once in report()
+        self.keys = {name: KeyHashes() for name in self.duplicate_keys}
+        self.sample: list[dict[str, Any]] = []
+        self.seconds = 0.0
+
+    def update(self, df: pd.DataFrame) -> "StreamingProfiler":
+        """Fold one chunk into the running statistics"""
+        start = time.perf_counter()
+        df = df.drop(columns=list(BOOKKEEPING_COLUMNS), errors="ignore")
+        df.columns = (
+            df.columns.astype(str)
+            .str.strip()
+            .str.lower()
+            .str.replace(" ", "_")
+            .str.replace("-", "_")
+        )
+        if len(self.sample) < SAMPLE_ROWS:
+            self.sample.extend(df.head(SAMPLE_ROWS - len(self.sample)).to_dict(orient="records"))
+
+        for column in df.columns:
+            stats = self.columns.setdefault(column, ColumnStats())
+            self._update_column(stats, df[column])
+        #a column absent from this chunk is missing on all of its rows
+        for column, stats in self.columns.items():
+            if column not in df.columns:
+                stats.rows += len(df)
+                stats.nulls += len(df)
+
+        for column, (low, high, bins) in self.histogram_specs.items():
+            if column in df.columns:
+                self._update_histogram(column, df[column], low, high, bins)
+        for name, key in self.duplicate_keys.items():
+            self._update_key(name, df, key)
+
+        self.rows += len(df)
+        self.chunks += 1
+        self.seconds += time.perf_counter() - start
+        return self
+
+    def _update_column(self, stats: ColumnStats, col: pd.Series) -> None:
+        """Column statistics from the chunk's distinct values, weighted by their counts
+
+        Text checks (trim, missing tokens, numeric parse) run once per distinct
+        value instead of once per cell; most raw columns repeat a few values.
+        """
+        if pd.api.types.infer_dtype(col, skipna=True) == "mixed" and col.map(type).eq(dict).any():
+            #GeoJSON locations: dicts are unhashable
+            col = col.where(col.isna(), col.astype(str))
+        codes, uniques = pd.factorize(col)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        uniques = pd.Series(uniques)
+        stats.rows += len(col)
+        stats.nulls += int((codes < 0).sum())
+        stats.distinct.update(hash_values(uniques))
+        if not len(uniques) or pd.api.types.is_bool_dtype(uniques):
+            return
+
+        if pd.api.types.is_numeric_dtype(uniques):
+            numbers = uniques.to_numpy(dtype=float, na_value=np.nan)
+        elif pd.api.types.is_datetime64_any_dtype(uniques):
+            self._update_range(stats, uniques.min(), uniques.max())
+            return
+        elif pd.api.types.infer_dtype(uniques, skipna=True) not in TEXT_KINDS:
+            #e.g. datetime objects: nulls and distinct values only
+            return
+        else:
+            #.str yields NaN for non-strings, so only text is checked
+            stripped = uniques.str.strip()
+            is_text = stripped.notna().to_numpy()
+            stats.padded += int(counts[is_text & (stripped != uniques).to_numpy()].sum())
+            tokens = stripped.str.lower()
+            for token in self.missing_tokens:
+                found = int(counts[(tokens == token).to_numpy()].sum())
+                if found:
+                    stats.missing_tokens[token] = stats.missing_tokens.get(token, 0) + found
+            numbers = pd.to_numeric(stripped, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+        finite = np.isfinite(numbers)
+        if finite.any():
+            stats.numeric += int(counts[finite].sum())
+            stats.total += float((numbers[finite] * counts[finite]).sum())
+            self._update_range(stats, float(numbers[finite].min()), float(numbers[finite].max()))
+
+    @staticmethod
+    def _update_range(stats: ColumnStats, low: Any, high: Any) -> None:
+        if pd.isna(low):
+            return
+        stats.minimum = low if stats.minimum is None else min(stats.minimum, low)
+        stats.maximum = high if stats.maximum is None else max(stats.maximum, high)
+
+    def _update_histogram(self, column: str, col: pd.Series, low: float, high: float, bins: int) -> None:
+        values = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        values = values[np.isfinite(values)]
+        histogram = self.histograms[column]
+        histogram["below"] += int((values < low).sum())
+        histogram["above"] += int((values > high).sum())
+        histogram["counts"] += np.histogram(values, bins=bins, range=(low, high))[0]
+
+    def _update_key(self, name: str, df: pd.DataFrame, key: Optional[tuple[str, ...]]) -> None:
+        columns = sorted(df.columns) if key is None else list(key)
+        if any(column not in df.columns for column in columns):
+            return
+        frame = df[columns]
+        if key is not None:
+            #drop_duplicates keeps one of several rows missing the key, so only full keys count
+            frame = frame[frame.notna().all(axis=1)]
+        #dict values (GeoJSON locations) are not hashable by pandas
+        nested = [column for column in columns if pd.api.types.infer_dtype(frame[column], skipna=True) == "mixed"]
+        if nested:
+            frame = frame.astype({column: str for column in nested})
+        self.keys[name].append(pd.util.hash_pandas_object(frame, index=False).to_numpy())
+
+    # -----------------------------
+    # REPORT
+    # -----------------------------
+    def report(self, source: str = "") -> dict[str, Any]:
+        histograms = {}
+        for column, (low, high, bins) in self.histogram_specs.items():
+            histogram = self.histograms[column]
+            histograms[column] = {
+                "low": low,
+                "high": high,
+                "edges": np.linspace(low, high, bins + 1).tolist(),
+                "counts": histogram["counts"].tolist(),
+                "below": histogram["below"],
+                "above": histogram["above"],
+            }
+        duplicates = {}
+        for name, key in self.duplicate_keys.items():
+            #exact up to 64-bit hash collisions
+            hashes = self.keys[name]
+            distinct = hashes.distinct()
+            duplicates[name] = {
+                "key": list(key) if key else "all columns",
+                "rows": hashes.size,
+                "distinct": distinct,
+                "duplicates": hashes.size - distinct,
+            }
+        return {
+            "source": source,
+            "profiled_at": datetime.now(timezone.utc).isoformat(),
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "seconds": round(self.seconds, 4),
+            "peak_memory_mb": peak_memory_mb(),
+            "columns": {column: stats.to_dict() for column, stats in self.columns.items()},
+            "histograms": histograms,
+            "duplicates": duplicates,
+            "sample": self.sample,
+        }
+
+
+# -----------------------------
+# SOURCES
+# -----------------------------
+def profile_frames(frames: Iterable[pd.DataFrame], source: str, **options: Any) -> dict[str, Any]:
+    profiler = StreamingProfiler(**options)
+    for frame in frames:
+        profiler.update(frame)
+    logger.info(f"Profiled {profiler.rows} rows of {source} in {profiler.chunks} chunks ({profiler.seconds:.2f}s)")
+    return profiler.report(source)
+
+
+def profile_csv(path: str, chunksize: int = 100_000, engine: Optional[str] = None, **options: Any) -> dict[str, Any]:
+    """Profile a CSV read ``chunksize`` rows at a time through a parsing engine
+
+    Every declared column is read as text and only empty cells as null, so
+    placeholders such as "n/a" or "null" (which the loader's NA list turns into
+    NaN) show up as missing tokens, and a stray token in a numeric column is
+    counted rather than failing the parse. Numbers are parsed per distinct value.
+    """
+    text = {column: "object" for column in raw_dtypes()}
+    reader_engine = get_engine(engine or default_engine(), dtypes=text, na_values=("",))
+    with reader_engine.iter_chunks(path, chunksize) as reader:
+        return profile_frames(reader, path, **options)
+
+
+def profile_collection(collection, batch_size: int = 50_000, codec: str = "dict", **options: Any) -> dict[str, Any]:
+    """Profile a MongoDB collection (raw or clean layer) batch by batch"""
+    frames = get_codec(codec).iter_frames(collection, batch_size)
+    return profile_frames(frames, f"{collection.database.name}.{collection.name}", **options)
+
+
+def write_report(report: dict[str, Any], directory: str = DEFAULT_PROFILE_DIR, name: str = "profile") -> list[Path]:
+    """Write the report as <name>.json and a self-contained <name>.html"""
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    json_path = root / f"{name}.json"
+    #sample rows can hold dates and ObjectIds
+    json_path.write_text(json.dumps(report, indent=2, default=str))
+    html_path = root / f"{name}.html"
+    html_path.write_text(render_html(report))
+    return [json_path, html_path]
+
+
+def render_html(report: dict[str, Any]) -> str:
+    """One static page: column table, histograms as inline SVG, duplicate counts"""
+    rows = []
+    for column, stats in report["columns"].items():
+        tokens = ", ".join(f"{escape(repr(token))}: {count}" for token, count in stats["missing_tokens"].items())
+        rows.append(
+            f"<tr><td>{escape(column)}</td><td>{stats['nulls']}</td><td>{stats['null_rate']:.2%}</td>"
+            f"<td>{tokens}</td><td>{stats['approx_distinct']}</td><td>{stats['needs_trim']}</td>"
+            f"<td>{escape(str(stats.get('min', '')))}</td><td>{escape(str(stats.get('max', '')))}</td>"
+            f"<td>{escape(str(stats.get('mean', '')))}</td></tr>"
+        )
+    charts = [
+        f"<h2>{escape(column)}</h2>{_svg_histogram(histogram)}"
+        f"<p>{histogram['below']} below {histogram['low']:g}, {histogram['above']} above {histogram['high']:g}</p>"
+        for column, histogram in report["histograms"].items()
+    ]
+    duplicates = [
+        f"<tr><td>{escape(name)}</td><td>{escape(str(entry['key']))}</td><td>{entry['rows']}</td>"
+        f"<td>{entry['duplicates']}</td></tr>"
+        for name, entry in report["duplicates"].items()
+    ]
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Profile of {escape(report['source'])}</title>
+<style>body{{font-family:sans-serif;margin:2em}}table{{border-collapse:collapse}}
+td,th{{border:1px solid #ccc;padding:4px 8px;text-align:right}}td:first-child{{text-align:left}}</style>
+</head><body>
+<h1>Profile of {escape(report['source'])}</h1>
+<p>{report['rows']} rows in {report['chunks']} chunks, {report['seconds']}s, peak memory {report['peak_memory_mb']} MB</p>
+<table><tr><th>column</th><th>nulls</th><th>null rate</th><th>missing tokens</th><th>~distinct</th>
+<th>needs trim</th><th>min</th><th>max</th><th>mean</th></tr>
+{''.join(rows)}
+</table>
+{''.join(charts)}
+<h2>Duplicate keys</h2>
+<table><tr><th>name</th><th>key</th><th>rows</th><th>duplicates</th></tr>
+{''.join(duplicates)}
+</table>
+</body></html>
+"""
+
+
+def _svg_histogram(histogram: dict[str, Any], width: int = 600, height: int = 160) -> str:
+    counts = histogram["counts"]
+    peak = max(counts) or 1
+    bar = width / len(counts)
+    bars = "".join(
+        f'<rect x="{index * bar:.1f}" y="{height - count / peak * height:.1f}" '
+        f'width="{max(bar - 1, 1):.1f}" height="{count / peak * height:.1f}"><title>{count}</title></rect>'
+        for index, count in enumerate(counts)
+    )
+    return f'<svg width="{width}" height="{height}" fill="steelblue">{bars}</svg>'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profile the raw CSV or a layer collection in one streaming pass")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv")
+    source.add_argument("--collection", help="e.g. real_estate_raw or real_estate_clean")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_db")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--codec", default="dict")
+    parser.add_argument("--out", default=DEFAULT_PROFILE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.csv:
+        report = profile_csv(args.csv, args.chunksize)
+        name = Path(args.csv).stem
+    else:
+        client = connect(args.mongo_uri, "read_scan")
+        report = profile_collection(client[args.db][args.collection], args.chunksize, args.codec)
+        client.close()
+        name = args.collection
+    for path in write_report(report, args.out, name):
+        logger.info(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
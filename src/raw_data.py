@@ -1,48 +1,426 @@
+import numpy as np
 import pandas as pd
-from pymongo import MongoClient
+from pymongo import DeleteMany, InsertOne, MongoClient, ReplaceOne
+from pymongo.errors import AutoReconnect, BulkWriteError, PyMongoError
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional, Union
+from src.codec import get_codec
+from src.connection import ConnectionProfile, connect, get_profile
+from src.metrics import RunMetrics, instrumented, peak_memory_mb, track
+from src.parsing import get_engine
+from src.versions import bump_version, get_version
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+DUPLICATE_KEY_ERROR = 11000
+
+#incremental mode bookkeeping fields stored on every raw document
+ROW_KEY_FIELD = "_row_key"
+FINGERPRINT_FIELD = "_fingerprint"
+ROW_KEY_COLUMNS = ["Serial Number", "List Year", "Town"]
+#meta document bumped after every load that changed the raw collection
+RAW_VERSION = "real_estate_raw"
+
 class RawDataLoader:
     """Processes / Imports raw datasets into MongoDB"""
+    METRICS_STAGE = "raw"
 
-    def __init__(self, mongo_uri: str, db_name: str):
-        self.client: MongoClient = MongoClient(mongo_uri)
+    def __init__(
+        self,
+        mongo_uri: str,
+        db_name: str,
+        codec: str = "dict",
+        metrics: Optional[RunMetrics] = None,
+        profile: Union[str, ConnectionProfile] = "bulk_load",
+        engine: str = "c",
+    ):
+        #client settings and insert ordering (see src/connection.py)
+        self.profile = get_profile(profile)
+        self.client: MongoClient = connect(mongo_uri, self.profile)
         self.db = self.client[db_name]
         self.collection = self.db['real_estate_raw']
+        #how DataFrame chunks are turned into BSON (see src/codec.py)
+        self.codec = get_codec(codec)
+        #CSV parser reading with the raw schema's dtypes (see src/parsing.py)
+        self.engine = get_engine(engine)
+        #per-step timings for the run, when the caller collects them
+        self.metrics = metrics
         logger.info(f"Connected to MongoDB: {db_name}")
 
-    def load_csv(self, filepath: str) -> dict:
-        """Loading CSV into MongoDB collection"""
+    def load_csv(
+        self,
+        filepath: str,
+        chunksize: Optional[int] = None,
+        workers: int = 1,
+        batch_size: int = 10_000,
+        max_retries: int = 3,
+        incremental: bool = False,
+    ) -> dict:
+        """Loading CSV into MongoDB collection
+
+        With ``chunksize`` set the file is streamed in chunks of that many rows
+        so memory stays flat regardless of file size. With ``workers`` > 1 the
+        rows are split into ``batch_size`` batches and inserted concurrently.
+        With ``incremental`` only new and changed rows are written. Plain, gzip
+        and zstd files are all read by the loader's CSV engine.
+        """
+        if incremental:
+            summary = self._load_csv_incremental(filepath, chunksize or 100_000)
+            changed = summary["new"] or summary["changed"] or summary["deleted"]
+        elif workers > 1:
+            summary = self._load_csv_parallel(
+                filepath, chunksize or 100_000, workers, batch_size, max_retries
+            )
+            changed = True
+        elif chunksize:
+            summary = self._load_csv_streaming(filepath, chunksize)
+            changed = True
+        else:
+            summary = self._load_csv_full(filepath)
+            changed = True
+
+        #the clean stage keys its freshness on this (see src/manifest.py)
+        self.version = bump_version(self.db, RAW_VERSION) if changed else get_version(self.db, RAW_VERSION)
+        summary["version"] = self.version
+        return summary
+
+    def _load_csv_full(self, filepath: str) -> dict:
         logger.info(f"Reading csv from {filepath}")
-        df = pd.read_csv(filepath)
-        records = df.to_dict('records')
+        with track(self, "parse_csv") as timing:
+            df = self.engine.read(filepath)
+            timing.rows_out = len(df)
 
         #clearing exisitng data
         self.collection.delete_many({})
-        result = self.collection.insert_many(records)
+        with track(self, "insert_raw", len(df)) as timing:
+            inserted = self.codec.insert_frame(self.collection, df, ordered=self.profile.ordered)
+            timing.rows_out = inserted
 
         summary = {
             "row_count": self.collection.count_documents({}),
             "schema": df.columns.tolist(),
-            "inserted": len(result.inserted_ids),
+            "inserted": inserted,
         }
 
-        logger.info(f"Loaded {summary['inserted']} records")
+        logger.info(f"Loaded {summary['inserted']} records ({self.profile.name} profile)")
         return summary
-    
+
+    def _load_csv_streaming(self, filepath: str, chunksize: int) -> dict:
+        """Parse chunk N+1 while chunk N is being inserted as an unordered batch"""
+        logger.info(f"Streaming csv from {filepath} in chunks of {chunksize} rows")
+        self.collection.delete_many({})
+
+        chunks: list[dict[str, Any]] = []
+        schema: list[str] = []
+        inserted = 0
+        pending: Optional[Future] = None
+        start = time.perf_counter()
+
+        #one writer thread keeps at most two chunks in memory at a time
+        with ThreadPoolExecutor(max_workers=1) as writer, \
+                self.engine.iter_chunks(filepath, chunksize) as reader:
+            while True:
+                parse_start = time.perf_counter()
+                with track(self, "parse_csv") as timing:
+                    chunk = next(reader, None)
+                    timing.rows_out = 0 if chunk is None else len(chunk)
+                if chunk is None:
+                    break
+                if not schema:
+                    schema = chunk.columns.tolist()
+                parse_seconds = time.perf_counter() - parse_start
+
+                if pending is not None:
+                    inserted += pending.result()
+                chunks.append({
+                    "chunk": len(chunks),
+                    "rows": len(chunk),
+                    "parse_seconds": round(parse_seconds, 4),
+                })
+                pending = writer.submit(self._insert_chunk, chunk, chunks[-1])
+
+            if pending is not None:
+                inserted += pending.result()
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "row_count": self.collection.count_documents({}),
+            "schema": schema,
+            "inserted": inserted,
+            "chunks": chunks,
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_sec": round(inserted / elapsed, 2) if elapsed > 0 else 0.0,
+            "peak_memory_mb": peak_memory_mb(),
+        }
+
+        logger.info(
+            f"Loaded {inserted} records in {len(chunks)} chunks "
+            f"({summary['rows_per_sec']} rows/sec, peak {summary['peak_memory_mb']} MB, {self.profile.name} profile)"
+        )
+        return summary
+
+    @instrumented("insert_raw")
+    def _insert_chunk(self, chunk: pd.DataFrame, stats: dict[str, Any]) -> int:
+        """Encode and insert one chunk unordered and record how long it took"""
+        insert_start = time.perf_counter()
+        inserted = self.codec.insert_frame(self.collection, chunk, ordered=False)
+        stats["insert_seconds"] = round(time.perf_counter() - insert_start, 4)
+        return inserted
+
+    def _load_csv_parallel(
+        self,
+        filepath: str,
+        chunksize: int,
+        workers: int,
+        batch_size: int,
+        max_retries: int,
+    ) -> dict:
+        """Insert batches concurrently from a pool of writer threads"""
+        logger.info(
+            f"Loading csv from {filepath} with {workers} writers "
+            f"(batches of {batch_size} rows)"
+        )
+        self.collection.delete_many({})
+
+        worker_stats: dict[str, dict[str, Any]] = {}
+        stats_lock = threading.Lock()
+        schema: list[str] = []
+        inserted = 0
+        in_flight: set[Future] = set()
+        start = time.perf_counter()
+
+        #cap in-flight batches so parsing can't run far ahead of the writers
+        max_in_flight = workers * 2
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="raw-writer") as pool, \
+                self.engine.iter_chunks(filepath, chunksize) as reader:
+            for chunk in reader:
+                if not schema:
+                    schema = chunk.columns.tolist()
+                with track(self, "encode", len(chunk)) as timing:
+                    records = self.codec.documents(chunk)
+                    timing.rows_out = len(records)
+                for offset in range(0, len(records), batch_size):
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        inserted += sum(future.result() for future in done)
+                    batch = records[offset:offset + batch_size]
+                    in_flight.add(pool.submit(
+                        self._insert_batch, batch, max_retries, worker_stats, stats_lock
+                    ))
+
+            done, _ = wait(in_flight)
+            inserted += sum(future.result() for future in done)
+
+        elapsed = time.perf_counter() - start
+        for stats in worker_stats.values():
+            stats["seconds"] = round(stats["seconds"], 4)
+            stats["rows_per_sec"] = (
+                round(stats["rows"] / stats["seconds"], 2) if stats["seconds"] > 0 else 0.0
+            )
+
+        summary = {
+            "row_count": self.collection.count_documents({}),
+            "schema": schema,
+            "inserted": inserted,
+            "workers": worker_stats,
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_sec": round(inserted / elapsed, 2) if elapsed > 0 else 0.0,
+            "peak_memory_mb": peak_memory_mb(),
+        }
+
+        logger.info(
+            f"Loaded {inserted} records with {workers} writers "
+            f"({summary['rows_per_sec']} rows/sec, {self.profile.name} profile)"
+        )
+        return summary
+
+    @instrumented("insert_raw")
+    def _insert_batch(
+        self,
+        batch: list,
+        max_retries: int,
+        worker_stats: dict[str, dict[str, Any]],
+        stats_lock: threading.Lock,
+    ) -> int:
+        """Insert one batch unordered, retrying transient errors with backoff"""
+        batch_start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                #raw BSON documents are not listed in inserted_ids
+                self.collection.insert_many(batch, ordered=False)
+                inserted = len(batch)
+                break
+            except BulkWriteError as e:
+                #every document has its _id by the first attempt (insert_many stamps
+                #dicts, the bson codec encodes it), so on a retry the rows that
+                #landed before the failure come back as duplicate keys
+                errors = e.details.get("writeErrors", [])
+                if attempt == 0 or any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                    raise
+                inserted = len(batch)
+                break
+            except PyMongoError as e:
+                transient = isinstance(e, AutoReconnect) or e.has_error_label("RetryableWriteError")
+                if not transient or attempt >= max_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"Transient error inserting batch (attempt {attempt}): {e}")
+                time.sleep(0.5 * 2 ** (attempt - 1))
+
+        seconds = time.perf_counter() - batch_start
+        with stats_lock:
+            stats = worker_stats.setdefault(
+                threading.current_thread().name,
+                {"batches": 0, "rows": 0, "seconds": 0.0, "retries": 0},
+            )
+            stats["batches"] += 1
+            stats["rows"] += inserted
+            stats["seconds"] += seconds
+            stats["retries"] += attempt
+        return inserted
+
+    def _load_csv_incremental(self, filepath: str, chunksize: int) -> dict:
+        """Apply only the delta between the CSV and the raw collection
+
+        Each row gets a key (serial number, list year, town) and a fingerprint
+        of its contents. Rows with an unknown key are inserted, rows whose
+        fingerprint differs are replaced and keys missing from the CSV are deleted.
+        """
+        logger.info(f"Incremental load of {filepath}")
+        start = time.perf_counter()
+        #a no-op once created; the deferred load in main.py leaves this index in place
+        self.collection.create_index(
+            [(ROW_KEY_FIELD, 1), (FINGERPRINT_FIELD, 1)], name="row_fingerprint"
+        )
+
+        #rows from a full reload carry no key and would otherwise be duplicated
+        unkeyed = self.collection.delete_many({ROW_KEY_FIELD: {"$exists": False}}).deleted_count
+
+        #an empty filter plans as a collection scan; the hint makes it a covered
+        #scan of row_fingerprint, so full documents are never read
+        existing = {
+            doc[ROW_KEY_FIELD]: doc[FINGERPRINT_FIELD]
+            for doc in self.collection.find(
+                {}, {ROW_KEY_FIELD: 1, FINGERPRINT_FIELD: 1, "_id": 0}
+            ).hint("row_fingerprint")
+        }
+        logger.info(f"Loaded {len(existing)} existing row fingerprints")
+
+        counts = {"new": 0, "changed": 0, "unchanged": 0, "deleted": unkeyed}
+        seen: set[int] = set()
+        schema: list[str] = []
+
+        with self.engine.iter_chunks(filepath, chunksize) as reader:
+            for chunk in reader:
+                if not schema:
+                    schema = chunk.columns.tolist()
+                with track(self, "fingerprint", len(chunk)) as timing:
+                    keys = self._row_keys(chunk, seen)
+                    fingerprints = self._row_fingerprints(chunk)
+                    timing.rows_out = len(fingerprints)
+
+                write_rows = []
+                for position, (key, fingerprint) in enumerate(zip(keys, fingerprints)):
+                    previous = existing.pop(key, None)
+                    if previous == fingerprint:
+                        counts["unchanged"] += 1
+                        continue
+                    counts["new" if previous is None else "changed"] += 1
+                    write_rows.append((position, key, fingerprint, previous is None))
+
+                if not write_rows:
+                    continue
+                with track(self, "apply_delta", len(write_rows)) as timing:
+                    self._apply_delta(chunk, write_rows)
+                    timing.rows_out = len(write_rows)
+
+        #whatever is left in the existing map is no longer in the CSV
+        stale = list(existing)
+        for offset in range(0, len(stale), 10_000):
+            self.collection.bulk_write(
+                [DeleteMany({ROW_KEY_FIELD: {"$in": stale[offset:offset + 10_000]}})]
+            )
+        counts["deleted"] += len(stale)
+
+        summary = {
+            "row_count": self.collection.count_documents({}),
+            "schema": schema,
+            "inserted": counts["new"],
+            **counts,
+            "elapsed_seconds": round(time.perf_counter() - start, 4),
+        }
+
+        logger.info(
+            f"Incremental load: {counts['new']} new, {counts['changed']} changed, "
+            f"{counts['unchanged']} unchanged, {counts['deleted']} deleted"
+        )
+        return summary
+
+    def _apply_delta(self, chunk: pd.DataFrame, write_rows: list[tuple[int, int, int, bool]]) -> None:
+        """Insert new rows and replace changed ones; write_rows are (position, key, fingerprint, is_new)"""
+        ops = []
+        records = self.codec.encode(chunk.iloc[[row[0] for row in write_rows]])
+        for record, (_, key, fingerprint, is_new) in zip(records, write_rows):
+            record[ROW_KEY_FIELD] = key
+            record[FINGERPRINT_FIELD] = fingerprint
+            if is_new:
+                ops.append(InsertOne(record))
+            else:
+                ops.append(ReplaceOne({ROW_KEY_FIELD: key}, record, upsert=True))
+        self.collection.bulk_write(ops, ordered=False)
+
+    @staticmethod
+    def _row_keys(chunk: pd.DataFrame, seen: set[int]) -> list[int]:
+        """Stable 64-bit row keys; repeated keys get an occurrence suffix mixed in"""
+        key_frame = pd.DataFrame({
+            col: (
+                chunk[col].astype(str).str.strip()
+                if col == "Town"
+                else pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+            )
+            for col in ROW_KEY_COLUMNS
+            if col in chunk.columns
+        })
+        base_keys = pd.util.hash_pandas_object(key_frame, index=False).to_numpy()
+
+        keys = []
+        for base in base_keys.view(np.int64).tolist():
+            key = base
+            occurrence = 0
+            while key in seen:
+                occurrence += 1
+                #golden-ratio step keeps the nth duplicate's key deterministic
+                key = ((base + occurrence * 0x9E3779B97F4A7C15 + 2**63) % 2**64) - 2**63
+            seen.add(key)
+            keys.append(key)
+        return keys
+
+    @staticmethod
+    def _row_fingerprints(chunk: pd.DataFrame) -> list[int]:
+        """64-bit content hash per row; numbers are compared as float64"""
+        canonical = chunk.copy()
+        for col in canonical.columns:
+            if pd.api.types.is_numeric_dtype(canonical[col]):
+                canonical[col] = canonical[col].astype('float64')
+        hashes = pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+        return hashes.view(np.int64).tolist()
+
     def get_stats(self, sample_size: int = 5) -> dict:
         """Get stats from raw collection"""
         return {
             "row_count": self.collection.count_documents({}),
             "sample": list(self.collection.find().limit(sample_size)),
         }
-    
+
     def close(self):
         """Close MongoDB conenction"""
         self.client.close()
-    
+
+
 
 
 
@@ -1,86 +1,48 @@
+import sys
+from pathlib import Path
+from src.profiler import profile_csv, write_report
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
+#the published dataset; pass another csv path as the first argument
+CSV_PATH = "data/Real_Estate_Sales_2001-2023_GL.csv"
 
-#loading the stock market csv file
-df = pd.read_csv("../data/Real_Estate_Sales_2001-2023_GL.csv")
 
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else CSV_PATH
 
-#understanding the data
-
-#the size of the data (rows,columns)
-print(df.shape)
-
-#first and last 5 rows
-print("first and last 5 rows")
-print(df.head())
-print(df.tail())
-
-#knowing the data types, columns names, and how many missing values
-print("column names")
-print(df.columns)
-print("\nData types")
-print(df.info())
-print("numeric columns")
-print(df.describe())
-
-print("-"*50)
-#how many missing values are present
-print("missing values  per column")
-print(df.isnull().sum())
-print("-"*50)
-print("percent of missing columns")
-print(df.isnull().mean() * 100)
-
-print("-"*50)
-# number of duplicates
-print("duplicates??")
-print(df.duplicated().sum())
-print("-"*50)
-
-
-#snake_case 
-df.columns = (
-    df.columns.str.strip() #removes whitespaces
-            .str.lower() #lowercase
-            .str.replace(" ", "_") #replscing spaces w/ underscores
-            .str.replace("-","_") #replacing dashes w/ underscores
-)
-#trimming whitespace
-df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
-
-
-print(df.head())
-
-#converting to data time
-df['date_recorded'] = pd.to_datetime(df['date_recorded'], errors='coerce')
-
-print(df.head())
-
-df['sale_amount'] = df["sale_amount"].astype('int64')
-df['assessed_value'] = df["assessed_value"].astype('int64')
-
-print(df[['sale_amount', 'assessed_value']].head())
-
-print(df.duplicated(subset=['address', 'date_recorded']).sum())
-#dropping the rows w/same address & date
-df = df.drop_duplicates(subset=['address', 'date_recorded'])
-
-df['sale_amount'].hist(bins=100, range=(0,3000000))
-plt.xlabel("price")
-plt.ylabel('frequency')
-plt.show()
-
-#mapping missing values with NaN
-missing_values = ["", "na", "n/a", "null", "-"]
-df = df.replace(missing_values, pd.NA)
-
+    #one streaming pass over the csv; nothing is held in memory but the statistics
+    report = profile_csv(path)
+    columns = report["columns"]
 
+    #the size of the data (rows,columns)
+    print((report["rows"], len(columns)))
+    print(f"profiled in {report['seconds']}s, peak memory {report['peak_memory_mb']} MB")
 
+    print("first 5 rows")
+    for row in report["sample"]:
+        print(row)
 
+    print("-"*50)
+    #how many missing values are present, and the placeholders that mean missing
+    print(f"{'column':<20}{'missing':>10}{'percent':>10}{'~distinct':>12}  missing tokens")
+    for name, stats in columns.items():
+        print(f"{name:<20}{stats['nulls']:>10}{stats['null_rate']:>10.2%}{stats['approx_distinct']:>12}  {stats['missing_tokens']}")
 
+    print("-"*50)
+    print("numeric columns")
+    for name, stats in columns.items():
+        if "mean" in stats:
+            print(f"{name:<20} min {stats['min']:<14} max {stats['max']:<14} mean {stats['mean']}")
 
+    print("-"*50)
+    #number of duplicates, whole rows and same address & date
+    for name, entry in report["duplicates"].items():
+        print(f"duplicates ({name}): {entry['duplicates']}")
 
+    print("-"*50)
+    #the sale_amount histogram is drawn in the html report
+    for path in write_report(report, name=Path(path).stem):
+        print(f"report written to {path}")
 
 
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field
 from datetime import datetime 
 from typing import Optional
-import pandas as pd
 
 class RealEstateDataRaw(BaseModel):
     """Raw layer schema"""
@@ -20,33 +19,28 @@ class RealEstateDataRaw(BaseModel):
     opm_remarks: Optional[str] = None
     location: Optional[str] = None
 
+#fields stored as pandas categoricals when a clean frame is compacted (see src/dtypes.py)
+CATEGORY = {"dtype": "category"}
+
 class RealEstateDataClean(BaseModel):
     """Clean layer schema"""
     serial_number: int
     list_year: int
-    date_recorded: str
-    town: str
+    #stored as a BSON date; year/month are precomputed partition keys for range queries and gold grouping
+    date_recorded: datetime
+    year: int
+    month: int
+    town: str = Field(json_schema_extra=CATEGORY)
     address: str
-    assessed_value: int 
-    sale_amount: int
+    #non-negative as a declared constraint so columnar validation can derive it
+    assessed_value: int = Field(ge=0)
+    sale_amount: int = Field(ge=0)
     sales_ratio: float
-    property_type: str
-    residential_type: Optional[str] = None
-    non_use_code: Optional[str] = None
-    assessor_remarks: Optional[str] = None
-    opm_remarks: Optional[str] = None
-    location: Optional[str] = None
-
-    @field_validator('sale_amount')
-    @classmethod
-    def validate_sale_amount(cls, v: int) -> int:
-        if v < 0:
-            raise ValueError('sale_amount must be non-negative')
-        return v
-    
-    @field_validator('assessed_value')
-    @classmethod
-    def validate_assessed_value(cls, v: int) -> int:
-        if v < 0:
-            raise ValueError('assessed_value must be non-negative')
-        return v
\ No newline at end of file
+    property_type: str = Field(json_schema_extra=CATEGORY)
+    residential_type: Optional[str] = Field(None, json_schema_extra=CATEGORY)
+    non_use_code: Optional[str] = Field(None, json_schema_extra=CATEGORY)
+    assessor_remarks: Optional[str] = Field(None, json_schema_extra=CATEGORY)
+    opm_remarks: Optional[str] = Field(None, json_schema_extra=CATEGORY)
+    #GeoJSON Point parsed from the raw WKT string (see src/geo.py); None when missing or invalid
+    location: Optional[dict] = None
+    geohash: Optional[str] = None
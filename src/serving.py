@@ -0,0 +1,306 @@
+from src.connection import connect
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Hashable, Optional
+from urllib.parse import parse_qs, urlparse
+from src.aggregate import GOLD_SPECS, GOLD_VERSION, STATE_FIELD
+from src.versions import get_version
+import numpy as np
+import argparse
+import threading
+import logging
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+GOLD_COLLECTIONS = {spec.name: spec.collection for spec in GOLD_SPECS}
+
+#town metrics top_towns may rank by
+TOWN_RANKINGS = tuple(metric.name for spec in GOLD_SPECS if spec.name == "town" for metric in spec.metrics)
+
+
+@dataclass(frozen=True)
+class YearStats:
+    year: int
+    avg_sale_amount: float
+    total_sales: float
+    sale_count: int
+    p50_sale_amount: Optional[float] = None
+    p90_sale_amount: Optional[float] = None
+    p99_sale_amount: Optional[float] = None
+    approx_distinct_addresses: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class TownStats:
+    town: str
+    avg_sale_amount: float
+    total_sales: float
+    sale_count: int
+    p50_sale_amount: Optional[float] = None
+    p90_sale_amount: Optional[float] = None
+    p99_sale_amount: Optional[float] = None
+    approx_distinct_addresses: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class PropertyStats:
+    property_type: str
+    avg_sale_amount: float
+    sale_count: int
+
+
+def _from_doc(cls: type, doc: dict[str, Any]) -> Any:
+    """Build a stats row from a gold document, ignoring fields the type does not declare"""
+    names = {field.name for field in fields(cls)}
+    return cls(**{key: value for key, value in doc.items() if key in names})
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire ``ttl_seconds`` after being stored.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """(found, value); a found entry becomes the most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            stored_at, value = entry
+            if self.clock() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class GoldQueryService:
+    """
+    Typed, cached lookups over the gold tables.
+
+    Cache keys include the gold version the aggregation stage bumps on every
+    rebuild or fold, so answers are dropped exactly when gold data changes.
+    The version is re-read on every lookup; a positive ``version_check_seconds``
+    opts into reusing it for that long, serving answers up to that stale.
+    """
+
+    def __init__(
+        self,
+        mongo_uri: str,
+        db_name: str,
+        max_entries: int = 256,
+        ttl_seconds: float = 300.0,
+        version_check_seconds: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = connect(mongo_uri)
+        self.db = self.client[db_name]
+        self.cache = TTLCache(max_entries, ttl_seconds, clock)
+        self.version_check_seconds = version_check_seconds
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        #latencies of the most recent lookups, in seconds
+        self.latencies: deque[float] = deque(maxlen=10_000)
+        self._version: Optional[str] = None
+        self._version_checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+        logger.info("Connected to MongoDB (Gold Query Service)")
+
+    def gold_version(self) -> Optional[str]:
+        #request threads share the cached version, so the check and refresh are one step
+        with self._lock:
+            now = self.clock()
+            if self._version_checked_at is None or now - self._version_checked_at >= self.version_check_seconds:
+                version = get_version(self.db, GOLD_VERSION)
+                if version != self._version:
+                    logger.info(f"Gold version changed to {version}, cached answers are stale")
+                self._version = version
+                self._version_checked_at = now
+            return self._version
+
+    def _cached(self, name: str, params: tuple, fetch: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        key = (self.gold_version(), name, params)
+        found, value = self.cache.get(key)
+        if not found:
+            value = fetch()
+            self.cache.put(key, value)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.latencies.append(time.perf_counter() - start)
+        return value
+
+    def _find(self, table: str, query: dict[str, Any], sort: Optional[tuple[str, int]] = None, limit: int = 0) -> list[dict]:
+        cursor = self.db[GOLD_COLLECTIONS[table]].find(query, {"_id": 0, STATE_FIELD: 0})
+        if sort:
+            cursor = cursor.sort(*sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+
+    # -----------------------------
+    # LOOKUPS
+    # -----------------------------
+    def year_stats(self, year: Optional[int] = None) -> list[YearStats]:
+        """Every year in order, or just ``year``"""
+        query = {} if year is None else {"year": int(year)}
+        return self._cached("year_stats", (year,), lambda: [
+            _from_doc(YearStats, doc) for doc in self._find("yearly", query, ("year", 1))
+        ])
+
+    def top_towns(self, n: int = 10, by: str = "total_sales") -> list[TownStats]:
+        """The ``n`` towns with the highest ``by`` metric"""
+        if by not in TOWN_RANKINGS:
+            raise ValueError(f"Cannot rank towns by {by}; choose one of {TOWN_RANKINGS}")
+        if n < 1:
+            raise ValueError(f"n must be positive, got {n}")
+        return self._cached("top_towns", (n, by), lambda: [
+            _from_doc(TownStats, doc) for doc in self._find("town", {}, (by, -1), n)
+        ])
+
+    def property_stats(self, property_type: Optional[str] = None) -> list[PropertyStats]:
+        """Every property type by sale count, or just ``property_type``"""
+        query = {} if property_type is None else {"property_type": property_type}
+        return self._cached("property_stats", (property_type,), lambda: [
+            _from_doc(PropertyStats, doc) for doc in self._find("property", query, ("sale_count", -1))
+        ])
+
+    def stats(self) -> dict[str, Any]:
+        """Cache counters and lookup latency percentiles (ms)"""
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            hits, misses, version = self.hits, self.misses, self._version
+        total = hits + misses
+        percentiles = (
+            {f"p{q}_ms": round(float(np.percentile(latencies, q)), 3) for q in (50, 95, 99)}
+            if len(latencies) else {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+        )
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+            "entries": len(self.cache),
+            "gold_version": version,
+            **percentiles,
+        }
+
+    def close(self) -> None:
+        self.client.close()
+
+
+# -----------------------------
+# OPTIONAL HTTP ENDPOINT
+# -----------------------------
+def make_handler(service: GoldQueryService) -> type[BaseHTTPRequestHandler]:
+    """JSON GET routes: /years, /towns/top, /properties and /stats"""
+
+    def first(params: dict[str, list[str]], name: str, default: Any = None) -> Any:
+        return params[name][0] if name in params else default
+
+    routes: dict[str, Callable[[dict[str, list[str]]], Any]] = {
+        "/years": lambda params: service.year_stats(
+            int(first(params, "year")) if "year" in params else None
+        ),
+        "/towns/top": lambda params: service.top_towns(
+            int(first(params, "n", 10)), first(params, "by", "total_sales")
+        ),
+        "/properties": lambda params: service.property_stats(first(params, "property_type")),
+        "/stats": lambda params: service.stats(),
+    }
+
+    class GoldRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            route = routes.get(url.path)
+            if route is None:
+                self._send(404, {"error": f"Unknown path {url.path}"})
+                return
+            try:
+                result = route(parse_qs(url.query))
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            if isinstance(result, list):
+                result = [asdict(row) for row in result]
+            self._send(200, result)
+
+        def _send(self, status: int, body: Any) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format % args)
+
+    return GoldRequestHandler
+
+
+def serve(service: GoldQueryService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """HTTP server for ``service``; call serve_forever() (or run it in a thread)"""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    logger.info(f"Serving gold queries on http://{host}:{server.server_address[1]}")
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve cached gold-layer lookups over HTTP")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="real_estate_db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ttl", type=float, default=300.0, help="seconds a cached answer may live")
+    parser.add_argument(
+        "--version-check", type=float, default=0.0,
+        help="seconds to reuse the gold version before re-reading it; answers may be that stale",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    service = GoldQueryService(
+        args.mongo_uri, args.db, ttl_seconds=args.ttl, version_check_seconds=args.version_check
+    )
+    server = serve(service, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
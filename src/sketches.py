@@ -0,0 +1,337 @@
+import math
+import struct
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch (merging t-digest with the k1 scale function).
+
+    Values are folded into at most ~compression/2 weighted centroids; the
+    arcsine scale keeps centroids small near q=0 and q=1, so tail quantiles
+    stay accurate. Compression is vectorised: every point is assigned to the
+    k-scale bucket its left edge falls in and buckets are reduced with numpy.
+    """
+    HEADER = struct.Struct("<4sdddI")
+    MAGIC = b"TD01"
+
+    def __init__(self, compression: float = 200.0):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def of(cls, values: np.ndarray, compression: float = 200.0) -> "TDigest":
+        digest = cls(compression)
+        digest.update(values)
+        return digest
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray) -> "TDigest":
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        return self.merge_all([other])
+
+    def merge_all(self, others: list["TDigest"]) -> "TDigest":
+        """Fold many digests in with a single compression pass"""
+        others = [other for other in others if other.count]
+        if others:
+            self.min = min(self.min, *(other.min for other in others))
+            self.max = max(self.max, *(other.max for other in others))
+            self._compress(np.concatenate([self.means, *(other.means for other in others)]),
+                           np.concatenate([self.weights, *(other.weights for other in others)]))
+        return self
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        left = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * left - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q: float) -> float:
+        """Value at rank ``q`` (0..1), interpolated between centroid centres"""
+        if not len(self.weights):
+            return math.nan
+        total = self.weights.sum()
+        centres = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(
+            q * total,
+            np.r_[0.0, centres, total],
+            np.r_[self.min, self.means, self.max],
+        ))
+
+    def to_bytes(self) -> bytes:
+        header = self.HEADER.pack(self.MAGIC, self.compression, self.min, self.max, len(self.means))
+        return header + self.means.astype("<f8").tobytes() + self.weights.astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        magic, compression, low, high, size = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError("Not a serialized TDigest")
+        digest = cls(compression)
+        digest.min, digest.max = low, high
+        body = np.frombuffer(data, dtype="<f8", offset=cls.HEADER.size)
+        digest.means = body[:size].copy()
+        digest.weights = body[size:2 * size].copy()
+        return digest
+
+
+class HyperLogLog:
+    """
+    Mergeable distinct counter over 64-bit hashes.
+
+    2**precision one-byte registers; relative standard error is about
+    1.04 / sqrt(2**precision), i.e. 1.6% at the default precision of 12.
+    """
+    MAGIC = b"HL01"
+    #sparse form (register index, rank) pairs, for sketches of small groups
+    SPARSE_MAGIC = b"HS01"
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be in 4..18, got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def of(cls, hashes: np.ndarray, precision: int = 12) -> "HyperLogLog":
+        sketch = cls(precision)
+        sketch.update(hashes)
+        return sketch
+
+    def update(self, hashes: np.ndarray) -> "HyperLogLog":
+        """Add uint64 hashes (see hash_values)"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return self
+        tail_bits = 64 - self.precision
+        index = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        rank = (tail_bits - _bit_length(tail) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        return self.merge_all([other])
+
+    def merge_all(self, others: list["HyperLogLog"]) -> "HyperLogLog":
+        if any(other.precision != self.precision for other in others):
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        if others:
+            np.maximum.reduce([self.registers, *(other.registers for other in others)], out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int((self.registers == 0).sum())
+        #linear counting is the better estimator while many registers are empty
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self) -> bytes:
+        index = np.flatnonzero(self.registers)
+        return _hll_bytes(self.precision, index, self.registers[index], self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        magic = data[:4]
+        if magic not in (cls.MAGIC, cls.SPARSE_MAGIC):
+            raise ValueError("Not a serialized HyperLogLog")
+        sketch = cls(data[4])
+        if magic == cls.MAGIC:
+            sketch.registers = np.frombuffer(data, dtype=np.uint8, offset=5).copy()
+        else:
+            size = (len(data) - 5) // 3
+            index = np.frombuffer(data, dtype="<u2", count=size, offset=5)
+            sketch.registers[index] = np.frombuffer(data, dtype=np.uint8, offset=5 + 2 * size)
+        return sketch
+
+
+def _hll_bytes(precision: int, index: np.ndarray, ranks: np.ndarray, dense: Optional[np.ndarray] = None) -> bytes:
+    """Sparse encoding while it is smaller than the dense register array"""
+    if 3 * len(index) < (1 << precision):
+        return (HyperLogLog.SPARSE_MAGIC + bytes([precision])
+                + index.astype("<u2").tobytes() + ranks.astype(np.uint8).tobytes())
+    if dense is None:
+        dense = np.zeros(1 << precision, dtype=np.uint8)
+        dense[index] = ranks
+    return HyperLogLog.MAGIC + bytes([precision]) + dense.tobytes()
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """Stable 64-bit hashes of the non-missing values, for HyperLogLog.update"""
+    values = values.dropna()
+    if pd.api.types.infer_dtype(values, skipna=False) != "string":
+        values = values.astype(str)
+    return pd.util.hash_array(values.to_numpy(dtype=object))
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Exact bit length of uint64 values, by binary search over shifts"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        wide = values >= np.uint64(1 << shift)
+        length[wide] += shift
+        values[wide] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def merge_serialized(kind: str, left: Optional[bytes], right: bytes) -> bytes:
+    """Merge two serialized sketches of ``kind`` ("tdigest" or "hll")"""
+    if left is None:
+        return right
+    return merge_all_serialized(kind, [left, right])
+
+
+def merge_all_serialized(kind: str, blobs: list[bytes]) -> bytes:
+    """Merge any number of serialized sketches of ``kind`` in one pass"""
+    if kind == "hll":
+        return _merge_hll_bytes(blobs)
+    return _merge_tdigest_bytes(blobs)
+
+
+def _merge_tdigest_bytes(blobs: list[bytes]) -> bytes:
+    """Concatenate every encoded digest's centroids and compress them once"""
+    header = TDigest.HEADER
+    digest = TDigest(header.unpack_from(blobs[0])[1])
+    means, weights = [], []
+    for blob in blobs:
+        magic, _, low, high, size = header.unpack_from(blob)
+        if magic != TDigest.MAGIC:
+            raise ValueError("Not a serialized TDigest")
+        if size:
+            body = np.frombuffer(blob, dtype="<f8", offset=header.size)
+            means.append(body[:size])
+            weights.append(body[size:])
+            digest.min = min(digest.min, low)
+            digest.max = max(digest.max, high)
+    if means:
+        digest._compress(np.concatenate(means), np.concatenate(weights))
+    return digest.to_bytes()
+
+
+def _merge_hll_bytes(blobs: list[bytes]) -> bytes:
+    """Union straight from the encodings: sparse pairs are scattered, never densified one by one"""
+    precision = blobs[0][4]
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    indexes, ranks = [], []
+    for blob in blobs:
+        if blob[4] != precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        if blob[:4] == HyperLogLog.MAGIC:
+            np.maximum(registers, np.frombuffer(blob, dtype=np.uint8, offset=5), out=registers)
+        elif blob[:4] == HyperLogLog.SPARSE_MAGIC:
+            size = (len(blob) - 5) // 3
+            indexes.append(np.frombuffer(blob, dtype="<u2", count=size, offset=5))
+            ranks.append(np.frombuffer(blob, dtype=np.uint8, offset=5 + 2 * size))
+        else:
+            raise ValueError("Not a serialized HyperLogLog")
+    if indexes:
+        np.maximum.at(registers, np.concatenate(indexes), np.concatenate(ranks))
+    index = np.flatnonzero(registers)
+    return _hll_bytes(precision, index, registers[index], registers)
+
+
+# -----------------------------
+# ONE SKETCH PER GROUP, VECTORISED
+# -----------------------------
+def tdigests_by_group(codes: np.ndarray, values: np.ndarray, groups: int, compression: float = 200.0) -> list[bytes]:
+    """Serialized TDigest.of(values[codes == g]) for every group g, in one sort
+
+    ``codes`` are group numbers (as from GroupBy.ngroup; -1 rows are skipped).
+    """
+    if groups == 0:
+        return []
+    values = np.asarray(values, dtype=float)
+    keep = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    #two stable sorts (values, then the codes, radix-sorted when they fit 16 bits) beat one lexsort
+    order = np.argsort(values, kind="stable")
+    narrow = codes[order].astype(np.uint16) if groups <= 1 << 16 else codes[order]
+    order = order[np.argsort(narrow, kind="stable")]
+    codes, values = codes[order], values[order]
+
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    #the same k-scale bucketing TDigest._compress applies to unit weights
+    left = (np.arange(len(codes)) - starts[codes]) / np.maximum(counts[codes], 1)
+    k = compression / (2 * math.pi) * np.arcsin(2 * left - 1)
+    bucket = np.floor(k + compression / 4).astype(np.int64)
+
+    edges = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (bucket[1:] != bucket[:-1])])
+    weights = np.diff(np.r_[edges, len(codes)]).astype(float)
+    means = np.add.reduceat(values, edges) / weights if len(edges) else np.empty(0)
+    bounds = np.searchsorted(codes[edges], np.arange(groups + 1)).tolist()
+
+    #the TDigest.to_bytes layout, written straight from the slices
+    means, weights = means.astype("<f8"), weights.astype("<f8")
+    lows = values[starts[counts > 0]].tolist()
+    highs = values[(starts + counts - 1)[counts > 0]].tolist()
+    empty = TDigest(compression).to_bytes()
+    blobs = []
+    filled = 0
+    for group, count in enumerate(counts.tolist()):
+        if not count:
+            blobs.append(empty)
+            continue
+        first, last = bounds[group], bounds[group + 1]
+        blobs.append(
+            TDigest.HEADER.pack(TDigest.MAGIC, compression, lows[filled], highs[filled], last - first)
+            + means[first:last].tobytes() + weights[first:last].tobytes()
+        )
+        filled += 1
+    return blobs
+
+
+def hlls_by_group(codes: np.ndarray, hashes: np.ndarray, groups: int, precision: int = 12) -> list[bytes]:
+    """Serialized HyperLogLog.of(hashes[codes == g]) for every group g, without a per-row loop"""
+    keep = codes >= 0
+    codes, hashes = codes[keep].astype(np.int64), np.asarray(hashes, dtype=np.uint64)[keep]
+    tail_bits = 64 - precision
+    index = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+    rank = (tail_bits - _bit_length(hashes & np.uint64((1 << tail_bits) - 1)) + 1).astype(np.uint8)
+
+    #max rank per (group, register)
+    cells, inverse = np.unique(codes * (1 << precision) + index, return_inverse=True)
+    ranks = np.zeros(len(cells), dtype=np.uint8)
+    np.maximum.at(ranks, inverse, rank)
+    cell_group = cells >> precision
+    cell_index = cells & ((1 << precision) - 1)
+    bounds = np.searchsorted(cell_group, np.arange(groups + 1))
+
+    return [
+        _hll_bytes(precision, cell_index[bounds[group]:bounds[group + 1]], ranks[bounds[group]:bounds[group + 1]])
+        for group in range(groups)
+    ]
+
+
+SKETCH_TYPES = {"tdigest": TDigest, "hll": HyperLogLog}
@@ -0,0 +1,198 @@
+from pathlib import Path
+from typing import Any, Iterator, Optional
+from datetime import datetime, timezone
+from src.schemas import RealEstateDataClean
+from src.validation import rules_from_model
+from src.versions import get_version
+import pandas as pd
+import logging
+import shutil
+import json
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pragma: no cover - exercised only without pyarrow
+    pa = None
+    ds = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = "data/snapshots/real_estate_clean"
+MANIFEST_FILE = "_manifest.json"
+
+
+def arrow_schema() -> "pa.Schema":
+    """Arrow schema of the clean layer, derived from RealEstateDataClean"""
+    arrow_types = {
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        #BSON dates carry millisecond precision
+        datetime: pa.timestamp("ms"),
+        #GeoJSON points (see src/geo.py)
+        dict: pa.struct([("type", pa.string()), ("coordinates", pa.list_(pa.float64()))]),
+    }
+    #partition keys stay narrow; they become directory names anyway
+    narrow = {"year": pa.int32(), "month": pa.int8()}
+    return pa.schema([
+        pa.field(rule.name, narrow.get(rule.name, arrow_types[rule.kind]), nullable=rule.nullable)
+        for rule in rules_from_model(RealEstateDataClean)
+    ])
+
+
+class SilverSnapshot:
+    """
+    Columnar Parquet copy of real_estate_clean, hive-partitioned by year
+    (and optionally town), stamped with the clean collection's version.
+    """
+
+    def __init__(self, root: str = DEFAULT_SNAPSHOT_DIR, partition_by_town: bool = False):
+        self.root = Path(root)
+        self.partition_cols = ["year", "town"] if partition_by_town else ["year"]
+
+    @classmethod
+    def published(cls, root: str = DEFAULT_SNAPSHOT_DIR) -> "SilverSnapshot":
+        """The snapshot at ``root`` with the partitioning recorded in its manifest"""
+        snapshot = cls(root)
+        manifest = snapshot.manifest()
+        if manifest is not None:
+            snapshot.partition_cols = list(manifest["partition_cols"])
+        return snapshot
+
+    @staticmethod
+    def available() -> bool:
+        return pa is not None
+
+    def manifest(self) -> Optional[dict[str, Any]]:
+        path = self.root / MANIFEST_FILE
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def is_fresh(self, version: Optional[str]) -> bool:
+        """True when the snapshot was published from clean collection ``version``"""
+        manifest = self.manifest()
+        return (
+            self.available()
+            and version is not None
+            and manifest is not None
+            and manifest["version"] == version
+            and manifest["partition_cols"] == self.partition_cols
+        )
+
+    # -----------------------------
+    # WRITE
+    # -----------------------------
+    def publish(self, collection, version: Optional[str], batch_size: int = 100_000) -> dict[str, Any]:
+        """Stream ``collection`` into a new snapshot, unless one for ``version`` exists"""
+        if not self.available():
+            logger.warning("pyarrow is not installed; skipping Parquet snapshot")
+            return {"published": False, "reused": False, "version": version}
+        if self.is_fresh(version):
+            logger.info(f"Parquet snapshot already at version {version}, reusing it")
+            return {"published": False, "reused": True, "version": version, **self.manifest()}
+
+        schema = arrow_schema()
+        rows = 0
+
+        def batches() -> Iterator["pa.RecordBatch"]:
+            nonlocal rows
+            cursor = collection.find({}, {"_id": 0}, batch_size=batch_size)
+            buffer = []
+            for doc in cursor:
+                buffer.append(doc)
+                if len(buffer) == batch_size:
+                    rows += len(buffer)
+                    yield from self._to_batches(buffer, schema)
+                    buffer = []
+            if buffer:
+                rows += len(buffer)
+                yield from self._to_batches(buffer, schema)
+
+        #write next to the live snapshot and swap, so readers never see half a snapshot
+        staging = self.root.with_name(f"{self.root.name}.tmp-{uuid.uuid4().hex}")
+        ds.write_dataset(
+            batches(),
+            staging,
+            schema=schema,
+            format="parquet",
+            partitioning=self._partitioning(schema),
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        manifest = {
+            "version": version,
+            "rows": rows,
+            "partition_cols": self.partition_cols,
+            "written_at": datetime.now(timezone.utc).isoformat(),
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+        retired = self.root.with_name(f"{self.root.name}.old-{uuid.uuid4().hex}")
+        if self.root.exists():
+            self.root.rename(retired)
+        staging.rename(self.root)
+        shutil.rmtree(retired, ignore_errors=True)
+
+        logger.info(f"Published Parquet snapshot of {rows} rows at version {version} to {self.root}")
+        return {"published": True, "reused": False, **manifest}
+
+    @staticmethod
+    def _to_batches(docs: list[dict[str, Any]], schema: "pa.Schema") -> list["pa.RecordBatch"]:
+        #fields missing from a document become nulls; nested GeoJSON maps onto the struct type
+        return pa.Table.from_pylist(docs, schema=schema).to_batches()
+
+    def _partitioning(self, schema: "pa.Schema") -> "ds.Partitioning":
+        return ds.partitioning(
+            pa.schema([schema.field(column) for column in self.partition_cols]),
+            flavor="hive",
+        )
+
+    # -----------------------------
+    # READ
+    # -----------------------------
+    def read(
+        self,
+        columns: Optional[list[str]] = None,
+        filters: Optional[dict[str, Any]] = None,
+    ) -> pd.DataFrame:
+        """Read with column projection; filters on partition columns prune whole directories
+
+        ``filters`` maps a column to a value or a list of accepted values.
+        """
+        dataset = ds.dataset(
+            self.root, format="parquet", partitioning=self._partitioning(arrow_schema())
+        )
+        expression = None
+        for column, value in (filters or {}).items():
+            condition = (
+                ds.field(column).isin(value)
+                if isinstance(value, (list, tuple, set))
+                else ds.field(column) == value
+            )
+            expression = condition if expression is None else expression & condition
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def read_silver(
+    db,
+    columns: Optional[list[str]] = None,
+    filters: Optional[dict[str, Any]] = None,
+    root: str = DEFAULT_SNAPSHOT_DIR,
+) -> pd.DataFrame:
+    """Read the silver layer from the snapshot when fresh, otherwise from MongoDB"""
+    snapshot = SilverSnapshot.published(root)
+    if snapshot.is_fresh(get_version(db, "real_estate_clean")):
+        return snapshot.read(columns, filters)
+
+    logger.info("Parquet snapshot missing or stale, reading real_estate_clean from MongoDB")
+    #year is a stored field, so a year filter is an index lookup (see src/indexes.py)
+    query = {
+        column: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else value
+        for column, value in (filters or {}).items()
+    }
+    projection = {"_id": 0}
+    if columns:
+        projection.update({column: 1 for column in columns})
+    return pd.DataFrame(list(db["real_estate_clean"].find(query, projection)))
@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+from src.parsing import RAW_COLUMNS
+import numpy as np
+import pandas as pd
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOWN_COUNT = 169
+#(property type, share of sales), roughly the published dataset's mix
+PROPERTY_TYPES = (
+    ("Residential", 0.38), ("Single Family", 0.30), ("Condo", 0.12), ("Two Family", 0.05),
+    ("Three Family", 0.02), ("Vacant Land", 0.04), ("Commercial", 0.03), ("Four Family", 0.01),
+    ("Apartments", 0.02), ("Industrial", 0.02), ("Public Utility", 0.01),
+)
+RESIDENTIAL_TYPES = ("Single Family", "Condo", "Two Family", "Three Family", "Four Family")
+STREETS = ("MAIN ST", "ELM ST", "OAK AVE", "MAPLE DR", "CHURCH ST", "HIGH ST", "PARK RD", "HILL RD")
+NON_USE_CODES = ("07 - Change in Property", "14 - Foreclosure", "25 - Other", "08 - Part Interest")
+REMARKS = ("ESTATE SALE", "FORECLOSURE", "SHORT SALE", "NEW CONSTRUCTION")
+
+MISSING_MARKERS = np.array(["n/a", "-", "", "null", "na"], dtype=object)
+BAD_DATES = np.array(["13/45/2020", "02/30/2019", "not a date", "2020-01-01"], dtype=object)
+
+
+@dataclass(frozen=True)
+class DirtyRates:
+    """Share of rows receiving each kind of defect the clean layer must handle"""
+    missing: float = 0.01
+    bad_date: float = 0.005
+    negative_amount: float = 0.005
+    duplicate_pair: float = 0.02
+    padded_text: float = 0.01
+
+
+def town_names(count: int = TOWN_COUNT) -> np.ndarray:
+    return np.array([f"Town {i:03d}" for i in range(1, count + 1)], dtype=object)
+
+
+def generate_frame(
+    rows: int,
+    seed: int = 0,
+    dirty: DirtyRates = DirtyRates(),
+    offset: int = 0,
+    complete_text: bool = False,
+) -> pd.DataFrame:
+    """``rows`` raw-layer rows as read_csv would return them, fully determined by ``seed``
+
+    Towns follow a Zipf-like skew, sale amounts a log-normal, and the
+    ``dirty`` rates inject missing markers, bad dates, negative amounts,
+    padded text and repeated address/date pairs. ``offset`` numbers serials
+    when a file is generated in chunks.
+
+    Optional text columns are mostly empty, as in the published data, and
+    validation rejects rows whose optional text is NaN; ``complete_text``
+    fills them so nearly every row reaches the clean and gold stages.
+    """
+    rng = np.random.default_rng(seed)
+
+    towns = town_names()
+    town_weights = 1 / np.arange(1, len(towns) + 1) ** 1.1
+    town = towns[rng.choice(len(towns), rows, p=town_weights / town_weights.sum())]
+
+    names, shares = zip(*PROPERTY_TYPES)
+    shares = np.array(shares) / sum(shares)
+    property_type = np.array(names, dtype=object)[rng.choice(len(names), rows, p=shares)]
+    #"Residential" sales name their residential type; the specific types repeat it
+    residential_type = np.where(
+        np.isin(property_type, RESIDENTIAL_TYPES), property_type,
+        np.array(RESIDENTIAL_TYPES, dtype=object)[rng.integers(0, len(RESIDENTIAL_TYPES), rows)],
+    )
+    if not complete_text:
+        residential_type = np.where(np.isin(property_type, RESIDENTIAL_TYPES + ("Residential",)), residential_type, None)
+
+    list_year = rng.integers(2001, 2024, rows)
+    #recorded between October of the list year and the following September;
+    #only the few thousand distinct days are formatted
+    october = (list_year - 1970).astype("datetime64[Y]").astype("datetime64[M]") + 9
+    days = october.astype("datetime64[D]") + rng.integers(0, 365, rows)
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    formatted = pd.DatetimeIndex(unique_days).strftime("%m/%d/%Y").to_numpy(dtype=object)
+    date_recorded = formatted[inverse]
+
+    sale_amount = np.round(rng.lognormal(12.4, 0.9, rows), -2)
+    assessed_value = np.round(sale_amount * rng.uniform(0.5, 0.9, rows), -1)
+    house = rng.integers(1, 2000, rows)
+    street = np.array(STREETS, dtype=object)[rng.integers(0, len(STREETS), rows)]
+    address = pd.Series(house).astype(str).to_numpy(dtype=object) + " " + street
+
+    longitude = np.round(rng.uniform(-73.7, -71.8, rows), 5)
+    latitude = np.round(rng.uniform(40.98, 42.05, rows), 5)
+    location = np.where(
+        rng.random(rows) < (1.0 if complete_text else 0.7),
+        "POINT (" + longitude.astype(str).astype(object) + " " + latitude.astype(str).astype(object) + ")",
+        None,
+    )
+
+    df = pd.DataFrame({
+        "Serial Number": np.arange(offset, offset + rows) + 200_000,
+        "List Year": list_year,
+        "Date Recorded": date_recorded,
+        "Town": town,
+        "Address": address,
+        "Assessed Value": assessed_value,
+        "Sale Amount": sale_amount,
+        "Sales Ratio": np.round(assessed_value / sale_amount, 4),
+        "Property Type": property_type,
+        "Residential Type": residential_type,
+        "Non Use Code": _sprinkle(rng, rows, 1.0 if complete_text else 0.15, NON_USE_CODES),
+        "Assessor Remarks": _sprinkle(rng, rows, 1.0 if complete_text else 0.10, REMARKS),
+        "OPM remarks": _sprinkle(rng, rows, 1.0 if complete_text else 0.02, REMARKS),
+        "Location": location,
+    }, columns=RAW_COLUMNS)
+    return _make_dirty(df, rng, dirty)
+
+
+def _sprinkle(rng: np.random.Generator, rows: int, share: float, values: tuple[str, ...]) -> np.ndarray:
+    """``values`` on about ``share`` of the rows, None elsewhere"""
+    chosen = np.array(values, dtype=object)[rng.integers(0, len(values), rows)]
+    return np.where(rng.random(rows) < share, chosen, None)
+
+
+def _make_dirty(df: pd.DataFrame, rng: np.random.Generator, dirty: DirtyRates) -> pd.DataFrame:
+    rows = len(df)
+
+    def pick(rate: float) -> np.ndarray:
+        return rng.random(rows) < rate
+
+    #repeated (address, date) pairs copy an earlier row's pair
+    duplicate = np.flatnonzero(pick(dirty.duplicate_pair))
+    duplicate = duplicate[duplicate > 0]
+    source = (rng.random(len(duplicate)) * duplicate).astype(np.int64)
+    for column in ("Address", "Date Recorded"):
+        values = df[column].to_numpy(dtype=object)
+        values[duplicate] = values[source]
+        df[column] = values
+
+    for column in ("Sale Amount", "Assessed Value"):
+        df[column] = df[column].where(~pick(dirty.negative_amount), -df[column])
+
+    for column in ("Address", "Assessed Value", "Sale Amount"):
+        mask = pick(dirty.missing)
+        values = df[column].to_numpy(dtype=object)
+        values[mask] = MISSING_MARKERS[rng.integers(0, len(MISSING_MARKERS), mask.sum())]
+        df[column] = values
+
+    mask = pick(dirty.bad_date)
+    dates = df["Date Recorded"].to_numpy(dtype=object)
+    dates[mask] = BAD_DATES[rng.integers(0, len(BAD_DATES), mask.sum())]
+    df["Date Recorded"] = dates
+
+    for column in ("Town", "Address"):
+        mask = pick(dirty.padded_text)
+        values = df[column].to_numpy(dtype=object)
+        values[mask] = "  " + values[mask].astype(str) + " "
+        df[column] = values
+    return df
+
+
+def iter_frames(
+    rows: int,
+    seed: int = 0,
+    chunk_rows: int = 500_000,
+    dirty: DirtyRates = DirtyRates(),
+    complete_text: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """``rows`` rows in chunks; each chunk has its own seed derived from ``seed``"""
+    for index, offset in enumerate(range(0, rows, chunk_rows)):
+        yield generate_frame(
+            min(chunk_rows, rows - offset), seed=seed * 1_000_003 + index,
+            dirty=dirty, offset=offset, complete_text=complete_text,
+        )
+
+
+def write_csv(
+    path: str,
+    rows: int,
+    seed: int = 0,
+    chunk_rows: int = 500_000,
+    dirty: DirtyRates = DirtyRates(),
+    complete_text: bool = False,
+) -> Path:
+    """Write a synthetic raw CSV; memory is bounded by ``chunk_rows``"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="") as handle:
+        for index, frame in enumerate(iter_frames(rows, seed, chunk_rows, dirty, complete_text)):
+            frame.to_csv(handle, index=False, header=index == 0)
+    logger.info(f"Wrote {rows} synthetic rows to {path} (seed {seed})")
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic real estate sales CSV")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data/synthetic/real_estate_1m.csv")
+    parser.add_argument("--complete-text", action="store_true", help="fill every optional text column")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    write_csv(args.out, args.rows, args.seed, complete_text=args.complete_text)
+
+
+if __name__ == "__main__":
+    main()
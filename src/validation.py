@@ -0,0 +1,278 @@
+import types
+import typing
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from src.schemas import RealEstateDataClean
+
+#pydantic only accepts floats inside the signed 64-bit range for int fields
+INT64_BOUND = 2.0 ** 63
+
+#lax-mode integer strings: optional sign, digits (underscores allowed), ".0*" tail
+INT_STRING = r"[+-]?\d+(?:_\d+)*(?:\.0+)?"
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    """What the pydantic model requires of one field"""
+    name: str
+    kind: type
+    required: bool
+    nullable: bool
+    default: Any = None
+    ge: Optional[float] = None
+
+
+@dataclass
+class ValidationResult:
+    """Keep-mask, per-rule reject counts and the coerced column values"""
+    mask: pd.Series
+    rejects: dict[str, int]
+    values: dict[str, pd.Series] = field(repr=False)
+
+    @property
+    def kept(self) -> int:
+        return int(self.mask.sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        """Kept rows in model field order, indexed by the rows they came from"""
+        keep = self.mask.to_numpy()
+        #from plain arrays pandas infers datetime64 for the object columns of datetimes
+        return pd.DataFrame(
+            {name: values[keep].to_numpy() for name, values in self.values.items()},
+            index=self.mask.index[keep],
+        )
+
+
+def rules_from_model(model: type[BaseModel]) -> list[FieldRule]:
+    """Translate the model's field annotations and constraints into column rules"""
+    rules = []
+    for name, info in model.model_fields.items():
+        kind, nullable = _unwrap_optional(info.annotation)
+        if kind not in (int, float, str, datetime, dict):
+            raise TypeError(f"No columnar rule for {name}: {info.annotation}")
+
+        ge = None
+        for constraint in info.metadata:
+            if getattr(constraint, "ge", None) is not None:
+                ge = constraint.ge
+
+        rules.append(FieldRule(
+            name=name,
+            kind=kind,
+            required=info.is_required(),
+            nullable=nullable,
+            default=None if info.is_required() else info.default,
+            ge=ge,
+        ))
+    return rules
+
+
+def _unwrap_optional(annotation: Any) -> tuple[Any, bool]:
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return annotation, False
+
+
+class ColumnarValidator:
+    """
+    Whole-column equivalent of building a pydantic model per row.
+
+    Mirrors pydantic's lax-mode coercion: ints accept integral floats and
+    integer strings, floats accept numeric strings and NaN, strings must
+    already be str, datetimes accept datetimes and ISO 8601 strings, dicts
+    (GeoJSON locations) must already be dicts, and Optional fields accept None
+    but not NaN.
+    """
+
+    def __init__(self, model: type[BaseModel] = RealEstateDataClean):
+        self.model = model
+        self.rules = rules_from_model(model)
+
+    def validate(self, df: pd.DataFrame) -> ValidationResult:
+        mask = np.ones(len(df), dtype=bool)
+        rejects: dict[str, int] = {}
+        values: dict[str, pd.Series] = {}
+
+        for rule in self.rules:
+            if rule.name not in df.columns:
+                if rule.required:
+                    rejects[f"missing:{rule.name}"] = len(df)
+                    mask[:] = False
+                values[rule.name] = pd.Series([rule.default] * len(df), index=df.index, dtype=object)
+                continue
+
+            valid, coerced = _COERCERS[rule.kind](df[rule.name], rule.nullable)
+            rejects[f"type:{rule.name}"] = int((~valid).sum())
+
+            if rule.ge is not None:
+                with np.errstate(invalid="ignore"):
+                    below = valid & ~(pd.to_numeric(coerced, errors="coerce").to_numpy(dtype=float) >= rule.ge)
+                below &= ~(rule.nullable & coerced.isna().to_numpy())
+                label = "non_negative" if rule.ge == 0 else "ge"
+                rejects[f"{label}:{rule.name}"] = int(below.sum())
+                valid = valid & ~below
+
+            mask &= valid
+            values[rule.name] = coerced
+
+        return ValidationResult(
+            mask=pd.Series(mask, index=df.index),
+            rejects={rule: count for rule, count in rejects.items() if count},
+            values=values,
+        )
+
+
+# -----------------------------
+# PER-TYPE COERCION
+# -----------------------------
+NUMBER_TYPES = (int, float, np.integer, np.floating, np.bool_)
+
+#to_dict('records') hands pd.NA to the model as None
+NONE_TYPES = (type(None), type(pd.NA))
+
+
+def _type_masks(col: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+    """None / str / number masks for an object column, one lookup per distinct type"""
+    element_types = np.fromiter(map(type, col.to_numpy(dtype=object)), dtype=object, count=len(col))
+    codes, distinct = pd.factorize(element_types)
+
+    def lookup(predicate) -> np.ndarray:
+        return np.array([predicate(t) for t in distinct], dtype=bool)[codes]
+
+    is_none = lookup(lambda t: t in NONE_TYPES)
+    is_str = lookup(lambda t: issubclass(t, str))
+    is_number = lookup(lambda t: issubclass(t, NUMBER_TYPES))
+    return is_none, is_str, is_number, any(t is not str and issubclass(t, str) for t in distinct)
+
+
+def _finalize(valid: np.ndarray, coerced: pd.Series, is_none: np.ndarray, nullable: bool) -> tuple[np.ndarray, pd.Series]:
+    if nullable and is_none.any():
+        coerced = coerced.astype(object)
+        coerced[is_none] = None
+        valid = valid | is_none
+    return valid, coerced
+
+
+def _coerce_int(col: pd.Series, nullable: bool) -> tuple[np.ndarray, pd.Series]:
+    index = col.index
+    if pd.api.types.is_bool_dtype(col) or pd.api.types.is_integer_dtype(col):
+        is_none = col.isna().to_numpy()
+        coerced = pd.Series(col.to_numpy(dtype="int64", na_value=0), index=index)
+        return _finalize(~is_none, coerced, is_none, nullable)
+
+    if pd.api.types.is_float_dtype(col):
+        numbers = col.to_numpy(dtype=float, na_value=np.nan)
+        is_none = np.zeros(len(col), dtype=bool)
+    else:
+        is_none, is_str, is_number, _ = _type_masks(col)
+        numbers = np.full(len(col), np.nan)
+        numbers[is_number] = col[is_number].astype(float).to_numpy()
+
+        strings = col[is_str].str.strip()
+        parsable = strings.str.fullmatch(INT_STRING)
+        parsed = strings[parsable].str.replace("_", "", regex=False).str.split(".").str[0]
+        string_numbers = np.full(len(strings), np.nan)
+        string_numbers[parsable.to_numpy()] = parsed.astype(float).to_numpy()
+        numbers[is_str] = string_numbers
+
+    with np.errstate(invalid="ignore"):
+        valid = (
+            np.isfinite(numbers)
+            & (numbers == np.trunc(numbers))
+            & (numbers >= -INT64_BOUND)
+            & (numbers < INT64_BOUND)
+        )
+    coerced = pd.Series(np.where(valid, numbers, 0).astype("int64"), index=index)
+    return _finalize(valid, coerced, is_none, nullable)
+
+
+def _coerce_float(col: pd.Series, nullable: bool) -> tuple[np.ndarray, pd.Series]:
+    index = col.index
+    if pd.api.types.is_numeric_dtype(col):
+        #NaN is a valid float, but a nullable dtype's NA arrives as None
+        is_none = (
+            col.isna().to_numpy()
+            if isinstance(col.dtype, pd.api.extensions.ExtensionDtype)
+            else np.zeros(len(col), dtype=bool)
+        )
+        coerced = pd.Series(col.to_numpy(dtype=float, na_value=np.nan), index=index)
+        return _finalize(~is_none, coerced, is_none, nullable)
+
+    is_none, is_str, is_number, _ = _type_masks(col)
+    numbers = np.full(len(col), np.nan)
+    numbers[is_number] = col[is_number].astype(float).to_numpy()
+    valid = is_number.copy()
+
+    #python's float() grammar is what pydantic accepts for numeric strings
+    strings = col[is_str]
+    numbers[is_str] = strings.map(_parse_float).to_numpy(dtype=float)
+    valid[is_str] = strings.map(_is_float).to_numpy(dtype=bool)
+
+    coerced = pd.Series(numbers, index=index)
+    return _finalize(valid, coerced, is_none, nullable)
+
+
+def _parse_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _is_float(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _coerce_str(col: pd.Series, nullable: bool) -> tuple[np.ndarray, pd.Series]:
+    if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_datetime64_any_dtype(col):
+        return np.zeros(len(col), dtype=bool), col.astype(object)
+
+    is_none, valid, _, has_str_subclass = _type_masks(col)
+    coerced = col.astype(object)
+    if has_str_subclass:
+        coerced[valid] = coerced[valid].map(str)
+    return _finalize(valid, coerced, is_none, nullable)
+
+
+def _coerce_datetime(col: pd.Series, nullable: bool) -> tuple[np.ndarray, pd.Series]:
+    if pd.api.types.is_datetime64_any_dtype(col):
+        is_none = col.isna().to_numpy()
+        parsed = pd.to_datetime(col, utc=True)
+        valid = ~is_none
+    else:
+        is_none, is_str, _, _ = _type_masks(col)
+        candidates = is_str | col.map(lambda value: isinstance(value, datetime)).to_numpy(dtype=bool)
+        parsed = pd.to_datetime(col.where(candidates), format="ISO8601", utc=True, errors="coerce")
+        valid = candidates & parsed.notna().to_numpy()
+
+    #naive UTC at microsecond precision boxes to datetime.datetime (a BSON date); NaT to None
+    naive = parsed.dt.tz_convert(None).to_numpy(dtype="datetime64[us]")
+    coerced = pd.Series(naive.tolist(), index=col.index, dtype=object)
+    return _finalize(valid, coerced, is_none, nullable)
+
+
+def _coerce_dict(col: pd.Series, nullable: bool) -> tuple[np.ndarray, pd.Series]:
+    is_none, _, _, _ = _type_masks(col)
+    valid = col.map(lambda value: isinstance(value, dict)).to_numpy(dtype=bool)
+    return _finalize(valid, col.astype(object), is_none, nullable)
+
+
+_COERCERS = {
+    int: _coerce_int,
+    float: _coerce_float,
+    str: _coerce_str,
+    datetime: _coerce_datetime,
+    dict: _coerce_dict,
+}
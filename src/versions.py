@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+from typing import Optional
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+#one document per versioned collection: {_id: <collection>, version, updated_at}
+META_COLLECTION = "real_estate_meta"
+
+
+def bump_version(db, name: str) -> str:
+    """Stamp ``name`` with a fresh version after its contents changed"""
+    version = uuid.uuid4().hex
+    db[META_COLLECTION].update_one(
+        {"_id": name},
+        {"$set": {"version": version, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    logger.info(f"{name} is now at version {version}")
+    return version
+
+
+def get_version(db, name: str) -> Optional[str]:
+    """Current version of ``name``, or None if it was never stamped"""
+    doc = db[META_COLLECTION].find_one({"_id": name})
+    return doc["version"] if doc else None
@@ -0,0 +1,277 @@
+import pytest
+from datetime import datetime
+from unittest.mock import Mock, patch
+import pandas as pd
+from src.aggregate import DataAggregator
+from src.sketches import HyperLogLog, TDigest
+
+CLEAN_ROWS = [
+    {'date_recorded': datetime(2022, 3, 1), 'year': 2022, 'month': 3, 'town': 'Glassboro', 'address': '1 Main St', 'property_type': 'Residential', 'sale_amount': 100000, 'geohash': 'dr7q8z'},
+    {'date_recorded': datetime(2022, 7, 15), 'year': 2022, 'month': 7, 'town': 'Newark', 'address': '2 Main St', 'property_type': 'Condo', 'sale_amount': 250000, 'geohash': 'dr7qb1'},
+    {'date_recorded': datetime(2023, 1, 10), 'year': 2023, 'month': 1, 'town': 'Newark', 'address': '2 Main St', 'property_type': 'Residential', 'sale_amount': 300001, 'geohash': None},
+]
+
+def make_aggregator(MockClient) -> tuple[DataAggregator, dict]:
+    collections = {}
+
+    def get_collection(name: str) -> Mock:
+        if name not in collections:
+            collection = Mock()
+            if name == 'real_estate_clean':
+                collection.find.side_effect = lambda query, projection, **kwargs: [
+                    {key: value for key, value in row.items() if key in projection}
+                    for row in CLEAN_ROWS
+                ]
+            collections[name] = collection
+        return collections[name]
+
+    mock_db = Mock()
+    mock_db.__getitem__ = Mock(side_effect=get_collection)
+    mock_client_instance = Mock()
+    mock_client_instance.__getitem__ = Mock(return_value=mock_db)
+    MockClient.return_value = mock_client_instance
+
+    return DataAggregator("mongodb://localhost:27017", "test_db"), collections
+
+def inserted(collection: Mock) -> list[dict]:
+    return collection.insert_many.call_args[0][0]
+
+def test_aggregate_all_scans_once() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        aggregator, collections = make_aggregator(MockClient)
+        counts = aggregator.aggregate_all()
+
+        assert counts == {'cube': 3, 'yearly': 2, 'town': 2, 'property': 2, 'geo_6': 2, 'geo_5': 2, 'geo_4': 1}
+        clean = collections['real_estate_clean']
+        clean.find.assert_called_once()
+        projection = clean.find.call_args[0][1]
+        assert set(projection) == {'_id', 'year', 'town', 'address', 'property_type', 'sale_amount', 'geohash'}
+        assert set(aggregator.timings) == {'load_seconds', 'compute_seconds', 'write_seconds'}
+
+        yearly = inserted(collections['real_estate_gold_yearly'])
+        sketches = [row['_state'].pop('address') for row in yearly]
+        digests = [row['_state']['sale_amount'].pop('tdigest') for row in yearly]
+        assert yearly == [
+            {'year': 2022, 'avg_sale_amount': 175000.0, 'total_sales': 350000, 'sale_count': 2,
+             'p50_sale_amount': 175000.0, 'p90_sale_amount': 250000.0, 'p99_sale_amount': 250000.0,
+             'approx_distinct_addresses': 2,
+             '_state': {'sale_amount': {'sum': 350000, 'count': 2}}},
+            {'year': 2023, 'avg_sale_amount': 300001.0, 'total_sales': 300001, 'sale_count': 1,
+             'p50_sale_amount': 300001.0, 'p90_sale_amount': 300001.0, 'p99_sale_amount': 300001.0,
+             'approx_distinct_addresses': 1,
+             '_state': {'sale_amount': {'sum': 300001, 'count': 1}}},
+        ]
+        assert HyperLogLog.from_bytes(sketches[0]['hll']).estimate() == 2
+        assert TDigest.from_bytes(digests[0]).count == 2
+
+        town = inserted(collections['real_estate_gold_town'])
+        assert [row['town'] for row in town] == ['Newark', 'Glassboro']
+        assert town[0]['approx_distinct_addresses'] == 1
+        assert inserted(collections['real_estate_gold_property'])[0] == {
+            'property_type': 'Residential', 'avg_sale_amount': 200000.5, 'sale_count': 2,
+            '_state': {'sale_amount': {'sum': 400001, 'count': 2}},
+        }
+
+        #the cube keeps additive metrics plus the sketches the other tables merge
+        cube = inserted(collections['real_estate_gold_cube'])
+        assert [(row['year'], row['town'], row['property_type'], row['total_sales']) for row in cube] == [
+            (2022, 'Glassboro', 'Residential', 100000),
+            (2022, 'Newark', 'Condo', 250000),
+            (2023, 'Newark', 'Residential', 300001),
+        ]
+        assert set(cube[0]['_state']) == {'sale_amount', 'address'}
+        assert 'p50_sale_amount' not in cube[0]
+
+        #grid cells carry their parent cells; the row without a location is left out
+        fine = inserted(collections['real_estate_gold_geo_6'])
+        assert [(row['geohash_4'], row['geohash_5'], row['geohash_6'], row['sale_count']) for row in fine] == [
+            ('dr7q', 'dr7q8', 'dr7q8z', 1),
+            ('dr7q', 'dr7qb', 'dr7qb1', 1),
+        ]
+        coarse = inserted(collections['real_estate_gold_geo_4'])
+        assert [(row['geohash_4'], row['sale_count'], row['p50_sale_amount']) for row in coarse] == [
+            ('dr7q', 2, 175000.0),
+        ]
+
+def test_rollup_reads_only_the_cube() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        aggregator, collections = make_aggregator(MockClient)
+        aggregator.aggregate_all()
+        cube = inserted(collections['real_estate_gold_cube'])
+
+        def find_cube(query, projection):
+            rows = [row for row in cube if all(
+                row[key] in value['$in'] if isinstance(value, dict) else row[key] == value
+                for key, value in query.items()
+            )]
+            return [{**{key: row[key] for key in projection if key in row}, '_state': row['_state']} for row in rows]
+
+        collections['real_estate_gold_cube'].find.side_effect = find_cube
+        collections['real_estate_clean'].find.reset_mock()
+
+        by_town = aggregator.rollup(['town'])
+        assert by_town[['town', 'total_sales', 'sale_count', 'approx_distinct_addresses']].to_dict('records') == [
+            {'town': 'Glassboro', 'total_sales': 100000, 'sale_count': 1, 'approx_distinct_addresses': 1},
+            {'town': 'Newark', 'total_sales': 550001, 'sale_count': 2, 'approx_distinct_addresses': 1},
+        ]
+
+        newark_2022 = aggregator.rollup(['year', 'property_type'], filters={'town': 'Newark', 'year': [2022]},
+                                        metrics=['avg_sale_amount', 'p50_sale_amount'])
+        assert newark_2022.to_dict('records') == [
+            {'year': 2022, 'property_type': 'Condo', 'avg_sale_amount': 250000.0, 'p50_sale_amount': 250000.0},
+        ]
+        query, projection = collections['real_estate_gold_cube'].find.call_args[0]
+        assert query == {'town': 'Newark', 'year': {'$in': [2022]}}
+        assert '_state.address.hll' not in projection
+
+        total = aggregator.rollup(metrics=['sale_count', 'p50_sale_amount'])
+        assert total.to_dict('records') == [{'sale_count': 3, 'p50_sale_amount': 250000.0}]
+        collections['real_estate_clean'].find.assert_not_called()
+
+        with pytest.raises(ValueError):
+            aggregator.rollup(['address'])
+
+def test_single_table_projection() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        aggregator, collections = make_aggregator(MockClient)
+
+        assert aggregator.aggregate_by_property_type() == 2
+        projection = collections['real_estate_clean'].find.call_args[0][1]
+        assert set(projection) == {'_id', 'property_type', 'sale_amount'}
+
+def test_pushdown_pipeline_matches_spec() -> None:
+    from src.aggregate import GOLD_SPECS
+
+    town = next(spec for spec in GOLD_SPECS if spec.name == 'town')
+    pipeline = DataAggregator._pipeline(town)
+
+    assert [list(stage)[0] for stage in pipeline] == ['$match', '$group', '$project', '$sort', '$out']
+    assert pipeline[0]['$match'] == {'town': {'$ne': None}}
+    assert pipeline[1]['$group']['sale_amount__sum'] == {'$sum': '$sale_amount'}
+    assert pipeline[2]['$project']['avg_sale_amount'] == {
+        '$round': [{'$divide': ['$sale_amount__sum', '$sale_amount__count']}, 2]
+    }
+    assert pipeline[2]['$project']['_state'] == {
+        'sale_amount': {'sum': '$sale_amount__sum', 'count': '$sale_amount__count'}
+    }
+    assert pipeline[1]['$group']['sale_amount__quantiles'] == {
+        '$percentile': {'input': '$sale_amount', 'p': [0.5, 0.9, 0.99], 'method': 'approximate'}
+    }
+    assert pipeline[2]['$project']['p90_sale_amount'] == {
+        '$round': [{'$arrayElemAt': ['$sale_amount__quantiles', 1]}, 2]
+    }
+    assert pipeline[2]['$project']['approx_distinct_addresses'] == {'$size': '$address__distinct'}
+    assert pipeline[3]['$sort'] == {'total_sales': -1, 'town': 1}
+    assert pipeline[4]['$out'] == 'real_estate_gold_town'
+
+def test_pushdown_backend_runs_server_side() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        _, collections = make_aggregator(MockClient)
+        aggregator = DataAggregator("mongodb://localhost:27017", "test_db", backend="mongo")
+        aggregator.aggregate_all()
+
+        clean = collections['real_estate_clean']
+        clean.find.assert_not_called()
+        outputs = [call[0][0][-1]['$out'] for call in clean.aggregate.call_args_list]
+        assert outputs == [
+            'real_estate_gold_cube', 'real_estate_gold_yearly', 'real_estate_gold_town', 'real_estate_gold_property',
+            'real_estate_gold_geo_6', 'real_estate_gold_geo_5', 'real_estate_gold_geo_4',
+        ]
+        #grid cells are cut from the stored geohash on the server
+        geo = next(call[0][0] for call in clean.aggregate.call_args_list if call[0][0][-1]['$out'] == 'real_estate_gold_geo_5')
+        assert geo[0]['$match'] == {'geohash': {'$ne': None}}
+        assert geo[1]['$group']['_id'] == {
+            'geohash_4': {'$substrCP': ['$geohash', 0, 4]}, 'geohash_5': {'$substrCP': ['$geohash', 0, 5]},
+        }
+
+def test_fold_batch_merges_state() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        aggregator, collections = make_aggregator(MockClient)
+        collections_batches = aggregator.db['real_estate_gold_batches']
+        collections_batches.find_one.return_value = None
+        #2022 already holds one sale; the town rows are new
+        collections['real_estate_gold_yearly'].find.return_value = [{
+            'year': 2022,
+            '_state': {
+                'sale_amount': {'sum': 400000, 'count': 1, 'tdigest': TDigest.of([400000]).to_bytes()},
+                'address': {'hll': HyperLogLog.of(pd.util.hash_array(pd.Series(['1 Main St'], dtype=object).to_numpy())).to_bytes()},
+            },
+        }]
+        collections['real_estate_gold_town'].find.return_value = []
+        aggregator.db['real_estate_gold_cube'].find.return_value = []
+        for precision in (6, 5, 4):
+            aggregator.db[f'real_estate_gold_geo_{precision}'].find.return_value = []
+
+        batch = pd.DataFrame(CLEAN_ROWS[:2])
+        counts = aggregator.fold_batch(batch, batch_id='2022-release')
+
+        assert counts == {'cube': 2, 'yearly': 1, 'town': 2, 'property': 2, 'geo_6': 2, 'geo_5': 2, 'geo_4': 1}
+        operations = collections['real_estate_gold_yearly'].bulk_write.call_args[0][0]
+        assert operations[0]._filter == {'year': 2022}
+        assert operations[0]._upsert is True
+        merged, metrics = operations[0]._doc
+        assert merged['$set']['_state.sale_amount.sum'] == {
+            '$add': [{'$ifNull': ['$_state.sale_amount.sum', 0]}, 350000]
+        }
+        assert metrics['$set']['sale_count'] == '$_state.sale_amount.count'
+        #sketches are merged with the stored ones before the upsert
+        assert metrics['$set']['p50_sale_amount'] == {'$literal': 250000.0}
+        assert metrics['$set']['approx_distinct_addresses'] == {'$literal': 2}
+        digest = TDigest.from_bytes(merged['$set']['_state.sale_amount.tdigest']['$literal'])
+        assert digest.count == 3
+        collections_batches.insert_one.assert_called_once()
+        assert collections_batches.insert_one.call_args[0][0]['status'] == 'pending'
+        assert collections_batches.update_one.call_args[0][1]['$set']['status'] == 'done'
+
+        #a batch that was already applied is not folded twice
+        collections_batches.find_one.return_value = {'_id': '2022-release', 'status': 'done'}
+        assert aggregator.fold_batch(batch, batch_id='2022-release') == {
+            'cube': 0, 'yearly': 0, 'town': 0, 'property': 0, 'geo_6': 0, 'geo_5': 0, 'geo_4': 0,
+        }
+        assert collections['real_estate_gold_yearly'].bulk_write.call_count == 1
+
+def test_fold_batch_resumes_after_a_partial_failure() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        aggregator, collections = make_aggregator(MockClient)
+        batches = aggregator.db['real_estate_gold_batches']
+        batches.find_one.return_value = None
+        for name in ('cube', 'yearly', 'town', 'property', 'geo_6', 'geo_5', 'geo_4'):
+            aggregator.db[f'real_estate_gold_{name}'].find.return_value = []
+        #the third spec fails after the first two were written
+        collections['real_estate_gold_town'].bulk_write.side_effect = ConnectionError('primary stepped down')
+
+        batch = pd.DataFrame(CLEAN_ROWS[:2])
+        with pytest.raises(ConnectionError):
+            aggregator.fold_batch(batch, batch_id='2022-release')
+        done = [call[0][1]['$addToSet']['specs_done'] for call in batches.update_one.call_args_list]
+        assert done == ['cube', 'yearly']
+
+        #the retry sees the pending marker and only folds the specs that did not land
+        collections['real_estate_gold_town'].bulk_write.side_effect = None
+        batches.find_one.return_value = {'_id': '2022-release', 'status': 'pending', 'specs_done': done}
+        counts = aggregator.fold_batch(batch, batch_id='2022-release')
+
+        assert counts == {'cube': 0, 'yearly': 0, 'town': 2, 'property': 2, 'geo_6': 2, 'geo_5': 2, 'geo_4': 1}
+        assert collections['real_estate_gold_cube'].bulk_write.call_count == 1
+        assert collections['real_estate_gold_yearly'].bulk_write.call_count == 1
+        assert collections['real_estate_gold_town'].bulk_write.call_count == 2
+        batches.insert_one.assert_called_once()
+        assert batches.update_one.call_args[0][1]['$set']['status'] == 'done'
+
+def test_partial_states_merge_like_a_single_pass() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        aggregator, collections = make_aggregator(MockClient)
+        aggregator.aggregate_all()
+        single_pass = {name: inserted(collections[name]) for name in collections if 'gold' in name}
+
+        #the same rows arriving as two batches, as in the async pipeline
+        partials = [aggregator.partial_states(pd.DataFrame(rows)) for rows in (CLEAN_ROWS[:2], CLEAN_ROWS[2:])]
+        counts = aggregator.aggregate_partials(partials)
+
+        assert counts == {'cube': 3, 'yearly': 2, 'town': 2, 'property': 2, 'geo_6': 2, 'geo_5': 2, 'geo_4': 1}
+        for name, rows in single_pass.items():
+            merged = inserted(collections[name])
+            strip = lambda table: sorted(
+                (tuple(sorted((k, v) for k, v in row.items() if k != '_state')) for row in table), key=str
+            )
+            assert strip(merged) == strip(rows)
@@ -0,0 +1,65 @@
+import asyncio
+from unittest.mock import Mock, patch
+import pandas as pd
+from src.async_pipeline import AsyncPipeline, utilization_table
+from src.synthetic import write_csv
+from tests.test_synthetic import make_cleaner
+
+def make_pipeline(MockClient, **kwargs) -> tuple[AsyncPipeline, dict]:
+    collections = {}
+
+    def get_collection(name: str) -> Mock:
+        if name not in collections:
+            collection = Mock()
+            collection.insert_many.side_effect = lambda docs, ordered=True: Mock(inserted_ids=[None] * len(docs))
+            collection.find_one.return_value = None
+            collections[name] = collection
+        return collections[name]
+
+    mock_db = Mock()
+    mock_db.__getitem__ = Mock(side_effect=get_collection)
+    MockClient.return_value.__getitem__ = Mock(return_value=mock_db)
+    return AsyncPipeline("mongodb://localhost:27017", "test_db", **kwargs), collections
+
+def test_async_pipeline_matches_sequential_cleaning(tmp_path) -> None:
+    path = write_csv(tmp_path / 'raw.csv', rows=2_000, seed=4, complete_text=True)
+    with patch('src.connection.MongoClient') as MockClient:
+        pipeline, collections = make_pipeline(MockClient, chunksize=500, queue_size=1)
+        summary = pipeline.run(str(path))
+
+    expected = make_cleaner()._validate_records(make_cleaner()._transform(pd.read_csv(path)))
+    clean_inserted = sum(len(call.args[0]) for call in collections['real_estate_clean'].insert_many.call_args_list)
+    assert (summary['raw_rows'], summary['clean_rows'], clean_inserted) == (2_000, len(expected), len(expected))
+
+    cube = collections['real_estate_gold_cube'].insert_many.call_args[0][0]
+    assert sum(row['sale_count'] for row in cube) == len(expected)
+    assert summary['gold']['cube'] == len(cube)
+
+def test_stage_and_queue_report(tmp_path) -> None:
+    path = write_csv(tmp_path / 'raw.csv', rows=1_000, seed=4, complete_text=True)
+    with patch('src.connection.MongoClient') as MockClient:
+        pipeline, _ = make_pipeline(MockClient, chunksize=250, queue_size=2, sample_seconds=0.001)
+        summary = pipeline.run(str(path))
+
+    assert {stage: stats['items'] for stage, stats in summary['stages'].items()} == {
+        'parse': 4, 'raw_insert': 4, 'clean': 4, 'validate': 4, 'clean_insert': 4, 'gold_partial': 4,
+    }
+    assert all(0 <= stats['utilization'] <= 1 for stats in summary['stages'].values())
+    assert all(queue['max_depth'] <= 2 for queue in summary['queues'].values())
+    assert 'clean_insert' in utilization_table(summary)
+
+def test_no_task_outlives_a_failed_run(tmp_path) -> None:
+    path = write_csv(tmp_path / 'raw.csv', rows=200, seed=4, complete_text=True)
+
+    async def run_and_list_tasks() -> set:
+        try:
+            await pipeline.run_async(str(path))
+        except* RuntimeError:
+            pass
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    with patch('src.connection.MongoClient') as MockClient:
+        pipeline, _ = make_pipeline(MockClient, chunksize=100, sample_seconds=0.001)
+        with patch.object(pipeline.cleaner, '_transform', side_effect=RuntimeError('clean failed')):
+            #the queue sampler is awaited, not just cancelled
+            assert asyncio.run(run_and_list_tasks()) == set()
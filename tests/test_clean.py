@@ -1,11 +1,11 @@
 import pytest
 from unittest.mock import MagicMock, Mock, patch
-from src.clean import DataCleaner
+from src.clean import DataCleaner, SeenKeys
 import pandas as pd
 from datetime import datetime
 
 def test_clean() -> None:
-    with patch('src.clean.MongoClient') as MockClient:
+    with patch('src.connection.MongoClient') as MockClient:
         mock_raw_collection = Mock()
         mock_raw_collection.find.return_value = [
             {
@@ -55,7 +55,7 @@ def test_remove_duplicates() -> None:
     assert len(result) == 2
 
 def test_clean_collection() -> None:
-    with patch('src.clean.MongoClient') as MockClient:
+    with patch('src.connection.MongoClient') as MockClient:
         mock_raw_collection = Mock()
         mock_raw_collection.find.return_value = [
             {
@@ -93,4 +93,106 @@ def test_clean_collection() -> None:
         #verify
         calls = [call[0][0] for call in mock_db.__getitem__.call_args_list]
         assert 'real_estate_raw' in calls
-        assert 'real_estate_clean' in calls
\ No newline at end of file
+        assert 'real_estate_clean' in calls
+
+def test_remove_duplicates_across_batches() -> None:
+    cleaner = DataCleaner.__new__(DataCleaner)
+    seen_keys = SeenKeys()
+
+    first = cleaner._remove_duplicates(pd.DataFrame({
+        'address': ['123 Main St', '123 Main St', '456 Maple Lane'],
+        'date_recorded': ['2023-01-01', '2023-01-01', '2023-01-02']
+    }), seen_keys)
+    second = cleaner._remove_duplicates(pd.DataFrame({
+        'address': ['456 Maple Lane', '456 Maple Lane', '789 Oak Ave'],
+        'date_recorded': ['2023-01-02', '2023-01-03', '2023-01-02']
+    }), seen_keys)
+
+    assert len(first) == 2
+    assert second['date_recorded'].tolist() == ['2023-01-03', '2023-01-02']
+    #each kept pair is stored once, merged in sorted order
+    assert len(seen_keys) == 4
+    assert (seen_keys.hashes[:-1] < seen_keys.hashes[1:]).all()
+
+def test_clean_streaming() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        row = {
+            'serial_number': 1,
+            'list_year': 2023,
+            'date_recorded': '5/15/2023',
+            'town': 'Glassboro',
+            'address': '123 Main St',
+            'assessed_value': '200000',
+            'sale_amount': '250000',
+            'sales_ratio': 0.8,
+            'property_type': 'Residential'
+        }
+        mock_raw_collection = Mock()
+        mock_raw_collection.find.return_value = [
+            dict(row),
+            dict(row, address='456 Maple Lane'),
+            dict(row),
+            dict(row, address='789 Oak Ave', sale_amount='-5'),
+            dict(row, address='1 Elm St'),
+        ]
+        mock_clean_collection = Mock()
+
+        mock_db = Mock()
+        mock_db.__getitem__ = Mock(
+            side_effect=lambda name: mock_raw_collection if name == 'real_estate_raw' else mock_clean_collection
+        )
+        mock_client_instance = Mock()
+        mock_client_instance.__getitem__ = Mock(return_value=mock_db)
+        MockClient.return_value = mock_client_instance
+
+        cleaner = DataCleaner("mongodb://localhost:27017", "test_db")
+        result = cleaner.clean(batch_size=2)
+
+        #the duplicate in batch two and the negative amount are dropped
+        assert result == 3
+        inserted = [
+            record['address']
+            for call in mock_clean_collection.insert_many.call_args_list
+            for record in call[0][0]
+        ]
+        assert inserted == ['123 Main St', '456 Maple Lane', '1 Elm St']
+
+        #the clean layer stores a date plus integer partition keys
+        record = mock_clean_collection.insert_many.call_args_list[0][0][0][0]
+        assert record['date_recorded'] == datetime(2023, 5, 15)
+        assert (record['year'], record['month']) == (2023, 5)
+
+def test_parse_dates_parses_each_distinct_string_once() -> None:
+    from src.clean import parse_dates
+    values = pd.Series(['5/15/2023', None, '5/15/2023', 'not a date', '1/2/2021'], index=[10, 11, 12, 13, 14])
+    with patch.dict('src.clean._parsed_dates', clear=True), \
+            patch('src.clean.pd.to_datetime', wraps=pd.to_datetime) as to_datetime:
+        parsed = parse_dates(values, '%m/%d/%Y')
+        assert to_datetime.call_args[0][0].tolist() == ['5/15/2023', 'not a date', '1/2/2021']
+
+        #a later batch only pays for strings it has not seen
+        parse_dates(pd.Series(['1/2/2021', '3/4/2022']), '%m/%d/%Y')
+        assert to_datetime.call_args[0][0].tolist() == ['3/4/2022']
+
+    assert parsed.index.tolist() == [10, 11, 12, 13, 14]
+    assert parsed[10] == parsed[12] == pd.Timestamp(2023, 5, 15)
+    assert parsed[[11, 13]].isna().all()
+
+
+def test_resolve_duplicate_keeps_earliest_row() -> None:
+    from src.clean import _resolve_duplicate
+
+    record = {'_id': 5, 'address': '123 Main St', 'date_recorded': '2023-01-01'}
+
+    #a later row holds the key: it is displaced and ours inserted
+    collection = Mock()
+    collection.delete_one.return_value = Mock(deleted_count=1)
+    assert _resolve_duplicate(collection, record) is True
+    assert collection.delete_one.call_args[0][0]['_id'] == {'$gt': 5}
+    collection.insert_one.assert_called_once_with(record)
+
+    #an earlier row holds the key: nothing is written
+    collection = Mock()
+    collection.delete_one.return_value = Mock(deleted_count=0)
+    assert _resolve_duplicate(collection, record) is False
+    collection.insert_one.assert_not_called()
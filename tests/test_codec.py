@@ -0,0 +1,76 @@
+import bson
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import Mock
+from bson.objectid import ObjectId
+from src.codec import BsonCodec, DictCodec, get_codec
+
+FRAME = pd.DataFrame({
+    'Serial Number': [1, 2, 3, 4, 5],
+    'Town': ['Glassboro', 'Newark', None, 'Camden', 'Elizabeth'],
+    'Sale Amount': [100000.0, np.nan, 250000.5, 1.0, 2.0],
+})
+
+def test_dict_encode_matches_to_dict() -> None:
+    expected = FRAME.to_dict('records')
+    actual = DictCodec().encode(FRAME)
+
+    assert len(actual) == len(expected)
+    for row, reference in zip(actual, expected):
+        assert list(row) == list(reference)
+        for key, value in reference.items():
+            assert type(row[key]) is type(value)
+            assert row[key] == value or (np.isnan(value) and np.isnan(row[key]))
+
+def test_dict_encode_nullable_ints() -> None:
+    df = pd.DataFrame({'Serial Number': pd.array([1, None], dtype='Int64')})
+    docs = DictCodec().encode(df)
+
+    assert docs == [{'Serial Number': 1}, {'Serial Number': None}]
+    bson.encode(docs[1])
+
+def test_bson_documents_match_dict_encoding() -> None:
+    df = FRAME.assign(**{
+        'Big': [1, 2 ** 40, -2 ** 31, 2 ** 31, -5],
+        'Nullable': pd.array([1, None, 3, 2 ** 35, None], dtype='Int64'),
+        'OPM remarks': ['', np.nan, 'é' * 40, None, 'a\x00b'],
+        'Flag': [True, False, True, True, False],
+        'Date Recorded': pd.to_datetime(['2020-01-01 00:00:00.0019', '1960-05-05', '2021-03-04',
+                                         '1969-12-31 23:59:59.9999', '2001-01-01'], format='ISO8601'),
+        'Property Type': pd.Categorical(['Condo', None, 'Condo', 'Residential', 'Condo']),
+        'location': [{'type': 'Point', 'coordinates': [1.0, 2.0]}, None, None, None, None],
+    })
+    raw = BsonCodec().documents(df)
+
+    #what pymongo sends for the dicts, with the _id it would stamp first
+    for doc, reference in zip(raw, DictCodec().encode(df)):
+        object_id = bson.decode(doc.raw)['_id']
+        assert doc.raw == bson.encode({'_id': object_id, **reference})
+    assert len({bson.decode(doc.raw)['_id'] for doc in raw}) == len(df)
+
+    ids = [ObjectId() for _ in range(len(df))]
+    with_ids = BsonCodec().documents(df.assign(_id=ids))
+    assert [doc['_id'] for doc in with_ids] == ids
+    assert BsonCodec().documents(df.iloc[:0]) == []
+
+def test_bson_codec_rechunks_raw_batches() -> None:
+    docs = FRAME.to_dict('records')
+    collection = Mock()
+    #server replies smaller than the requested batch size
+    collection.find_raw_batches.return_value = [
+        b"".join(bson.encode(doc) for doc in docs[:2]),
+        b"".join(bson.encode(doc) for doc in docs[2:3]),
+        b"".join(bson.encode(doc) for doc in docs[3:]),
+    ]
+
+    frames = list(BsonCodec().iter_frames(collection, batch_size=4, projection={'_id': 0}))
+
+    assert [len(frame) for frame in frames] == [4, 1]
+    assert pd.concat(frames, ignore_index=True)['Serial Number'].tolist() == [1, 2, 3, 4, 5]
+    assert collection.find_raw_batches.call_args.args == ({}, {'_id': 0})
+
+def test_get_codec() -> None:
+    assert get_codec('dict').name == 'dict'
+    with pytest.raises(ValueError):
+        get_codec('pickle')
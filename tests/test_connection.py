@@ -0,0 +1,33 @@
+from unittest.mock import patch
+import pytest
+from src.connection import PROFILES, available_compressors, connect, get_profile
+from src.raw_data import RawDataLoader
+
+def test_compressors_are_filtered_by_installed_modules() -> None:
+    installed = {'zlib', 'snappy'}
+    with patch('src.connection.find_spec', side_effect=lambda module: object() if module in installed else None):
+        assert available_compressors(('zstd', 'snappy', 'zlib')) == ['snappy', 'zlib']
+        assert PROFILES['bulk_load'].client_options()['compressors'] == 'snappy,zlib'
+
+def test_connect_applies_profile_options() -> None:
+    with patch('src.connection.MongoClient') as MockClient, \
+            patch('src.connection.find_spec', return_value=None):
+        connect("mongodb://localhost:27017", "bulk_load")
+
+        MockClient.assert_called_once_with(
+            "mongodb://localhost:27017",
+            appname="real-estate-etl/bulk_load", maxPoolSize=32, w=1, journal=False,
+        )
+        #the default profile only names itself
+        connect("mongodb://localhost:27017")
+        assert MockClient.call_args.kwargs == {"appname": "real-estate-etl/default", "maxPoolSize": 100}
+
+def test_unknown_profile() -> None:
+    with pytest.raises(ValueError):
+        get_profile('turbo')
+
+def test_stages_pick_their_profile() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        loader = RawDataLoader("mongodb://localhost:27017", "test_db")
+        assert loader.profile.name == 'bulk_load' and not loader.profile.ordered
+        assert MockClient.call_args.kwargs['appname'] == 'real-estate-etl/bulk_load'
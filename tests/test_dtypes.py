@@ -0,0 +1,51 @@
+import pandas as pd
+from src.aggregate import DataAggregator, GOLD_SPECS
+from src.dtypes import apply_dtype_plan, plan_from_model
+
+def test_plan_from_clean_model() -> None:
+    plan = plan_from_model()
+
+    assert plan.categoricals == (
+        'town', 'property_type', 'residential_type', 'non_use_code', 'assessor_remarks', 'opm_remarks',
+    )
+    assert plan.integers == ('serial_number', 'list_year', 'year', 'month', 'assessed_value', 'sale_amount')
+    assert 'residential_type' in plan.nullable and 'town' not in plan.nullable
+
+def test_apply_dtype_plan() -> None:
+    df = pd.DataFrame({
+        'town': ['Newark', 'Newark', 'Newark', 'Glassboro'],
+        'address': ['1 Main St', '2 Main St', '3 Main St', '4 Main St'],
+        'residential_type': ['Condo', None, float('nan'), 'Condo'],
+        'list_year': [2021, 2021, 2022, 2022],
+        'sale_amount': [100000.0, 250000.0, 300001.0, 5.0],
+        'sales_ratio': [0.5, 0.25, 0.125, 1.0],
+    })
+    result = apply_dtype_plan(df.copy(), plan_from_model(), strict_missing=True)
+
+    assert isinstance(result['town'].dtype, pd.CategoricalDtype)
+    assert result['address'].dtype == object
+    #None and NaN would collapse into one missing marker
+    assert result['residential_type'].dtype == object
+    assert result['list_year'].dtype == 'int16'
+    assert result['sale_amount'].dtype == 'int32'
+    assert result['sales_ratio'].dtype == 'float64'
+
+    result = apply_dtype_plan(df.copy(), plan_from_model())
+    assert isinstance(result['residential_type'].dtype, pd.CategoricalDtype)
+
+def test_downcast_sums_do_not_overflow() -> None:
+    df = DataAggregator._prepare_frame(pd.DataFrame({
+        'date_recorded': pd.to_datetime(['2022-03-01'] * 3),
+        'year': [2022] * 3,
+        'month': [3] * 3,
+        'town': ['Newark'] * 3,
+        'address': ['1 Main St', '2 Main St', '3 Main St'],
+        'property_type': ['Condo'] * 3,
+        'sale_amount': [2_000_000_000] * 3,
+    }), {'year', 'town', 'address', 'property_type', 'sale_amount'})
+
+    assert df['sale_amount'].dtype == 'int32'
+    assert df['year'].dtype == 'int16'
+    assert 'date_recorded' not in df.columns and 'month' not in df.columns
+    state = DataAggregator._partial_state(GOLD_SPECS[0], df)
+    assert state['_state.sale_amount.sum'].tolist() == [6_000_000_000]
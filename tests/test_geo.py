@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from src.clean import DataCleaner
+from src.geo import cell_columns, decode_cell, geohash, parse_points, to_geojson
+
+def test_parse_points_counts_missing_and_invalid() -> None:
+    values = pd.Series([
+        'POINT (-72.6411 41.7658)', None, 'point(-73 41.5)', 'POINT (-72.6 )', 'POINT (200 41)', 5, np.nan,
+    ])
+    lon, lat, valid, missing = parse_points(values)
+
+    assert valid.tolist() == [True, False, True, False, False, False, False]
+    assert missing.tolist() == [False, True, False, False, False, False, True]
+    assert to_geojson(lon, lat, valid)[:3] == [
+        {'type': 'Point', 'coordinates': [-72.6411, 41.7658]}, None, {'type': 'Point', 'coordinates': [-73.0, 41.5]},
+    ]
+
+def test_geohash_matches_reference_encoding() -> None:
+    hashes = geohash(np.array([10.40744, -72.6411, np.nan]), np.array([57.64911, 41.7658, 41.0]), 11)
+
+    assert hashes[0] == 'u4pruydqqvj'
+    assert hashes[2] is None
+    west, south, east, north = decode_cell(hashes[1][:6])
+    assert west <= -72.6411 <= east and south <= 41.7658 <= north
+
+def test_cells_are_prefixes() -> None:
+    df = cell_columns(pd.DataFrame({'geohash': ['drk51r', None]}), (6, 4))
+    assert df['geohash_4'].tolist()[0] == 'drk5'
+    assert df['geohash_6'].isna().tolist() == [False, True]
+
+def test_clean_keeps_rows_with_bad_locations() -> None:
+    cleaner = DataCleaner.__new__(DataCleaner)
+    cleaner.location_stats = {}
+    df = pd.DataFrame({'location': ['POINT (-72.6411 41.7658)', 'POINT (x y)', None]})
+    df = cleaner._parse_locations(df)
+
+    assert len(df) == 3
+    assert df['location'].tolist()[1:] == [None, None]
+    assert df['geohash'].tolist()[0] == 'drkme5' and df['geohash'].tolist()[1] is None
+    assert cleaner.location_stats == {'points': 1, 'missing': 1, 'invalid': 1}
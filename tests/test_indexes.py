@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import Mock, patch
+from src.indexes import IndexManager, coverage_report
+
+def make_manager(MockClient, index_information: dict) -> tuple[IndexManager, Mock]:
+    mock_collection = Mock()
+    mock_collection.index_information.return_value = index_information
+
+    mock_db = Mock()
+    mock_db.__getitem__ = Mock(return_value=mock_collection)
+    mock_client_instance = Mock()
+    mock_client_instance.__getitem__ = Mock(return_value=mock_db)
+    MockClient.return_value = mock_client_instance
+
+    return IndexManager("mongodb://localhost:27017", "test_db"), mock_collection
+
+def test_deferred_drops_secondary_then_builds() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        manager, mock_collection = make_manager(MockClient, {
+            '_id_': {'key': [('_id', 1)]},
+            'town_1': {'key': [('town', 1)]},
+            'address_1_date_recorded_1': {'key': [('address', 1), ('date_recorded', 1)], 'unique': True},
+        })
+
+        with manager.deferred('real_estate_clean'):
+            #the unique index keeps guarding the load
+            mock_collection.drop_index.assert_called_once_with('town_1')
+            mock_collection.create_indexes.assert_not_called()
+
+        models = mock_collection.create_indexes.call_args[0][0]
+        assert sorted(model.document['name'] for model in models) == [
+            'address_1_date_recorded_1', 'date_recorded_1', 'location_2dsphere', 'property_type_1', 'town_1',
+            'year_1_month_1',
+        ]
+        assert 'real_estate_clean' in manager.build_seconds
+
+def test_deferred_rebuilds_after_a_failed_load() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        manager, mock_collection = make_manager(MockClient, {
+            '_id_': {'key': [('_id', 1)]},
+            'town_1': {'key': [('town', 1)]},
+        })
+
+        with pytest.raises(RuntimeError, match='load failed'):
+            with manager.deferred('real_estate_clean'):
+                raise RuntimeError('load failed')
+
+        mock_collection.create_indexes.assert_called_once()
+        assert 'real_estate_clean' in manager.build_seconds
+
+def test_deferred_keeps_the_load_error_when_the_rebuild_fails() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        manager, mock_collection = make_manager(MockClient, {'_id_': {'key': [('_id', 1)]}})
+        mock_collection.create_indexes.side_effect = ConnectionError('server gone')
+
+        with pytest.raises(RuntimeError, match='load failed'):
+            with manager.deferred('real_estate_clean'):
+                raise RuntimeError('load failed')
+        mock_collection.create_indexes.assert_called_once()
+
+        #without a load error the rebuild failure itself is raised
+        with pytest.raises(ConnectionError):
+            with manager.deferred('real_estate_clean'):
+                pass
+
+def test_deferred_keeps_the_index_the_incremental_load_reads() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        manager, mock_collection = make_manager(MockClient, {
+            '_id_': {'key': [('_id', 1)]},
+            'row_fingerprint': {'key': [('_row_key', 1), ('_fingerprint', 1)]},
+            'List Year_1': {'key': [('List Year', 1)]},
+        })
+
+        with manager.deferred('real_estate_raw'):
+            mock_collection.drop_index.assert_called_once_with('List Year_1')
+
+def test_verify_reports_differences() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        manager, _ = make_manager(MockClient, {
+            '_id_': {'key': [('_id', 1)]},
+            'year_1': {'key': [('year', 1)]},
+            'total_sales_1': {'key': [('total_sales', 1)]},
+        })
+
+        assert manager.verify('real_estate_gold_yearly') == ['unexpected total_sales_1']
+        assert manager.verify('real_estate_gold_town') == [
+            'missing town_1', 'unexpected year_1', 'unexpected total_sales_1',
+        ]
+
+def test_coverage_report() -> None:
+    report = {(entry['collection'], tuple(entry['filter']), tuple(entry['sort'])): entry['index']
+              for entry in coverage_report()}
+
+    assert report[('real_estate_clean', ('address', 'date_recorded'), ())] == 'address_1_date_recorded_1'
+    assert report[('real_estate_raw', ('_row_key',), ())] == 'row_fingerprint'
+    assert report[('real_estate_gold_town', (), ('total_sales',))] is None
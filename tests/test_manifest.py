@@ -0,0 +1,66 @@
+import os
+from unittest.mock import Mock, patch
+from src.manifest import PipelineManifest, file_fingerprint, first_incomplete
+
+def make_manifest(stage_state: dict, versions: dict) -> PipelineManifest:
+    with patch('src.connection.MongoClient') as MockClient:
+        stages, meta, runs = Mock(), Mock(), Mock()
+        stages.find_one.side_effect = lambda query: stage_state.get(query['_id'])
+        meta.find_one.side_effect = lambda query: (
+            {'version': versions[query['_id']]} if query['_id'] in versions else None
+        )
+        collections = {'pipeline_stages': stages, 'real_estate_meta': meta, 'pipeline_runs': runs}
+        mock_db = Mock()
+        mock_db.__getitem__ = Mock(side_effect=lambda name: collections[name])
+        MockClient.return_value.__getitem__ = Mock(return_value=mock_db)
+        return PipelineManifest("mongodb://localhost:27017", "test_db")
+
+def test_file_fingerprint_reuses_hash_of_untouched_file(tmp_path) -> None:
+    path = tmp_path / 'raw.csv'
+    path.write_text('a,b\n1,2\n')
+    fingerprint = file_fingerprint(str(path))
+    assert len(fingerprint['sha256']) == 64
+
+    #same size and mtime: the known hash is trusted without reading the file
+    assert file_fingerprint(str(path), {**fingerprint, 'sha256': 'cached'})['sha256'] == 'cached'
+
+    os.utime(path, ns=(fingerprint['mtime_ns'] + 10**9,) * 2)
+    assert file_fingerprint(str(path), {**fingerprint, 'sha256': 'cached'})['sha256'] == fingerprint['sha256']
+
+def test_stage_is_current_only_for_same_inputs_and_output() -> None:
+    inputs = {'upstream_version': 'raw-1'}
+    completed = {'status': 'completed', 'inputs': inputs, 'output_version': 'clean-1'}
+
+    assert make_manifest({'clean': completed}, {'real_estate_clean': 'clean-1'}).is_current('clean', inputs)
+    assert not make_manifest({'clean': completed}, {'real_estate_clean': 'clean-1'}).is_current(
+        'clean', {'upstream_version': 'raw-2'}
+    )
+    #the clean collection was rewritten by something else since
+    assert not make_manifest({'clean': completed}, {'real_estate_clean': 'clean-2'}).is_current('clean', inputs)
+    #a stage that started but never completed
+    running = {**completed, 'status': 'running'}
+    assert not make_manifest({'clean': running}, {'real_estate_clean': 'clean-1'}).is_current('clean', inputs)
+
+def test_touched_csv_with_same_bytes_is_current(tmp_path) -> None:
+    path = tmp_path / 'raw.csv'
+    path.write_text('a,b\n1,2\n')
+    fingerprint = file_fingerprint(str(path))
+    state = {'status': 'completed', 'output_version': 'raw-1', 'inputs': {'csv': {'path': str(path), **fingerprint}}}
+    manifest = make_manifest({'raw': state}, {'real_estate_raw': 'raw-1'})
+
+    os.utime(path, ns=(fingerprint['mtime_ns'] + 10**9,) * 2)
+    assert manifest.is_current('raw', manifest.stage_inputs('raw', str(path)))
+    path.write_text('a,b\n1,3\n')
+    assert not manifest.is_current('raw', manifest.stage_inputs('raw', str(path)))
+
+def test_begin_stage_invalidates_and_first_incomplete() -> None:
+    manifest = make_manifest({}, {})
+    manifest.run_id = 'run1'
+    manifest.begin_stage('gold', {'upstream_version': 'clean-1'})
+
+    manifest.stage_state.update_one.assert_called_once_with(
+        {'_id': 'gold'}, {'$set': {'status': 'running', 'run_id': 'run1'}}, upsert=True
+    )
+    run = {'stages': {'raw': {'status': 'skipped'}, 'clean': {'status': 'completed'}, 'gold': {'status': 'failed'}}}
+    assert first_incomplete(run) == 'gold'
+    assert first_incomplete({'stages': {'raw': {'status': 'completed'}}}) is None
@@ -0,0 +1,114 @@
+import json
+import threading
+import tracemalloc
+from unittest.mock import Mock, patch
+import pandas as pd
+from src.clean import DataCleaner
+from src.metrics import RunMetrics, instrumented, track
+
+RAW_ROWS = [
+    {'serial_number': 1, 'list_year': 2023, 'date_recorded': '5/15/2023', 'town': 'Glassboro',
+     'address': '123 Main St', 'assessed_value': '200000', 'sale_amount': '250000', 'sales_ratio': 0.8,
+     'property_type': 'Residential'},
+    {'serial_number': 2, 'list_year': 2023, 'date_recorded': 'n/a', 'town': 'Glassboro',
+     'address': '5 Elm St', 'assessed_value': '100000', 'sale_amount': '150000', 'sales_ratio': 0.6,
+     'property_type': 'Condo'},
+]
+
+class Step:
+    METRICS_STAGE = 'demo'
+
+    def __init__(self, metrics=None) -> None:
+        self.metrics = metrics
+
+    @instrumented()
+    def _drop_first(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.iloc[1:]
+
+def test_instrumented_records_rows_and_times() -> None:
+    metrics = RunMetrics(run_id='run1')
+    step = Step(metrics)
+    df = pd.DataFrame({'a': range(10)})
+
+    step._drop_first(df)
+    step._drop_first(df)
+
+    stats = metrics.steps[('demo', 'drop_first')]
+    assert (stats.calls, stats.rows_in, stats.rows_out) == (2, 20, 18)
+    assert stats.wall_seconds >= 0 and stats.cpu_seconds >= 0
+
+def test_untracked_owner_is_a_no_op() -> None:
+    #instances built with __new__ (as the tests do) have no metrics attribute
+    step = Step.__new__(Step)
+    assert len(step._drop_first(pd.DataFrame({'a': [1, 2]}))) == 1
+    with track(step, 'anything', rows_in=3) as timing:
+        timing.rows_out = 1
+
+def test_reports(tmp_path) -> None:
+    metrics = RunMetrics(run_id='run1')
+    metrics.record('clean', 'convert_dates', 1.5, 1.25, rows_in=100, rows_out=100)
+
+    report = json.loads(metrics.write_json(tmp_path).read_text())
+    assert report['run_id'] == 'run1'
+    assert report['steps'] == [{
+        'stage': 'clean', 'step': 'convert_dates', 'calls': 1, 'wall_seconds': 1.5, 'cpu_seconds': 1.25,
+        'rows_in': 100, 'rows_out': 100, 'peak_rss_growth_mb': 0.0,
+    }]
+
+    prometheus = metrics.write_prometheus(tmp_path).read_text()
+    assert '# TYPE pipeline_step_wall_seconds counter' in prometheus
+    assert 'pipeline_step_wall_seconds{run_id="run1",stage="clean",step="convert_dates"} 1.5' in prometheus
+    assert 'convert_dates' in metrics.summary_table()
+
+def test_cleaner_steps_and_profile(tmp_path) -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        raw, clean = Mock(), Mock()
+        raw.find.return_value = RAW_ROWS
+        mock_db = Mock()
+        mock_db.__getitem__ = Mock(side_effect=lambda name: raw if name == 'real_estate_raw' else clean)
+        MockClient.return_value.__getitem__ = Mock(return_value=mock_db)
+
+        metrics = RunMetrics(profile='clean.convert_dates')
+        DataCleaner("mongodb://localhost:27017", "test_db", metrics=metrics).clean()
+
+        steps = {step: stats for (stage, step), stats in metrics.steps.items() if stage == 'clean'}
+        assert {'read_raw', 'convert_dates', 'handle_missing_values', 'validate', 'insert_clean'} <= set(steps)
+        assert steps['read_raw'].rows_out == 2
+        assert (steps['handle_missing_values'].rows_in, steps['handle_missing_values'].rows_out) == (2, 1)
+
+        paths = metrics.write_profile(tmp_path)
+        assert [path.suffix for path in paths] == ['.prof', '.txt']
+        assert paths[1].read_text().startswith('traced peak:')
+
+def test_overlapping_profiled_calls_share_tracemalloc() -> None:
+    metrics = RunMetrics(profile='clean.validate')
+    entered, release = threading.Barrier(2), threading.Event()
+
+    def step(first: bool) -> None:
+        with metrics.track('clean', 'validate'):
+            entered.wait()
+            if not first:
+                release.wait()
+
+    workers = [threading.Thread(target=step, args=(first,)) for first in (True, False)]
+    for worker in workers:
+        worker.start()
+    workers[0].join()
+    #the second call is still running, so tracing must survive the first one's exit
+    assert tracemalloc.is_tracing()
+    release.set()
+    workers[1].join()
+
+    assert not tracemalloc.is_tracing()
+    assert metrics.steps[('clean', 'validate')].calls == 2
+    assert metrics._allocations is not None
+
+def test_profiling_leaves_outside_tracing_running() -> None:
+    metrics = RunMetrics(profile='clean.validate')
+    tracemalloc.start()
+    try:
+        with metrics.track('clean', 'validate'):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
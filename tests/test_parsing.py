@@ -0,0 +1,71 @@
+import gzip
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from src.parsing import RAW_COLUMNS, detect_compression, get_engine, raw_dtypes
+from src.synthetic import write_csv
+
+def test_raw_dtypes_follow_schema() -> None:
+    dtypes = raw_dtypes()
+
+    assert list(dtypes) == RAW_COLUMNS
+    assert dtypes['Serial Number'] == 'Int64' and dtypes['Sales Ratio'] == 'float64'
+    #declared as text, so missing tokens never leave a column of mixed types
+    assert dtypes['Sale Amount'] == 'object' and dtypes['OPM remarks'] == 'object'
+
+def test_compressed_input_is_detected_by_content(tmp_path) -> None:
+    plain = write_csv(str(tmp_path / 'plain.csv'), 50, seed=2)
+    packed = tmp_path / 'packed.csv'
+    packed.write_bytes(gzip.compress(plain.read_bytes()))
+
+    assert detect_compression(plain) is None
+    assert detect_compression(packed) == 'gzip'
+    assert detect_compression(tmp_path / 'missing.csv') is None
+    engine = get_engine('c')
+    df = engine.read(packed)
+    pd.testing.assert_frame_equal(df, engine.read(plain))
+    assert df['Serial Number'].dtype == 'Int64'
+
+def test_engines_read_the_same_frames(tmp_path) -> None:
+    pytest.importorskip('pyarrow')
+    import pyarrow as pa
+    path = write_csv(str(tmp_path / 'raw.csv'), 500, seed=4)
+    zstd_path = tmp_path / 'raw.csv.zst'
+    with pa.output_stream(str(zstd_path), compression='zstd') as stream:
+        stream.write(path.read_bytes())
+
+    c_engine, arrow_engine = get_engine('c'), get_engine('pyarrow')
+    #a tiny block size so chunks are stitched from several record batches
+    arrow_engine.block_size = 4096
+    expected = c_engine.read(path)
+    pd.testing.assert_frame_equal(arrow_engine.read(path), expected)
+    pd.testing.assert_frame_equal(arrow_engine.read(zstd_path), expected)
+
+    with c_engine.iter_chunks(path, 120) as reader:
+        c_chunks = list(reader)
+    with arrow_engine.iter_chunks(zstd_path, 120) as reader:
+        arrow_chunks = list(reader)
+    assert [len(chunk) for chunk in arrow_chunks] == [120, 120, 120, 120, 20]
+    for actual, reference in zip(arrow_chunks, c_chunks):
+        pd.testing.assert_frame_equal(actual, reference)
+
+def test_get_engine() -> None:
+    assert get_engine('c').name == 'c'
+    with pytest.raises(ValueError):
+        get_engine('python')
+
+def test_c_engine_reads_zstd_without_zstandard(tmp_path) -> None:
+    pytest.importorskip('pyarrow')
+    import pyarrow as pa
+    path = write_csv(str(tmp_path / 'raw.csv'), 300, seed=5)
+    zstd_path = tmp_path / 'raw.csv.zst'
+    with pa.output_stream(str(zstd_path), compression='zstd') as stream:
+        stream.write(path.read_bytes())
+    engine = get_engine('c')
+
+    with patch('src.parsing.zstandard', None):
+        pd.testing.assert_frame_equal(engine.read(zstd_path), engine.read(path))
+        with engine.iter_chunks(zstd_path, 100) as reader:
+            assert [len(chunk) for chunk in reader] == [100, 100, 100]
+        with patch('src.parsing.pa', None), pytest.raises(ImportError, match='zstd'):
+            engine.read(zstd_path)
@@ -0,0 +1,73 @@
+import json
+import pytest
+import numpy as np
+import pandas as pd
+from src.profiler import StreamingProfiler, profile_csv, write_report
+
+RAW = pd.DataFrame({
+    'Address': ['1 Main St', ' 2 Main St', 'na', '1 Main St', None, '-'],
+    'Date Recorded': ['01/02/2020', '01/03/2020', '01/04/2020', '01/02/2020', '01/05/2020', '01/06/2020'],
+    'Sale Amount': [100000.0, 250000.0, np.nan, 100000.0, 5_000_000.0, -5.0],
+    'Town': ['Newark'] * 6,
+})
+
+def test_chunks_add_up_to_one_pass() -> None:
+    whole = StreamingProfiler().update(RAW.copy()).report()
+    chunked = StreamingProfiler().update(RAW.iloc[:4].copy()).update(RAW.iloc[4:].copy()).report()
+
+    assert whole['columns'] == chunked['columns']
+    assert whole['duplicates'] == chunked['duplicates']
+    assert whole['histograms'] == chunked['histograms']
+    assert chunked['rows'] == 6 and chunked['chunks'] == 2
+
+def test_column_stats_and_duplicates() -> None:
+    report = StreamingProfiler(histograms={'sale_amount': (0.0, 1_000_000.0, 4)}).update(RAW.copy()).report()
+    address = report['columns']['address']
+    assert (address['nulls'], address['missing_tokens'], address['needs_trim']) == (1, {'-': 1, 'na': 1}, 1)
+    assert 'mean' not in address
+
+    amount = report['columns']['sale_amount']
+    assert (amount['nulls'], amount['min'], amount['max']) == (1, -5.0, 5_000_000.0)
+    assert amount['mean'] == (100000 + 250000 + 100000 + 5_000_000 - 5) / 5
+
+    histogram = report['histograms']['sale_amount']
+    assert histogram['counts'] == [2, 1, 0, 0]
+    assert (histogram['below'], histogram['above']) == (1, 1)
+
+    #rows missing the address are not keyed; the repeated sale is
+    assert report['duplicates']['address_date'] == {
+        'key': ['address', 'date_recorded'], 'rows': 5, 'distinct': 4, 'duplicates': 1,
+    }
+    assert report['duplicates']['row']['duplicates'] == 1
+
+@pytest.mark.parametrize('engine', ['c', 'pyarrow'])
+def test_csv_report_files(tmp_path, engine: str) -> None:
+    path = tmp_path / 'raw.csv'
+    raw = RAW.astype({'Sale Amount': object})
+    #a placeholder in a declared float column is counted, not a parse error
+    raw.loc[2, 'Sale Amount'] = 'n/a'
+    raw.to_csv(path, index=False)
+    report = profile_csv(str(path), chunksize=4, engine=engine)
+    json_path, html_path = write_report(report, str(tmp_path / 'profile'), 'raw')
+
+    assert json.loads(json_path.read_text())['rows'] == 6
+    #placeholders survive the csv reader
+    assert report['columns']['address']['missing_tokens'] == {'-': 1, 'na': 1}
+    assert report['chunks'] == 2
+    amount = report['columns']['sale_amount']
+    assert amount['missing_tokens'] == {'n/a': 1}
+    assert (amount['min'], amount['max']) == (-5.0, 5_000_000.0)
+    assert '<svg' in html_path.read_text()
+
+def test_duplicates_stay_exact_across_many_chunks() -> None:
+    #two near-identical large counts, where a sketch's error would swamp the difference
+    frame = pd.DataFrame({'address': [f'{i} Main St' for i in range(3000)], 'date_recorded': ['01/02/2020'] * 3000})
+    frame = pd.concat([frame, frame.iloc[:7]], ignore_index=True)
+    profiler = StreamingProfiler()
+    for start in range(0, len(frame), 500):
+        profiler.update(frame.iloc[start:start + 500].copy())
+
+    entry = profiler.report()['duplicates']['address_date']
+    assert (entry['rows'], entry['distinct'], entry['duplicates']) == (3007, 3000, 7)
+    #the hash array grew past its initial capacity without losing rows
+    assert profiler.keys['address_date'].size == 3007
@@ -8,6 +8,8 @@ def test_realEstate_sale() -> None:
         serial_number=123,
         list_year=2023,
         date_recorded="2023-05-15",
+        year=2023,
+        month=5,
         town="Glassboro",
         address="123 Apple St",
         assessed_value=200000,
@@ -24,6 +26,8 @@ def test_invalid_sale_amount() -> None:
             serial_number=123,
             list_year=2023,
             date_recorded="2023-05-15",
+            year=2023,
+            month=5,
             town="Glassboro",
             address="123 Main St",
             assessed_value=200000,
@@ -38,6 +42,8 @@ def test_invalid_assessed_value() -> None:
             serial_number=123,
             list_year=2023,
             date_recorded="2023-05-15",
+            year=2023,
+            month=5,
             town="Glassboro",
             address="123 Main St",
             assessed_value=-50000,  # Invalid
@@ -0,0 +1,124 @@
+import json
+import threading
+import urllib.request
+import pytest
+from unittest.mock import Mock, patch
+from src.serving import GoldQueryService, TTLCache, TownStats, YearStats, serve
+
+YEARLY = [
+    {'year': 2022, 'avg_sale_amount': 175000.0, 'total_sales': 350000, 'sale_count': 2, 'p50_sale_amount': 175000.0},
+    {'year': 2023, 'avg_sale_amount': 300001.0, 'total_sales': 300001, 'sale_count': 1, 'p50_sale_amount': 300001.0},
+]
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_service(MockClient, clock: Clock, **kwargs) -> tuple[GoldQueryService, dict, dict]:
+    collections = {}
+    meta = {'version': 'v1'}
+
+    def get_collection(name: str) -> Mock:
+        if name not in collections:
+            collection = Mock()
+            if name == 'real_estate_meta':
+                collection.find_one.side_effect = lambda query: {'version': meta['version']}
+            else:
+                collection.find.return_value.sort.return_value = YEARLY
+            collections[name] = collection
+        return collections[name]
+
+    mock_db = Mock()
+    mock_db.__getitem__ = Mock(side_effect=get_collection)
+    mock_client_instance = Mock()
+    mock_client_instance.__getitem__ = Mock(return_value=mock_db)
+    MockClient.return_value = mock_client_instance
+
+    return GoldQueryService("mongodb://localhost:27017", "test_db", clock=clock, **kwargs), collections, meta
+
+def test_cache_is_keyed_by_gold_version() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        clock = Clock()
+        #the default re-reads the version on every lookup
+        service, collections, meta = make_service(MockClient, clock)
+
+        first = service.year_stats()
+        assert first == [YearStats(**YEARLY[0]), YearStats(**YEARLY[1])]
+        assert service.year_stats() is first
+        yearly = collections['real_estate_gold_yearly']
+        assert yearly.find.call_count == 1
+        assert yearly.find.call_args[0][1] == {'_id': 0, '_state': 0}
+
+        #a rebuild bumps the version, so the next lookup goes back to MongoDB
+        meta['version'] = 'v2'
+        service.year_stats()
+        assert yearly.find.call_count == 2
+
+        stats = service.stats()
+        assert (stats['hits'], stats['misses'], stats['hit_ratio']) == (1, 2, 0.3333)
+        assert stats['gold_version'] == 'v2'
+        assert stats['p50_ms'] is not None
+
+def test_version_is_rechecked_after_interval() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        clock = Clock()
+        service, collections, meta = make_service(MockClient, clock, version_check_seconds=5)
+
+        service.year_stats()
+        meta['version'] = 'v2'
+        service.year_stats()
+        assert service.stats()['hits'] == 1
+
+        clock.now = 5
+        service.year_stats()
+        assert service.stats()['misses'] == 2
+
+def test_top_towns_validates_ranking() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        service, collections, _ = make_service(MockClient, Clock())
+        collections_town = service.db['real_estate_gold_town']
+        collections_town.find.return_value.sort.return_value = Mock(**{'limit.return_value': [
+            {'town': 'Newark', 'avg_sale_amount': 275000.5, 'total_sales': 550001, 'sale_count': 2},
+        ]})
+
+        assert service.top_towns(1) == [TownStats('Newark', 275000.5, 550001, 2)]
+        collections_town.find.return_value.sort.assert_called_once_with('total_sales', -1)
+        with pytest.raises(ValueError):
+            service.top_towns(5, by='town')
+
+def test_ttl_cache_expires_and_evicts() -> None:
+    clock = Clock()
+    cache = TTLCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == (True, 1)
+
+    #'b' is now the least recently used
+    cache.put('c', 3)
+    assert cache.get('b') == (False, None)
+
+    clock.now = 11
+    assert cache.get('a') == (False, None)
+    assert len(cache) == 1
+
+def test_http_endpoint_serves_json() -> None:
+    with patch('src.connection.MongoClient') as MockClient:
+        service, _, _ = make_service(MockClient, Clock())
+        server = serve(service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with urllib.request.urlopen(f"{base}/years") as response:
+                assert json.loads(response.read())[0]['year'] == 2022
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(f"{base}/towns/top?by=town")
+            assert error.value.code == 400
+            with urllib.request.urlopen(f"{base}/stats") as response:
+                assert json.loads(response.read())['misses'] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.sketches import (
+    HyperLogLog,
+    TDigest,
+    hash_values,
+    hlls_by_group,
+    merge_all_serialized,
+    merge_serialized,
+    tdigests_by_group,
+)
+
+SALES = np.random.default_rng(7).lognormal(mean=12.5, sigma=1.1, size=50_000)
+
+def rank_error(digest: TDigest, q: float) -> float:
+    estimate = digest.quantile(q)
+    return abs(np.searchsorted(np.sort(SALES), estimate) / len(SALES) - q)
+
+@pytest.mark.parametrize('q', [0.5, 0.9, 0.99])
+def test_tdigest_quantiles_within_rank_error(q: float) -> None:
+    one_pass = TDigest.of(SALES)
+    #merging per-chunk digests must stay as accurate as one pass
+    merged = TDigest()
+    for chunk in np.array_split(SALES, 25):
+        merged.merge(TDigest.from_bytes(TDigest.of(chunk).to_bytes()))
+
+    assert rank_error(one_pass, q) < 0.005
+    assert rank_error(merged, q) < 0.005
+    assert abs(merged.quantile(q) / np.quantile(SALES, q) - 1) < 0.02
+    assert merged.count == len(SALES)
+
+def test_tdigest_is_compact_and_exact_at_the_edges() -> None:
+    digest = TDigest.of(SALES)
+
+    assert len(digest.means) <= digest.compression
+    assert digest.quantile(0) == SALES.min()
+    assert digest.quantile(1) == SALES.max()
+    assert np.isnan(TDigest().quantile(0.5))
+
+@pytest.mark.parametrize('distinct', [10, 1_000, 40_000])
+def test_hyperloglog_within_error_bound(distinct: int) -> None:
+    addresses = pd.Series([f"{i} Main St" for i in range(distinct)] * 3)
+    sketch = HyperLogLog.of(hash_values(addresses))
+
+    #three standard errors at precision 12
+    assert abs(sketch.estimate() / distinct - 1) < 3 * 1.04 / np.sqrt(4096)
+
+def test_hyperloglog_merge_is_union() -> None:
+    left = pd.Series([f"{i} Main St" for i in range(0, 6_000)])
+    right = pd.Series([f"{i} Main St" for i in range(3_000, 9_000)])
+
+    merged = merge_serialized(
+        'hll', HyperLogLog.of(hash_values(left)).to_bytes(), HyperLogLog.of(hash_values(right)).to_bytes()
+    )
+
+    assert abs(HyperLogLog.from_bytes(merged).estimate() / 9_000 - 1) < 0.05
+    assert hash_values(pd.Series(['a', None, 'b'])).shape == (2,)
+
+
+def test_small_hyperloglogs_serialize_sparse() -> None:
+    small = HyperLogLog.of(hash_values(pd.Series(['1 Main St', '2 Main St'])))
+    large = HyperLogLog.of(hash_values(pd.Series([f"{i} Main St" for i in range(40_000)])))
+
+    assert len(small.to_bytes()) < 16
+    assert len(large.to_bytes()) == 5 + 4096
+    for sketch in (small, large):
+        assert np.array_equal(HyperLogLog.from_bytes(sketch.to_bytes()).registers, sketch.registers)
+
+def test_group_sketches_match_one_sketch_per_group() -> None:
+    rng = np.random.default_rng(3)
+    codes = rng.integers(-1, 50, 20_000)
+    values = SALES[:20_000].copy()
+    values[::11] = np.nan
+    hashes = hash_values(pd.Series([f"{i % 700} Main St" for i in range(20_000)]))
+
+    digests = tdigests_by_group(codes, values, 52)
+    sketches = hlls_by_group(codes, hashes, 52)
+
+    #group 51 has no rows
+    for group in (0, 17, 51):
+        assert digests[group] == TDigest.of(values[codes == group]).to_bytes()
+        assert sketches[group] == HyperLogLog.of(hashes[codes == group]).to_bytes()
+
+    #merging every group's sketch equals sketching every row once
+    everything = merge_all_serialized('hll', sketches)
+    assert everything == HyperLogLog.of(hashes[codes >= 0]).to_bytes()
+    merged = TDigest.from_bytes(merge_all_serialized('tdigest', digests))
+    assert merged.count == np.count_nonzero((codes >= 0) & ~np.isnan(values))
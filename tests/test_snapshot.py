@@ -0,0 +1,69 @@
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+from src.snapshot import SilverSnapshot, read_silver
+
+pytest.importorskip("pyarrow")
+
+CLEAN_DOCS = [
+    {'serial_number': 1, 'list_year': 2021, 'date_recorded': datetime(2022, 3, 1),
+     'year': 2022, 'month': 3, 'town': 'Glassboro',
+     'address': '1 Main St', 'assessed_value': 50000, 'sale_amount': 100000, 'sales_ratio': 0.5,
+     'property_type': 'Residential', 'residential_type': 'Single Family'},
+    {'serial_number': 2, 'list_year': 2021, 'date_recorded': datetime(2022, 7, 15),
+     'year': 2022, 'month': 7, 'town': 'Newark',
+     'address': '2 Main St', 'assessed_value': 90000, 'sale_amount': 250000, 'sales_ratio': 0.36,
+     'property_type': 'Condo', 'residential_type': None},
+    {'serial_number': 3, 'list_year': 2022, 'date_recorded': datetime(2023, 1, 10),
+     'year': 2023, 'month': 1, 'town': 'Newark',
+     'address': '3 Main St', 'assessed_value': 120000, 'sale_amount': 300001, 'sales_ratio': 0.4,
+     'property_type': 'Residential', 'residential_type': 'Two Family'},
+]
+
+def make_collection() -> Mock:
+    collection = Mock()
+    collection.find.side_effect = lambda query, projection, batch_size: iter(CLEAN_DOCS)
+    return collection
+
+def test_publish_and_read_with_partition_pruning(tmp_path) -> None:
+    snapshot = SilverSnapshot(str(tmp_path / "silver"), partition_by_town=True)
+    summary = snapshot.publish(make_collection(), "v1", batch_size=2)
+
+    assert summary['published'] is True
+    assert summary['rows'] == 3
+    assert snapshot.is_fresh("v1")
+    assert not snapshot.is_fresh("v2")
+    assert (tmp_path / "silver" / "year=2022" / "town=Newark").is_dir()
+
+    df = snapshot.read(columns=['address', 'sale_amount'], filters={'year': 2022})
+    assert list(df.columns) == ['address', 'sale_amount']
+    assert sorted(df['address']) == ['1 Main St', '2 Main St']
+
+    df = snapshot.read(filters={'year': [2022, 2023], 'town': 'Newark'})
+    assert sorted(df['serial_number']) == [2, 3]
+    assert df.loc[df['serial_number'] == 2, 'residential_type'].isna().all()
+
+def test_publish_reuses_fresh_snapshot(tmp_path) -> None:
+    snapshot = SilverSnapshot(str(tmp_path / "silver"))
+    collection = make_collection()
+    snapshot.publish(collection, "v1")
+    summary = snapshot.publish(collection, "v1")
+
+    assert summary['reused'] is True
+    assert collection.find.call_count == 1
+
+    summary = snapshot.publish(collection, "v2")
+    assert summary['published'] is True
+    assert collection.find.call_count == 2
+    assert not list(tmp_path.glob("silver.*"))
+
+def test_read_silver_uses_published_partitioning(tmp_path) -> None:
+    root = str(tmp_path / "silver")
+    SilverSnapshot(root, partition_by_town=True).publish(make_collection(), "v1")
+    db = {'real_estate_meta': Mock(), 'real_estate_clean': Mock()}
+    db['real_estate_meta'].find_one.return_value = {'version': 'v1'}
+
+    df = read_silver(db, columns=['serial_number'], filters={'town': 'Newark'}, root=root)
+
+    assert sorted(df['serial_number']) == [2, 3]
+    db['real_estate_clean'].find.assert_not_called()
@@ -0,0 +1,56 @@
+import pandas as pd
+from src.clean import DataCleaner
+from src.dtypes import plan_from_model
+from src.schemas import RealEstateDataClean
+from src.synthetic import RAW_COLUMNS, DirtyRates, generate_frame, write_csv
+from src.validation import ColumnarValidator
+
+def make_cleaner() -> DataCleaner:
+    cleaner = DataCleaner.__new__(DataCleaner)
+    cleaner.validation = 'columnar'
+    cleaner.validator = ColumnarValidator(RealEstateDataClean)
+    cleaner.dtype_plan = plan_from_model(RealEstateDataClean)
+    cleaner.memory_report = {}
+    cleaner.location_stats = {}
+    return cleaner
+
+def test_generator_is_seeded() -> None:
+    assert generate_frame(2_000, seed=5).equals(generate_frame(2_000, seed=5))
+    assert not generate_frame(2_000, seed=5).equals(generate_frame(2_000, seed=6))
+
+def test_columns_and_skew_match_raw_layer() -> None:
+    df = generate_frame(20_000, seed=1)
+
+    assert list(df.columns) == RAW_COLUMNS
+    assert RAW_COLUMNS[2] == 'Date Recorded' and RAW_COLUMNS[12] == 'OPM remarks'
+    towns = df['Town'].str.strip().value_counts()
+    assert towns.iloc[0] > 10 * towns.iloc[-1]
+    assert df['Property Type'].value_counts().index[0] == 'Residential'
+
+def test_dirty_values_are_injected() -> None:
+    df = generate_frame(20_000, seed=1, dirty=DirtyRates(missing=0.05, bad_date=0.05, negative_amount=0.05))
+
+    amounts = pd.to_numeric(df['Sale Amount'], errors='coerce')
+    assert df['Sale Amount'].isin(['n/a', '-', '', 'null', 'na']).mean() > 0.03
+    assert (amounts < 0).mean() > 0.03
+    dates = pd.to_datetime(df['Date Recorded'], format='%m/%d/%Y', errors='coerce')
+    assert dates.isna().mean() > 0.03
+    assert df.duplicated(['Address', 'Date Recorded']).sum() > 0
+    assert (df['Town'].str.len() != df['Town'].str.strip().str.len()).any()
+
+    tidy = generate_frame(5_000, seed=1, dirty=DirtyRates(0, 0, 0, 0, 0))
+    assert (tidy['Sale Amount'] > 0).all()
+    assert pd.to_datetime(tidy['Date Recorded'], format='%m/%d/%Y').notna().all()
+
+def test_cleaner_handles_a_written_csv(tmp_path) -> None:
+    path = write_csv(tmp_path / 'raw.csv', rows=3_000, seed=2, chunk_rows=1_000, complete_text=True)
+    raw = pd.read_csv(path)
+    assert len(raw) == 3_000
+    assert raw['Serial Number'].is_unique
+
+    cleaner = make_cleaner()
+    df = cleaner._transform(raw)
+    records = cleaner._validate_records(df)
+    #bad rows are dropped, nearly every other row survives validation
+    assert 0.85 * len(raw) < len(records) < len(raw)
+    assert all(record['sale_amount'] >= 0 for record in records)
@@ -0,0 +1,87 @@
+import pytest
+import numpy as np
+import pandas as pd
+from src.clean import DataCleaner
+from src.validation import ColumnarValidator
+
+def messy_frame() -> pd.DataFrame:
+    base = {
+        'serial_number': 1,
+        'list_year': 2023,
+        'date_recorded': '2023-05-15',
+        'year': 2023,
+        'month': 5,
+        'town': 'Glassboro',
+        'address': '123 Main St',
+        'assessed_value': 200000.0,
+        'sale_amount': 250000.0,
+        'sales_ratio': 0.8,
+        'property_type': 'Residential',
+        'residential_type': 'Single Family',
+        'location': None,
+    }
+    variants = [
+        {},
+        {'sale_amount': -1000.0},
+        {'assessed_value': -0.0},
+        {'sale_amount': 250000.5},
+        {'sale_amount': np.nan},
+        {'serial_number': '42'},
+        {'serial_number': '42.0'},
+        {'serial_number': '4e2'},
+        {'list_year': 2023.0},
+        {'sales_ratio': np.nan},
+        {'sales_ratio': 'n/a'},
+        {'sales_ratio': '0.75'},
+        {'town': None},
+        {'town': 5},
+        {'residential_type': None},
+        {'residential_type': np.nan},
+        {'residential_type': pd.NA},
+        {'address': np.nan},
+        {'location': {'type': 'Point', 'coordinates': [-72.6, 41.7]}},
+        {'location': 'POINT (-72.6 41.7)'},
+    ]
+    return pd.DataFrame([dict(base, **variant) for variant in variants])
+
+def test_columnar_matches_pydantic() -> None:
+    df = messy_frame()
+    cleaner = DataCleaner.__new__(DataCleaner)
+    cleaner.validator = ColumnarValidator()
+
+    cleaner.validation = "pydantic"
+    expected = cleaner._validate_records(df)
+    cleaner.validation = "columnar"
+    actual = cleaner._validate_records(df)
+
+    assert len(actual) == len(expected) == 10
+    for columnar, reference in zip(actual, expected):
+        assert columnar.keys() == reference.keys()
+        for key, value in reference.items():
+            if isinstance(value, float) and np.isnan(value):
+                assert np.isnan(columnar[key])
+            else:
+                assert columnar[key] == value
+                assert type(columnar[key]) is type(value)
+
+def test_reject_counts_per_rule() -> None:
+    result = ColumnarValidator().validate(messy_frame())
+
+    assert result.kept == 10
+    assert result.rejects == {
+        'type:serial_number': 1,
+        'type:town': 2,
+        'type:address': 1,
+        'type:sale_amount': 2,
+        'non_negative:sale_amount': 1,
+        'type:sales_ratio': 1,
+        'type:residential_type': 1,
+        'type:location': 1,
+    }
+
+def test_missing_required_column() -> None:
+    df = messy_frame().drop(columns=['property_type'])
+    result = ColumnarValidator().validate(df)
+
+    assert result.kept == 0
+    assert result.rejects['missing:property_type'] == len(df)